@@ -0,0 +1,63 @@
+"""Shared by the benchmark scripts: percentiles and JSON result files.
+
+Every run is written to ``benchmarks/results/<name>-<commit>-<time>.json`` (or
+``--output``) with the commit it measured, so runs can be compared across commits.
+"""
+
+import datetime as dt
+import json
+import pathlib
+import platform
+import statistics
+import subprocess
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+
+
+def percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+def summary(samples: list[float]) -> dict:
+    """p50/p99/mean in milliseconds of samples taken in seconds."""
+    if not samples:
+        return {"p50_ms": None, "p99_ms": None, "mean_ms": None}
+    return {
+        "p50_ms": round(statistics.median(samples) * 1000, 3),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):  # fmt: skip
+        return None
+
+
+def write_results(name: str, report: dict, output: str | None = None) -> pathlib.Path:
+    commit = git_commit()
+    report = {
+        "benchmark": name,
+        "commit": commit,
+        "recorded_at": dt.datetime.now(dt.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        **report,
+    }
+    if output:
+        path = pathlib.Path(output)
+    else:
+        stamp = dt.datetime.now().strftime("%Y%m%dT%H%M%S")
+        path = RESULTS_DIR / f"{name}-{(commit or 'nocommit')[:12]}-{stamp}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2) + "\n")
+    return path
+
+
+def load_results(path: str) -> dict:
+    return json.loads(pathlib.Path(path).read_text())
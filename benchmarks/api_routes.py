@@ -0,0 +1,325 @@
+"""Requests/sec and latency percentiles of the hot API routes on a realistically sized database.
+
+Seeds workspaces, members, watchers and events (with their rollups and current status)
+into ``DATABASE_URL``, a throwaway SQLite file unless set, then drives every route
+in-process through httpx's ASGI transport, each from ``--concurrency`` clients picking a
+random workspace and watcher per request. ``--scale`` picks a preset; ``full`` is the
+production shape (200 workspaces, 10k watchers, 50M events) and wants Postgres; seed it
+once and pass ``--reuse`` afterwards::
+
+    python benchmarks/api_routes.py --scale small
+    DATABASE_URL=postgresql://... python benchmarks/api_routes.py --scale full --reuse
+
+Results are written as JSON. ``--baseline`` compares against an earlier file and exits
+with status 1 when a route's p50 or p99 got slower, or its requests/sec lower, by more
+than ``--tolerance``.
+"""
+
+import argparse
+import asyncio
+import datetime as dt
+import logging
+import os
+import pathlib
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+_tmp = tempfile.mkdtemp(prefix="healther-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_tmp}/bench.db")
+# public pages read snapshots; keep them on disk so no Redis is needed
+os.environ.setdefault("SNAPSHOT_BACKEND", "disk")
+os.environ.setdefault("SNAPSHOT_DIR", f"{_tmp}/snapshots")
+
+import httpx  # noqa: E402
+from _results import load_results, summary, write_results  # noqa: E402
+from sqlalchemy import func, insert  # noqa: E402
+from sqlmodel import SQLModel, select  # noqa: E402
+
+from healther.app import create_app  # noqa: E402
+from healther.db import SessionLocal, engine  # noqa: E402
+from healther.models import (  # noqa: E402
+    HealthEvent,
+    HealthStatus,
+    Membership,
+    Role,
+    ServiceWatcher,
+    User,
+    Workspace,
+)
+from healther.security import create_access_token, hash_password  # noqa: E402
+from healther.services.overview import backfill_current_status  # noqa: E402
+from healther.services.rollups import rebuild_rollups  # noqa: E402
+
+SCALES = {
+    "tiny": {"workspaces": 10, "members": 3, "watchers": 100, "events": 20_000},
+    "small": {"workspaces": 200, "members": 5, "watchers": 2_000, "events": 200_000},
+    "medium": {"workspaces": 200, "members": 5, "watchers": 10_000, "events": 5_000_000},
+    "full": {"workspaces": 200, "members": 5, "watchers": 10_000, "events": 50_000_000},
+}
+
+# name -> (path, needs a member's token)
+ROUTES = {
+    "me": ("/api/v1/me", True),
+    "workspaces": ("/api/v1/workspaces", True),
+    "members": ("/api/v1/workspaces/{workspace}/members", True),
+    "watchers": ("/api/v1/workspaces/{workspace}/watchers", True),
+    "overview": ("/api/v1/workspaces/{workspace}/overview", True),
+    "workspace_events": ("/api/v1/workspaces/{workspace}/events", True),
+    "workspace_events_down": ("/api/v1/workspaces/{workspace}/events?status=down", True),
+    "watcher_events": ("/api/v1/watchers/{watcher}/events?limit=100", True),
+    "watcher_latency": ("/api/v1/watchers/{watcher}/latency", True),
+    "uptime": ("/api/v1/workspaces/{workspace}/uptime", True),
+    "public_status": ("/api/v1/public/workspaces/{workspace}/status", False),
+    "public_watchers": ("/api/v1/public/workspaces/{workspace}/watchers", False),
+    "public_events": ("/api/v1/public/workspaces/{workspace}/events", False),
+    "public_uptime": ("/api/v1/public/workspaces/{workspace}/uptime", False),
+}
+
+_CHUNK = 10_000
+_STATUSES = (HealthStatus.healthy, HealthStatus.degraded, HealthStatus.down)
+
+
+# --- seeding ------------------------------------------------------------------------
+
+
+async def _insert(conn, model, rows: list[dict]) -> None:
+    for start in range(0, len(rows), _CHUNK):
+        await conn.execute(insert(model), rows[start : start + _CHUNK])
+
+
+def _event_rows(watcher_ids: list[uuid.UUID], total: int, days: int, rng: random.Random):
+    """Events spread evenly over the watchers and the last ``days``, mostly healthy."""
+    now = dt.datetime.now(dt.timezone.utc)
+    per_watcher = max(total // len(watcher_ids), 1)
+    step = dt.timedelta(days=days) / per_watcher
+    batch = []
+    for watcher_id in watcher_ids:
+        for index in range(per_watcher):
+            status = rng.choices(_STATUSES, weights=(97, 2, 1))[0]
+            batch.append(
+                {
+                    "id": uuid.uuid4(),
+                    "watcher_id": watcher_id,
+                    "status": status,
+                    "response_status": 503 if status == HealthStatus.down else 200,
+                    "response_time_ms": round(rng.lognormvariate(4.8, 0.5), 2),
+                    "created_at": now - step * index,
+                    "message": "Unexpected status" if status == HealthStatus.down else None,
+                }
+            )
+            if len(batch) == _CHUNK:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+async def seed(args, rng: random.Random) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    hashed = hash_password("secret123")
+    workspaces, users, memberships, watchers = [], [], [], []
+    for index in range(args.workspaces):
+        workspace = Workspace(name=f"workspace-{index}", is_public=True)
+        workspaces.append(workspace.model_dump())
+        for member in range(args.members):
+            user = User(email=f"user-{index}-{member}@example.com", hashed_password=hashed)
+            users.append(user.model_dump())
+            role = Role.owner if member == 0 else Role.observer
+            memberships.append({"workspace_id": workspace.id, "user_id": user.id, "role": role})
+    for index in range(args.watchers):
+        watcher = ServiceWatcher(
+            workspace_id=workspaces[index % len(workspaces)]["id"],
+            name=f"svc-{index}",
+            url=f"https://svc-{index}.example.com/health",
+        )
+        watchers.append(watcher.model_dump())
+
+    started = time.perf_counter()
+    async with engine.begin() as conn:
+        await _insert(conn, Workspace, workspaces)
+        await _insert(conn, User, users)
+        await _insert(conn, Membership, memberships)
+        await _insert(conn, ServiceWatcher, watchers)
+    inserted = 0
+    watcher_ids = [watcher["id"] for watcher in watchers]
+    for batch in _event_rows(watcher_ids, args.events, args.days, rng):
+        async with engine.begin() as conn:
+            await conn.execute(insert(HealthEvent), batch)
+        inserted += len(batch)
+        print(f"\rseeded {inserted} events", end="", flush=True)
+    print(f" in {time.perf_counter() - started:.1f}s; building rollups and current status")
+    async with SessionLocal() as session:
+        await rebuild_rollups(session, chunk_size=_CHUNK)
+        await backfill_current_status(session)
+
+
+async def load_targets() -> list[dict]:
+    """One entry per workspace: its owner's token and its watcher ids."""
+    async with SessionLocal() as session:
+        owners = (
+            await session.exec(
+                select(Membership.workspace_id, Membership.user_id).where(
+                    Membership.role == Role.owner
+                )
+            )
+        ).all()
+        rows = (
+            await session.exec(
+                select(ServiceWatcher.workspace_id, ServiceWatcher.id).where(
+                    ServiceWatcher.deleted_at.is_(None)
+                )
+            )
+        ).all()
+    watchers: dict[uuid.UUID, list[uuid.UUID]] = {}
+    for workspace_id, watcher_id in rows:
+        watchers.setdefault(workspace_id, []).append(watcher_id)
+    return [
+        {
+            "workspace": workspace_id,
+            "watchers": watchers[workspace_id],
+            "headers": {"Authorization": f"Bearer {create_access_token({'sub': str(user_id)})}"},
+        }
+        for workspace_id, user_id in owners
+        if watchers.get(workspace_id)
+    ]
+
+
+# --- measurement --------------------------------------------------------------------
+
+
+async def measure(client, name: str, targets: list[dict], args, rng: random.Random) -> dict:
+    path, authed = ROUTES[name]
+    latencies, errors = [], 0
+
+    async def one() -> None:
+        nonlocal errors
+        target = rng.choice(targets)
+        url = path.format(workspace=target["workspace"], watcher=rng.choice(target["watchers"]))
+        started = time.perf_counter()
+        resp = await client.get(url, headers=target["headers"] if authed else None)
+        latencies.append(time.perf_counter() - started)
+        if resp.status_code != 200:
+            errors += 1
+
+    async def client_loop(count: int) -> None:
+        for _ in range(count):
+            await one()
+
+    # warm caches (auth, snapshots, statement cache) before timing
+    for _ in range(args.warmup):
+        await one()
+    latencies.clear()
+    errors = 0
+    share, extra = divmod(args.requests, args.concurrency)
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(client_loop(share + (index < extra)) for index in range(args.concurrency))
+    )
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_sec": round(len(latencies) / elapsed, 1),
+        **summary(latencies),
+    }
+
+
+def regressions(results: dict, baseline: dict, tolerance: float) -> dict[str, list[str]]:
+    """Routes slower (p50/p99) or with fewer requests/sec than the baseline allows."""
+    found = {}
+    for name, result in results.items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        problems = [
+            f"{metric} {before[metric]:.2f} -> {result[metric]:.2f}"
+            for metric in ("p50_ms", "p99_ms")
+            if result[metric] > before[metric] * (1 + tolerance)
+        ]
+        if result["requests_per_sec"] < before["requests_per_sec"] * (1 - tolerance):
+            problems.append(
+                f"requests/sec {before['requests_per_sec']:.1f} -> {result['requests_per_sec']:.1f}"
+            )
+        if problems:
+            found[name] = problems
+    return found
+
+
+async def main(args) -> int:
+    logging.disable(logging.WARNING)
+    rng = random.Random(args.seed)
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    async with SessionLocal() as session:
+        existing = (await session.exec(select(func.count()).select_from(ServiceWatcher))).one()
+    if not (args.reuse and existing):
+        await seed(args, rng)
+    targets = await load_targets()
+
+    names = args.routes.split(",") if args.routes else list(ROUTES)
+    transport = httpx.ASGITransport(app=create_app())
+    results = {}
+    print(
+        f"{len(targets)} workspaces, {args.requests} requests per route, "
+        f"{args.concurrency} concurrent, {engine.dialect.name}"
+    )
+    print(f"{'route':<22} {'req/s':>8} {'p50':>9} {'p99':>9} {'errors':>7}")
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name in names:
+            result = results[name] = await measure(client, name, targets, args, rng)
+            print(
+                f"{name:<22} {result['requests_per_sec']:>8.1f} {result['p50_ms']:>7.2f}ms "
+                f"{result['p99_ms']:>7.2f}ms {result['errors']:>7}"
+            )
+    async with SessionLocal() as session:
+        counts = {
+            model.__tablename__: (await session.exec(select(func.count()).select_from(model))).one()
+            for model in (Workspace, ServiceWatcher, HealthEvent)
+        }
+    await engine.dispose()
+    report = {
+        "database": engine.dialect.name,
+        "data": counts,
+        "options": vars(args) | {"baseline": None, "output": None},
+        "results": results,
+    }
+    print(f"results written to {write_results('api_routes', report, args.output)}")
+    if not args.baseline:
+        return 0
+    found = regressions(results, load_results(args.baseline), args.tolerance)
+    for name, problems in found.items():
+        print(f"REGRESSION {name}: {'; '.join(problems)}")
+    if not found:
+        print(f"no route regressed by more than {args.tolerance:.0%}")
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=list(SCALES), default="small")
+    parser.add_argument("--workspaces", type=int)
+    parser.add_argument("--members", type=int, help="members per workspace")
+    parser.add_argument("--watchers", type=int)
+    parser.add_argument("--events", type=int)
+    parser.add_argument("--days", type=int, default=30, help="history the events span")
+    parser.add_argument("--reuse", action="store_true", help="keep an already seeded DB")
+    parser.add_argument("--routes", help=f"comma-separated subset of {', '.join(ROUTES)}")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="JSON file (default benchmarks/results/...)")
+    parser.add_argument("--baseline", help="earlier JSON result to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+    for key, value in SCALES[args.scale].items():
+        if getattr(args, key) is None:
+            setattr(args, key, value)
+    sys.exit(asyncio.run(main(args)))
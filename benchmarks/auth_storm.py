@@ -0,0 +1,157 @@
+"""Latency of unrelated requests while a burst of logins hashes passwords.
+
+Runs the app in-process on a throwaway SQLite database and drives it through
+httpx's ASGI transport, so login handlers and probe requests share one event loop,
+exactly like a single uvicorn worker. ``GET /api/v1/health`` is probed at a steady
+rate first on an idle app, then during the storm; each probe is timed from the moment
+it was due, not from when the loop got round to sending it.
+
+``--mode blocking`` hashes inline in the handler (the old behaviour), ``--mode pool``
+uses the bounded hashing pool; the default runs both::
+
+    python benchmarks/auth_storm.py --logins 200 --concurrency 50
+
+Results are also written as JSON to ``benchmarks/results/`` (see ``_results.py``).
+"""
+
+import argparse
+import asyncio
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+_tmp = tempfile.mkdtemp(prefix="healther-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_tmp}/bench.db")
+
+import httpx  # noqa: E402
+from _results import summary, write_results  # noqa: E402
+from sqlmodel import SQLModel  # noqa: E402
+
+from healther import security  # noqa: E402
+from healther.app import create_app  # noqa: E402
+from healther.db import engine  # noqa: E402
+from healther.services import auth as auth_service  # noqa: E402
+
+EMAIL = "storm@example.com"
+PASSWORD = "secret123"
+
+
+async def _inline_verify(plain_password: str, hashed_password: str) -> bool:
+    return security.verify_password(plain_password, hashed_password)
+
+
+async def _probe(client: httpx.AsyncClient, stop: asyncio.Event, interval: float) -> list[float]:
+    # latency counts from the slot a probe was due in, so a stalled loop shows up as the
+    # delay of every probe it held back instead of as one missing sample
+    latencies = []
+    due = time.perf_counter()
+    while not stop.is_set():
+        wait = due - time.perf_counter()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        resp = await client.get("/api/v1/health")
+        resp.raise_for_status()
+        latencies.append(time.perf_counter() - due)
+        due += interval
+    return latencies
+
+
+async def _storm(client: httpx.AsyncClient, logins: int, concurrency: int) -> float:
+    limit = asyncio.Semaphore(concurrency)
+
+    async def login():
+        async with limit:
+            resp = await client.post(
+                "/api/v1/auth/token", json={"username": EMAIL, "password": PASSWORD}
+            )
+            resp.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    return time.perf_counter() - started
+
+
+async def _measure(client, *, logins: int, concurrency: int, interval: float, idle: float):
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe(client, stop, interval))
+    await asyncio.sleep(idle)
+    stop.set()
+    idle_latencies = await probe
+
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe(client, stop, interval))
+    elapsed = await _storm(client, logins, concurrency)
+    stop.set()
+    storm_latencies = await probe
+    return idle_latencies, storm_latencies, elapsed
+
+
+async def main(args) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    app = create_app()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        resp = await client.post(
+            "/api/v1/auth/register", json={"email": EMAIL, "password": PASSWORD}
+        )
+        resp.raise_for_status()
+
+        modes = ["blocking", "pool"] if args.mode == "both" else [args.mode]
+        print(
+            f"{args.logins} logins, {args.concurrency} concurrent, "
+            f"{security.settings.password_hash_workers} hashing threads"
+        )
+        print(
+            f"{'mode':<9} {'logins/s':>9} {'idle p50':>9} {'idle p99':>9} "
+            f"{'storm p50':>10} {'storm p99':>10} {'storm max':>10}"
+        )
+        results = {}
+        for mode in modes:
+            original = auth_service.verify_password_async
+            if mode == "blocking":
+                auth_service.verify_password_async = _inline_verify
+            try:
+                idle, storm, elapsed = await _measure(
+                    client,
+                    logins=args.logins,
+                    concurrency=args.concurrency,
+                    interval=args.probe_interval,
+                    idle=args.idle_seconds,
+                )
+            finally:
+                auth_service.verify_password_async = original
+            result = results[mode] = {
+                "logins_per_sec": round(args.logins / elapsed, 1),
+                "idle": summary(idle),
+                "storm": {**summary(storm), "max_ms": round(max(storm) * 1000, 3)},
+            }
+            print(
+                f"{mode:<9} {result['logins_per_sec']:>9.1f} "
+                f"{result['idle']['p50_ms']:>7.2f}ms {result['idle']['p99_ms']:>7.2f}ms "
+                f"{result['storm']['p50_ms']:>8.2f}ms {result['storm']['p99_ms']:>8.2f}ms "
+                f"{result['storm']['max_ms']:>8.2f}ms"
+            )
+    await engine.dispose()
+    report = {
+        "hash_workers": security.settings.password_hash_workers,
+        "options": vars(args) | {"output": None},
+        "results": results,
+    }
+    print(f"results written to {write_results('auth_storm', report, args.output)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=["blocking", "pool", "both"], default="both")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--probe-interval", type=float, default=0.005)
+    parser.add_argument("--idle-seconds", type=float, default=1.0)
+    parser.add_argument("--output", help="JSON file (default benchmarks/results/...)")
+    asyncio.run(main(parser.parse_args()))
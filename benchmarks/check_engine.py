@@ -0,0 +1,361 @@
+"""Checks per second one process sustains, against local stub HTTP targets.
+
+Stub targets run in their own processes (``--targets``) so serving them does not share
+the event loop being measured; each answers after ``--latency-ms`` (± jitter) with a
+configurable status, body size, error rate and connection-reset rate. ``--watchers``
+watchers pointing at them are seeded into ``DATABASE_URL`` (a throwaway SQLite file
+unless set, so Postgres works too), then every watcher is checked ``--rounds`` times
+along one of the worker check paths:
+
+- ``engine``: ``CheckEngine._run_one``, i.e. ``run_http_check`` plus the batching
+  ``EventSink`` that writes multi-row INSERTs.
+- ``perform_check``: what one RQ ``run_check`` job does: load the watcher, then
+  ``perform_check`` with its own commit. An RQ worker runs one job at a time, so this
+  path runs ``--rq-workers`` checks at once rather than ``--concurrency``.
+
+Reported per path: checks/sec (until every event is committed), p50/p99 check overhead
+(wall time of a check minus the target's ``response_time_ms``), DB write time and the
+engine's memory per loaded watcher. Results are written as JSON; pass ``--baseline`` an
+earlier file to print the change::
+
+    python benchmarks/check_engine.py --watchers 2000 --concurrency 200 --rounds 3
+    python benchmarks/check_engine.py --baseline benchmarks/results/<earlier run>.json
+
+Alerts, the live feed and snapshots go to Redis and are left out unless ``--with-redis``.
+"""
+
+import argparse
+import asyncio
+import http
+import multiprocessing
+import os
+import pathlib
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+_tmp = tempfile.mkdtemp(prefix="healther-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_tmp}/bench.db")
+# every watcher points at the same stub host; real watchers are spread over many hosts
+os.environ.setdefault("HTTP_PER_HOST_LIMIT", "100000")
+
+from _results import load_results, summary, write_results  # noqa: E402
+from sqlmodel import SQLModel, select  # noqa: E402
+
+from healther import check_engine  # noqa: E402
+from healther.db import SessionLocal, engine  # noqa: E402
+from healther.event_sink import SinkStats  # noqa: E402
+from healther.http_client import http_clients  # noqa: E402
+from healther.models import ServiceWatcher, Workspace  # noqa: E402
+from healther.scheduler import LocalScheduler  # noqa: E402
+from healther.services import watchers as watcher_service  # noqa: E402
+
+PATHS = ["engine", "perform_check"]
+
+
+# --- stub targets -------------------------------------------------------------------
+
+
+async def _serve(options: dict, ready) -> None:
+    rng = random.Random()
+    body = (b"ok" + b"x" * options["body_bytes"])[: max(options["body_bytes"], 2)]
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                delay = rng.gauss(options["latency_ms"], options["latency_jitter_ms"])
+                await asyncio.sleep(max(delay, 0) / 1000)
+                if rng.random() < options["failure_rate"]:
+                    # reset the connection: the check sees a RequestError and reports down
+                    writer.transport.abort()
+                    return
+                code = options["status"]
+                if rng.random() < options["error_rate"]:
+                    code = options["error_status"]
+                payload = b"" if head.startswith(b"HEAD") else body
+                writer.write(
+                    f"HTTP/1.1 {code} {http.HTTPStatus(code).phrase}\r\n"
+                    f"Content-Type: text/plain\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+                    + payload
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):  # fmt: skip
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0, backlog=4096)
+    ready.send(server.sockets[0].getsockname()[1])
+    async with server:
+        await server.serve_forever()
+
+
+def _run_stub(options: dict, ready) -> None:
+    asyncio.run(_serve(options, ready))
+
+
+def start_targets(count: int, options: dict) -> tuple[list, list[int]]:
+    processes, ports = [], []
+    for _ in range(count):
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(target=_run_stub, args=(options, sender), daemon=True)
+        process.start()
+        processes.append(process)
+        ports.append(receiver.recv())
+    return processes, ports
+
+
+# --- measurement --------------------------------------------------------------------
+
+
+class _TimedCheck:
+    """Wraps ``run_http_check`` to keep each check's wall time and response time."""
+
+    def __init__(self, check) -> None:
+        self.check = check
+        self.timings: dict = {}
+        self.failures = 0
+
+    async def __call__(self, watcher):
+        started = time.perf_counter()
+        event = await self.check(watcher)
+        wall = time.perf_counter() - started
+        if event.response_time_ms is None:
+            self.failures += 1
+        self.timings[watcher.id] = (wall, (event.response_time_ms or 0) / 1000)
+        return event
+
+
+async def seed(count: int, ports: list[int], body_check_ratio: float) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    async with SessionLocal() as session:
+        workspace = Workspace(name="Benchmark")
+        session.add(workspace)
+        await session.commit()
+        for start in range(0, count, 1000):
+            session.add_all(
+                ServiceWatcher(
+                    workspace_id=workspace.id,
+                    name=f"stub-{index}",
+                    url=f"http://127.0.0.1:{ports[index % len(ports)]}/w/{index}",
+                    # GET and read the body for some, HEAD for the rest, as in production
+                    expected_body="ok" if index < count * body_check_ratio else None,
+                )
+                for index in range(start, min(start + 1000, count))
+            )
+            await session.commit()
+
+
+async def _rounds(watchers, rounds: int, concurrency: int, check_one) -> tuple[float, list]:
+    gate = asyncio.Semaphore(concurrency)
+    overheads = []
+
+    async def bounded(watcher):
+        async with gate:
+            overheads.append(await check_one(watcher))
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await asyncio.gather(*(bounded(watcher) for watcher in watchers))
+    return started, overheads
+
+
+async def bench_engine(args, timed: _TimedCheck) -> dict:
+    scheduler = LocalScheduler(jitter_ratio=0, initial_jitter_seconds=0)
+    check = check_engine.CheckEngine(concurrency=args.concurrency, scheduler=scheduler)
+    if not args.with_redis:
+        check.sink.listeners.clear()
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    await check.refresh()
+    held = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    watchers = list(check._watchers.values())
+
+    async def check_one(watcher):
+        started = time.perf_counter()
+        await check._run_one(watcher)
+        _, response = timed.timings[watcher.id]
+        return time.perf_counter() - started - response
+
+    if args.warmup_rounds:
+        await _rounds(watchers, args.warmup_rounds, args.concurrency, check_one)
+        await check.sink.flush()
+    check.sink.stats = SinkStats()
+    timed.failures = 0
+    stopping = asyncio.Event()
+    flusher = asyncio.create_task(check.sink.run(stopping))
+    started, overheads = await _rounds(watchers, args.rounds, args.concurrency, check_one)
+    stopping.set()
+    await flusher
+    await check.sink.flush()
+    elapsed = time.perf_counter() - started
+
+    sink = check.sink.stats
+    return {
+        "checks": len(overheads),
+        "failed_checks": timed.failures,
+        "elapsed_s": round(elapsed, 3),
+        "checks_per_sec": round(len(overheads) / elapsed, 1),
+        "overhead": summary(overheads),
+        "db_write": {
+            "flushes": sink.flushes,
+            "batch_mean": round(sink.mean_batch_size, 1),
+            "flush_mean_ms": round(sink.mean_flush_seconds * 1000, 3),
+            "flush_max_ms": round(sink.max_flush_seconds * 1000, 3),
+            "per_event_ms": round(sink.total_flush_seconds * 1000 / max(sink.events, 1), 4),
+        },
+        "memory_per_watcher_bytes": round(held / max(len(watchers), 1)),
+    }
+
+
+async def bench_perform_check(args, timed: _TimedCheck) -> dict:
+    async with SessionLocal() as session:
+        watchers = (await session.exec(select(ServiceWatcher))).all()
+    writes = []
+
+    async def check_one(watcher):
+        # the body of workers._run_check_async, minus the Redis side effects
+        started = time.perf_counter()
+        async with SessionLocal() as session:
+            result = await session.exec(
+                select(ServiceWatcher).where(ServiceWatcher.id == watcher.id)
+            )
+            loaded = result.first()
+            before = time.perf_counter()
+            await watcher_service.perform_check(loaded, session)
+            done = time.perf_counter()
+        http_wall, response = timed.timings[watcher.id]
+        writes.append(done - before - http_wall)
+        return done - started - response
+
+    if args.warmup_rounds:
+        await _rounds(watchers, args.warmup_rounds, args.rq_workers, check_one)
+    writes.clear()
+    timed.failures = 0
+    started, overheads = await _rounds(watchers, args.rounds, args.rq_workers, check_one)
+    elapsed = time.perf_counter() - started
+    return {
+        "checks": len(overheads),
+        "failed_checks": timed.failures,
+        "elapsed_s": round(elapsed, 3),
+        "checks_per_sec": round(len(overheads) / elapsed, 1),
+        "overhead": summary(overheads),
+        "db_write": summary(writes),
+        "memory_per_watcher_bytes": None,
+    }
+
+
+# --- reporting ----------------------------------------------------------------------
+
+
+def _print_table(results: dict) -> None:
+    print(
+        f"{'path':<14} {'checks/s':>9} {'overhead p50':>13} {'overhead p99':>13} "
+        f"{'db write':>10} {'mem/watcher':>12} {'failed':>7}"
+    )
+    for path, result in results.items():
+        db_write = result["db_write"]
+        write_ms = db_write.get("per_event_ms", db_write.get("mean_ms"))
+        memory = result["memory_per_watcher_bytes"]
+        print(
+            f"{path:<14} {result['checks_per_sec']:>9.1f} "
+            f"{result['overhead']['p50_ms']:>11.2f}ms {result['overhead']['p99_ms']:>11.2f}ms "
+            f"{write_ms:>8.3f}ms {'-' if memory is None else f'{memory} B':>12} "
+            f"{result['failed_checks']:>7}"
+        )
+
+
+def _print_comparison(results: dict, baseline: dict) -> None:
+    print(f"change against {baseline.get('commit') or 'baseline'}:")
+    for path, result in results.items():
+        before = baseline["results"].get(path)
+        if before is None:
+            continue
+        metrics = [
+            ("checks/s", result["checks_per_sec"], before["checks_per_sec"]),
+            ("overhead p50", result["overhead"]["p50_ms"], before["overhead"]["p50_ms"]),
+            ("overhead p99", result["overhead"]["p99_ms"], before["overhead"]["p99_ms"]),
+        ]
+        changes = ", ".join(
+            f"{name} {(new - old) / old:+.1%}" for name, new, old in metrics if old and new
+        )
+        print(f"  {path}: {changes}")
+
+
+async def main(args) -> None:
+    options = {
+        "latency_ms": args.latency_ms,
+        "latency_jitter_ms": args.latency_jitter_ms,
+        "status": args.status,
+        "error_status": args.error_status,
+        "error_rate": args.error_rate,
+        "failure_rate": args.failure_rate,
+        "body_bytes": args.body_bytes,
+    }
+    processes, ports = start_targets(args.targets, options)
+    timed_engine = _TimedCheck(check_engine.run_http_check)
+    timed_worker = _TimedCheck(watcher_service.run_http_check)
+    check_engine.run_http_check = timed_engine
+    watcher_service.run_http_check = timed_worker
+    try:
+        await seed(args.watchers, ports, args.body_check_ratio)
+        paths = PATHS if args.path == "both" else [args.path]
+        print(
+            f"{args.watchers} watchers, {args.rounds} rounds, {args.concurrency} concurrent, "
+            f"{args.targets} stub targets at {args.latency_ms}ms, {engine.dialect.name}"
+        )
+        results = {}
+        for path in paths:
+            if path == "engine":
+                results[path] = await bench_engine(args, timed_engine)
+            else:
+                results[path] = await bench_perform_check(args, timed_worker)
+    finally:
+        for process in processes:
+            process.terminate()
+        await http_clients.aclose()
+        await engine.dispose()
+
+    _print_table(results)
+    report = {
+        "database": engine.dialect.name,
+        "options": vars(args) | {"baseline": None, "output": None},
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "results": results,
+    }
+    print(f"results written to {write_results('check_engine', report, args.output)}")
+    if args.baseline:
+        _print_comparison(results, load_results(args.baseline))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--path", choices=[*PATHS, "both"], default="both")
+    parser.add_argument("--watchers", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--warmup-rounds", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--rq-workers", type=int, default=4, help="perform_check concurrency")
+    parser.add_argument("--targets", type=int, default=2, help="stub server processes")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--latency-jitter-ms", type=float, default=5.0)
+    parser.add_argument("--status", type=int, default=200)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of error_status")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of resets")
+    parser.add_argument("--body-bytes", type=int, default=512)
+    parser.add_argument("--body-check-ratio", type=float, default=0.5)
+    parser.add_argument("--with-redis", action="store_true")
+    parser.add_argument("--output", help="JSON file (default benchmarks/results/...)")
+    parser.add_argument("--baseline", help="earlier JSON result to compare against")
+    asyncio.run(main(parser.parse_args()))
@@ -109,6 +109,22 @@ function dailyBars(events, days = 90) {
   return bars;
 }
 
+function uptimeByWatcherId(uptime) {
+  const grouped = {};
+  (uptime?.watchers || []).forEach((watcher) => {
+    grouped[watcher.watcher_id] = watcher;
+  });
+  return grouped;
+}
+
+function rollupBars(rollup) {
+  return rollup.bars.map((bar) => ({ key: bar.day, ratio: bar.ratio, date: new Date(bar.day) }));
+}
+
+function rollupUptime(rollup) {
+  return rollup.uptime_percentage == null ? null : Math.round(rollup.uptime_percentage);
+}
+
 function barTone(ratio) {
   if (ratio === null) return "unknown";
   if (ratio >= 1) return "healthy";
@@ -469,7 +485,10 @@ function Watchers() {
   const [watchers, setWatchers] = useState([]);
   const [selectedWatcher, setSelectedWatcher] = useState(null);
   const [events, setEvents] = useState([]);
+  const [latency, setLatency] = useState(null);
   const [workspaceEvents, setWorkspaceEvents] = useState([]);
+  const [uptime, setUptime] = useState(null);
+  const [overview, setOverview] = useState(null);
   const [healthExpanded, setHealthExpanded] = useState(null);
   const [healthError, setHealthError] = useState("");
   const [form, setForm] = useState({
@@ -506,8 +525,14 @@ function Watchers() {
 
   const loadWorkspaceEvents = async () => {
     try {
-      const data = await api.listWorkspaceEvents(token, id);
+      const [data, uptimeData, overviewData] = await Promise.all([
+        api.listWorkspaceEvents(token, id),
+        api.workspaceUptime(token, id),
+        api.workspaceOverview(token, id),
+      ]);
       setWorkspaceEvents(data);
+      setUptime(uptimeData);
+      setOverview(overviewData);
       setHealthError("");
     } catch (err) {
       setHealthError(err.message);
@@ -541,6 +566,35 @@ function Watchers() {
     loadWorkspaceEvents();
   }, [id]);
 
+  useEffect(() => {
+    if (!token) return undefined;
+    return api.workspaceLive(token, id, {
+      health_event: (event) => {
+        setWorkspaceEvents((prev) => [event, ...prev]);
+        setOverview((prev) =>
+          prev && {
+            ...prev,
+            watchers: prev.watchers.map((watcher) =>
+              watcher.id === event.watcher_id
+                ? {
+                    ...watcher,
+                    last_status: event.status,
+                    last_checked_at: event.created_at,
+                    last_latency_ms: event.response_time_ms,
+                    status_since:
+                      watcher.last_status === event.status ? watcher.status_since : event.created_at,
+                  }
+                : watcher
+            ),
+          }
+        );
+        setEvents((prev) =>
+          prev.length && prev[0].watcher_id === event.watcher_id ? [event, ...prev] : prev
+        );
+      },
+    });
+  }, [id, token]);
+
   const selectWatcher = async (watcher) => {
     setSelectedWatcher(watcher.id);
     setEditForm({
@@ -552,9 +606,14 @@ function Watchers() {
       every_unit: watcher.every_unit ?? "minutes",
     });
     setDeleteError("");
+    setLatency(null);
     try {
-      const data = await api.listWatcherEvents(token, watcher.id);
+      const [data, latencyData] = await Promise.all([
+        api.listWatcherEvents(token, watcher.id),
+        api.watcherLatency(token, watcher.id),
+      ]);
       setEvents(data);
+      setLatency(latencyData);
     } catch (err) {
       setError(err.message);
     }
@@ -733,6 +792,14 @@ function Watchers() {
     });
     return grouped;
   }, [workspaceEvents]);
+  const rollupsByWatcher = useMemo(() => uptimeByWatcherId(uptime), [uptime]);
+  const currentByWatcher = useMemo(() => {
+    const byId = {};
+    (overview?.watchers || []).forEach((watcher) => {
+      byId[watcher.id] = watcher;
+    });
+    return byId;
+  }, [overview]);
 
   return (
     <div className="workspace-detail">
@@ -792,9 +859,11 @@ function Watchers() {
         <div className="uptime-table">
           {watchers.map((watcher) => {
             const watcherEvents = eventsByWatcher[watcher.id] || [];
-            const bars = dailyBars(watcherEvents);
+            const rollup = rollupsByWatcher[watcher.id];
+            const bars = rollup ? rollupBars(rollup) : dailyBars(watcherEvents);
             const series = latencySeries(watcherEvents);
-            const uptime = uptimePercentage(watcherEvents);
+            const uptime = rollup ? rollupUptime(rollup) : uptimePercentage(watcherEvents);
+            const current = currentByWatcher[watcher.id];
             const expanded = healthExpanded === watcher.id;
             return (
               <div key={watcher.id} className="uptime-card">
@@ -805,6 +874,12 @@ function Watchers() {
                     <div className="muted">
                       90-day uptime: {uptime == null ? "No data" : `${uptime}%`}
                     </div>
+                    {current?.last_status && (
+                      <div className="muted">
+                        Now {current.last_status} since {formatRelativeTime(current.status_since)}
+                        {current.uptime_24h != null && ` · 24h uptime: ${current.uptime_24h}%`}
+                      </div>
+                    )}
                   </div>
                   <div className="status-strip status-strip--compact">
                     {bars.map((bar) => {
@@ -996,6 +1071,12 @@ function Watchers() {
         <div className="panel">
           <div className="panel__header">
             <h3>Latest events</h3>
+            {latency && latency.count > 0 && (
+              <span className="pill">
+                24h p50 {formatLatencyMs(latency.p50)} · p95 {formatLatencyMs(latency.p95)} · p99{" "}
+                {formatLatencyMs(latency.p99)} ms
+              </span>
+            )}
           </div>
           <div className="table events-table">
             <div className="row head events-row">
@@ -1263,55 +1344,57 @@ function Settings() {
 
 function PublicWorkspace() {
   const { id } = useParams();
-  const [watchers, setWatchers] = useState([]);
-  const [events, setEvents] = useState([]);
+  const [snapshot, setSnapshot] = useState(null);
   const [expandedId, setExpandedId] = useState(null);
   const [error, setError] = useState("");
 
   useEffect(() => {
     let active = true;
     setError("");
-    Promise.all([api.listPublicWatchers(id), api.listPublicEvents(id)])
-      .then(([watcherData, eventData]) => {
-        if (!active) return;
-        setWatchers(watcherData);
-        setEvents(eventData);
-      })
+    api
+      .publicStatus(id)
+      .then((data) => active && setSnapshot(data))
       .catch((err) => active && setError(err.message));
+    const close = api.publicLive(id, {
+      health_event: (event) =>
+        setSnapshot((prev) =>
+          prev && {
+            ...prev,
+            watchers: prev.watchers.map((watcher) =>
+              watcher.id === event.watcher_id
+                ? { ...watcher, status: event.status, last_checked_at: event.created_at }
+                : watcher
+            ),
+          }
+        ),
+    });
     return () => {
       active = false;
+      close();
     };
   }, [id]);
 
-  const eventsByWatcher = useMemo(() => {
-    const grouped = {};
-    events.forEach((event) => {
-      if (!event.watcher_id) return;
-      if (!grouped[event.watcher_id]) grouped[event.watcher_id] = [];
-      grouped[event.watcher_id].push(event);
-    });
-    return grouped;
-  }, [events]);
+  const watchers = snapshot ? snapshot.watchers : [];
+  const rollupsByWatcher = useMemo(() => uptimeByWatcherId(snapshot?.uptime), [snapshot]);
 
   return (
     <div className="panel">
       <div className="panel__header">
         <div>
-          <h2>Public status</h2>
-          <div className="muted">Workspace {id}</div>
+          <h2>{snapshot ? snapshot.name : "Public status"}</h2>
+          <div className="muted">
+            {snapshot ? `Updated ${formatRelativeTime(snapshot.generated_at)}` : `Workspace ${id}`}
+          </div>
         </div>
         <span className="pill">90-day uptime</span>
       </div>
       {error && <div className="error">{error}</div>}
       <div className="grid public-grid">
         {watchers.map((watcher) => {
-          const watcherEvents = eventsByWatcher[watcher.id] || [];
-          const bars = dailyBars(watcherEvents);
-          const series = latencySeries(watcherEvents);
-          const uptime = uptimePercentage(watcherEvents);
-          const latestEvent = watcherEvents
-            .filter((event) => event.created_at)
-            .sort((a, b) => new Date(b.created_at) - new Date(a.created_at))[0];
+          const rollup = rollupsByWatcher[watcher.id];
+          const bars = rollup ? rollupBars(rollup) : dailyBars([]);
+          const series = watcher.recent_latency_ms;
+          const uptime = rollup ? rollupUptime(rollup) : null;
           const expanded = expandedId === watcher.id;
           return (
             <div key={watcher.id} className="public-card">
@@ -1325,7 +1408,7 @@ function PublicWorkspace() {
                     90-day uptime: {uptime == null ? "No data" : `${uptime}%`}
                   </div>
                   <div className="muted">
-                    Last event: {latestEvent ? formatRelativeTime(latestEvent.created_at) : "—"}
+                    Last event: {formatRelativeTime(watcher.last_checked_at)}
                   </div>
                 </div>
                 <button
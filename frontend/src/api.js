@@ -30,6 +30,14 @@ async function request(path, { method = "GET", body, token } = {}) {
   }
 }
 
+export function liveFeed(path, handlers) {
+  const source = new EventSource(`${API_BASE}${path}`);
+  Object.entries(handlers).forEach(([name, handler]) => {
+    source.addEventListener(name, (message) => handler(JSON.parse(message.data)));
+  });
+  return () => source.close();
+}
+
 export const api = {
   register: (data) => request("/auth/register", { method: "POST", body: data }),
   login: (data) => request("/auth/token", { method: "POST", body: data }),
@@ -41,7 +49,11 @@ export const api = {
   createWatcher: (token, workspaceId, data) =>
     request(`/workspaces/${workspaceId}/watchers`, { method: "POST", body: data, token }),
   listWorkspaceEvents: (token, workspaceId) =>
-    request(`/workspaces/${workspaceId}/events`, { token }),
+    request(`/workspaces/${workspaceId}/events?limit=1000`, { token }).then((page) => page.items),
+  workspaceUptime: (token, workspaceId) =>
+    request(`/workspaces/${workspaceId}/uptime`, { token }),
+  workspaceOverview: (token, workspaceId) =>
+    request(`/workspaces/${workspaceId}/overview`, { token }),
   updateWatcher: (token, watcherId, data) =>
     request(`/watchers/${watcherId}`, { method: "PATCH", body: data, token }),
   deleteWatcher: (token, watcherId) =>
@@ -66,7 +78,16 @@ export const api = {
     }),
   removeRecipient: (token, workspaceId, recipientId) =>
     request(`/workspaces/${workspaceId}/recipients/${recipientId}`, { method: "DELETE", token }),
-  listWatcherEvents: (token, watcherId) => request(`/watchers/${watcherId}/events`, { token }),
+  watcherLatency: (token, watcherId, window = "24h") =>
+    request(`/watchers/${watcherId}/latency?window=${window}`, { token }),
+  listWatcherEvents: (token, watcherId) =>
+    request(`/watchers/${watcherId}/events`, { token }).then((page) => page.items),
   listPublicWatchers: (workspaceId) => request(`/public/workspaces/${workspaceId}/watchers`),
-  listPublicEvents: (workspaceId) => request(`/public/workspaces/${workspaceId}/events`),
+  listPublicEvents: (workspaceId) =>
+    request(`/public/workspaces/${workspaceId}/events?limit=1000`).then((page) => page.items),
+  publicUptime: (workspaceId) => request(`/public/workspaces/${workspaceId}/uptime`),
+  publicStatus: (workspaceId) => request(`/public/workspaces/${workspaceId}/status`),
+  workspaceLive: (token, workspaceId, handlers) =>
+    liveFeed(`/workspaces/${workspaceId}/live?token=${encodeURIComponent(token)}`, handlers),
+  publicLive: (workspaceId, handlers) => liveFeed(`/public/workspaces/${workspaceId}/live`, handlers),
 };
@@ -0,0 +1,205 @@
+"""Transition-based alerting with flap damping and per-workspace digests.
+
+Every check result is folded into a small per-watcher state, but recipients only hear
+about changes:
+
+- a new status must hold for ``ALERT_CONFIRM_CHECKS`` checks in a row to count;
+- a watcher with ``ALERT_FLAP_THRESHOLD`` confirmed changes inside
+  ``ALERT_FLAP_WINDOW_SECONDS`` is reported once as flapping, then kept quiet until a
+  whole window passes without a change;
+- notices are collected per workspace and mailed together ``ALERT_DIGEST_SECONDS``
+  after the first one, so an outage hitting fifty watchers is one email.
+
+State lives in Redis so the check engine and one-shot RQ jobs share it. A watcher has
+one pending check at a time, so its state is never updated from two places at once.
+"""
+
+import datetime as dt
+import json
+import logging
+import math
+import uuid
+from collections.abc import Mapping
+
+from redis import Redis
+from rq import Queue
+
+from . import metrics
+from .config import settings
+from .models import HealthEvent, HealthStatus
+from .utils import as_utc
+
+logger = logging.getLogger(__name__)
+
+STATE_KEY = "healther:alerts:state"
+DIGEST_PREFIX = "healther:alerts:digest:"
+SCHEDULED_PREFIX = "healther:alerts:digest-scheduled:"
+
+
+def digest_key(workspace_id: uuid.UUID) -> str:
+    return f"{DIGEST_PREFIX}{workspace_id}"
+
+
+def scheduled_key(workspace_id: uuid.UUID) -> str:
+    return f"{SCHEDULED_PREFIX}{workspace_id}"
+
+
+def _initial_state() -> dict:
+    # watchers start out healthy, so one that is down from its first check alerts too
+    return {
+        "status": HealthStatus.healthy.value,
+        "candidate": None,
+        "streak": 0,
+        "changes": [],
+        "flapping": False,
+    }
+
+
+def _notice(kind: str, event: HealthEvent, previous: str | None, status: str) -> dict:
+    return {
+        "kind": kind,
+        "watcher_id": str(event.watcher_id),
+        "previous": previous,
+        "status": status,
+        "at": as_utc(event.created_at).isoformat(),
+        "response_status": event.response_status,
+        "response_time_ms": event.response_time_ms,
+        "message": event.message,
+    }
+
+
+def advance(
+    state: dict | None,
+    event: HealthEvent,
+    *,
+    confirm_checks: int,
+    flap_window: float,
+    flap_threshold: int,
+) -> tuple[dict, dict | None]:
+    """Fold one check result into a watcher's alert state.
+
+    Returns the new state and the notice to send, if any: ``transition`` for a confirmed
+    status change, ``flapping`` when changes come too often and ``settled`` once they stop.
+    """
+    state = dict(state) if state else _initial_state()
+    status = HealthStatus(event.status).value
+    at = as_utc(event.created_at).timestamp()
+    state["changes"] = [changed for changed in state["changes"] if at - changed < flap_window]
+
+    if status == state["status"]:
+        state["candidate"], state["streak"] = None, 0
+    else:
+        if status == state["candidate"]:
+            state["streak"] += 1
+        else:
+            state["candidate"], state["streak"] = status, 1
+        if state["streak"] >= confirm_checks:
+            previous = state["status"]
+            state.update(status=status, candidate=None, streak=0)
+            state["changes"].append(at)
+            if state["flapping"]:
+                return state, None
+            if len(state["changes"]) >= flap_threshold:
+                state["flapping"] = True
+                return state, _notice("flapping", event, previous, status)
+            return state, _notice("transition", event, previous, status)
+
+    if state["flapping"] and not state["changes"]:
+        state["flapping"] = False
+        return state, _notice("settled", event, None, state["status"])
+    return state, None
+
+
+class AlertPipeline:
+    """Turns committed check results into digest notices, one Redis round trip per batch."""
+
+    def __init__(
+        self,
+        conn: Redis,
+        queue: Queue | None = None,
+        *,
+        confirm_checks: int | None = None,
+        flap_window_seconds: float | None = None,
+        flap_threshold: int | None = None,
+        digest_seconds: float | None = None,
+        digest_lost_seconds: float | None = None,
+    ) -> None:
+        self.conn = conn
+        self.queue = queue or Queue("email-alerts", connection=conn)
+        self.confirm_checks = confirm_checks or settings.alert_confirm_checks
+        self.flap_window = flap_window_seconds or settings.alert_flap_window_seconds
+        self.flap_threshold = flap_threshold or settings.alert_flap_threshold
+        self.digest_seconds = (
+            digest_seconds if digest_seconds is not None else settings.alert_digest_seconds
+        )
+        self.digest_lost_seconds = (
+            digest_lost_seconds
+            if digest_lost_seconds is not None
+            else settings.alert_digest_lost_seconds
+        )
+
+    def observe(
+        self, events: list[HealthEvent], workspace_ids: Mapping[uuid.UUID, uuid.UUID]
+    ) -> int:
+        """Advance alert state for committed ``events``; returns the number of notices."""
+        events = [event for event in events if event.watcher_id in workspace_ids]
+        if not events:
+            return 0
+        watcher_ids = list(dict.fromkeys(str(event.watcher_id) for event in events))
+        stored = {
+            watcher_id: json.loads(raw) if raw else None
+            for watcher_id, raw in zip(watcher_ids, self.conn.hmget(STATE_KEY, watcher_ids))
+        }
+        states = dict(stored)
+        notices: dict[uuid.UUID, list[dict]] = {}
+        for event in sorted(events, key=lambda event: as_utc(event.created_at)):
+            watcher_id = str(event.watcher_id)
+            states[watcher_id], notice = advance(
+                states[watcher_id],
+                event,
+                confirm_checks=self.confirm_checks,
+                flap_window=self.flap_window,
+                flap_threshold=self.flap_threshold,
+            )
+            if notice is not None:
+                notices.setdefault(workspace_ids[event.watcher_id], []).append(notice)
+
+        # steady watchers leave their state untouched, so a quiet fleet writes nothing
+        changed = {key: json.dumps(state) for key, state in states.items() if state != stored[key]}
+        if not changed and not notices:
+            return 0
+        pipe = self.conn.pipeline(transaction=False)
+        if changed:
+            pipe.hset(STATE_KEY, mapping=changed)
+        # the marker expires on its own, so a lost digest job cannot mute a workspace for good
+        marker_seconds = math.ceil(self.digest_seconds + self.digest_lost_seconds)
+        for workspace_id, items in notices.items():
+            pipe.rpush(digest_key(workspace_id), *(json.dumps(item) for item in items))
+            pipe.set(scheduled_key(workspace_id), 1, nx=True, ex=marker_seconds)
+        opened = pipe.execute()[1 if changed else 0 :][1::2]
+        for items in notices.values():
+            for item in items:
+                metrics.alert_notices.inc(item["kind"])
+        for workspace_id, is_new in zip(notices, opened):
+            if is_new:
+                # no digest is pending, so this opens a window: mail it when the window closes
+                self.queue.enqueue_in(
+                    dt.timedelta(seconds=self.digest_seconds),
+                    "healther.notifications.send_digest",
+                    workspace_id,
+                )
+        return sum(len(items) for items in notices.values())
+
+    def drain(self, workspace_id: uuid.UUID) -> list[dict]:
+        """Take every pending notice for a workspace; later ones open a new window."""
+        pipe = self.conn.pipeline(transaction=True)
+        pipe.lrange(digest_key(workspace_id), 0, -1)
+        pipe.delete(digest_key(workspace_id), scheduled_key(workspace_id))
+        items, _ = pipe.execute()
+        return [json.loads(item) for item in items]
+
+    def forget(self, watcher_id: uuid.UUID) -> None:
+        self.conn.hdel(STATE_KEY, str(watcher_id))
+
+
+alert_pipeline = AlertPipeline(Redis.from_url(settings.redis_url))
@@ -7,17 +7,42 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError
 from sqlmodel import select
 
+from .. import profiling
+from ..cache import MISSING, TTLCache
+from ..config import settings
 from ..db import get_session
-from ..models import Membership, Role, User
+from ..models import Membership, Role, Sentinel, User
 from ..schemas import TokenData
-from ..security import decode_token
+from ..security import decode_token, hash_sentinel_token
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/token")
 
+# users are cached as column values and rebuilt per request, so no instance is shared
+user_cache = TTLCache(settings.auth_cache_size, settings.auth_cache_ttl_seconds)
+role_cache = TTLCache(settings.auth_cache_size, settings.auth_cache_ttl_seconds)
+
+
+def auth_cache_collector():
+    """Metrics collector: size and hit/miss counts of this process's auth caches."""
+    caches = {"users": user_cache.stats(), "roles": role_cache.stats()}
+    for field, documentation in (
+        ("size", "Entries in the auth cache."),
+        ("hits", "Auth cache lookups answered from memory."),
+        ("misses", "Auth cache lookups that went to the database."),
+    ):
+        samples = [((name,), stats[field]) for name, stats in caches.items()]
+        yield f"healther_auth_cache_{field}", documentation, ("cache",), samples
+
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme), session=Depends(get_session)
 ) -> User:
+    with profiling.phase("auth"):
+        return await user_from_token(token, session)
+
+
+async def user_from_token(token: str, session) -> User:
+    """Resolve a bearer token to its user; also used where no header can be sent (SSE)."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -31,13 +56,17 @@ async def get_current_user(
         if user_id is None:
             raise credentials_exception
         token_data = TokenData(user_id=uuid.UUID(user_id))
-    except (JWTError, ValueError):
+    except (JWTError, ValueError):  # fmt: skip
         raise credentials_exception
 
+    cached = user_cache.get(token_data.user_id)
+    if cached is not MISSING:
+        return User(**cached)
     result = await session.exec(select(User).where(User.id == token_data.user_id))
     user = result.first()
     if user is None:
         raise credentials_exception
+    user_cache.set(user.id, user.model_dump())
     return user
 
 
@@ -46,14 +75,39 @@ async def get_workspace_role(
     current_user: User = Depends(get_current_user),
     session=Depends(get_session),
 ) -> Role:
-    result = await session.exec(
-        select(Membership.role).where(
-            Membership.workspace_id == workspace_id, Membership.user_id == current_user.id
+    key = (workspace_id, current_user.id)
+    cached = role_cache.get(key)
+    if cached is not MISSING:
+        return cached
+    with profiling.phase("auth"):
+        result = await session.exec(
+            select(Membership.role).where(
+                Membership.workspace_id == workspace_id, Membership.user_id == current_user.id
+            )
         )
-    )
-    role = result.first()
+        role = result.first()
     if role is None:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Not a member of this workspace"
         )
+    role_cache.set(key, role)
     return role
+
+
+async def get_current_sentinel(
+    token: str = Depends(oauth2_scheme), session=Depends(get_session)
+) -> Sentinel:
+    """Sentinels authenticate with their own opaque bearer token, never a user JWT."""
+    result = await session.exec(
+        select(Sentinel).where(
+            Sentinel.token_hash == hash_sentinel_token(token), Sentinel.is_active.is_(True)
+        )
+    )
+    sentinel = result.first()
+    if sentinel is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Unknown sentinel",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return sentinel
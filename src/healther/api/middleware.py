@@ -0,0 +1,141 @@
+"""ASGI middleware for the API."""
+
+import functools
+import inspect
+import logging
+import sys
+import time
+
+from fastapi.routing import APIRoute
+from starlette.datastructures import MutableHeaders
+
+from .. import metrics, profiling
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsMiddleware:
+    """Time every request under its route template, e.g. ``/api/v1/watchers/{watcher_id}``.
+
+    Plain ASGI rather than ``BaseHTTPMiddleware``, so streamed responses (SSE, exports)
+    pass through untouched. Requests that match no route share one ``unmatched`` label,
+    which keeps the number of series bounded however many URLs get probed.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # the router stores the matched route in the shared scope
+            route = getattr(scope.get("route"), "path", "unmatched")
+            metrics.http_request_duration.observe(
+                time.perf_counter() - started, scope["method"], route, str(status_code)
+            )
+
+
+class ProfilingMiddleware:
+    """Say where a request's time went in a ``Server-Timing`` header (``PROFILING_ENABLED``).
+
+    Requests slower than ``slow_request_ms`` are logged with the same breakdown and,
+    when a ``sampler`` is given, the stacks it caught while the request ran.
+    """
+
+    def __init__(
+        self, app, slow_request_ms: float, sampler: profiling.StackSampler | None = None
+    ) -> None:
+        self.app = app
+        self.slow_request_ms = slow_request_ms
+        self.sampler = sampler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with profiling.profile_request() as profile:
+            timing = None
+
+            async def send_with_timing(message):
+                nonlocal timing
+                if message["type"] == "http.response.start":
+                    timing = profile.server_timing(time.perf_counter())
+                    MutableHeaders(scope=message).append("Server-Timing", timing)
+                await send(message)
+
+            # samples are matched to this request by this coroutine's frame
+            frame = sys._getframe()
+            if self.sampler is not None:
+                self.sampler.register(frame, profile)
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                if self.sampler is not None:
+                    self.sampler.unregister(frame)
+                elapsed_ms = (time.perf_counter() - profile.started) * 1000
+                if elapsed_ms >= self.slow_request_ms:
+                    self._log_slow(scope, elapsed_ms, timing, profile)
+
+    def _log_slow(self, scope, elapsed_ms, timing, profile) -> None:
+        route = getattr(scope.get("route"), "path", scope["path"])
+        if profile.stacks:
+            logger.warning(
+                "Slow request %s %s (%.1f ms; %s); %d stack samples:\n%s",
+                scope["method"],
+                route,
+                elapsed_ms,
+                timing,
+                profile.stacks.total(),
+                profiling.format_stacks(profile.stacks),
+            )
+        else:
+            logger.warning(
+                "Slow request %s %s (%.1f ms; %s)", scope["method"], route, elapsed_ms, timing
+            )
+
+
+def _timed_endpoint(endpoint):
+    """Time the endpoint body as the ``app`` phase and note when it returned."""
+    if inspect.iscoroutinefunction(endpoint):
+
+        @functools.wraps(endpoint)
+        async def timed(*args, **kwargs):
+            with profiling.phase("app"):
+                result = await endpoint(*args, **kwargs)
+            profiling.mark_endpoint_done()
+            return result
+
+    else:
+
+        @functools.wraps(endpoint)
+        def timed(*args, **kwargs):
+            with profiling.phase("app"):
+                result = endpoint(*args, **kwargs)
+            profiling.mark_endpoint_done()
+            return result
+
+    return timed
+
+
+class ProfiledRoute(APIRoute):
+    """Route whose endpoint reports to the request profile.
+
+    That lets ``Server-Timing`` tell the handler apart from response validation and
+    serialization. Costs one context variable lookup when the request is not profiled.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs) -> None:
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
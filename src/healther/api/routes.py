@@ -1,44 +1,75 @@
 """API routes for auth, workspaces, watchers, and public status."""
 
+import asyncio
 import uuid
+from datetime import datetime
+from typing import Literal
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import Response, StreamingResponse
 from sqlmodel import select
 
-from ..api.deps import get_current_user, get_workspace_role
+from .. import live, snapshots
+from ..api.deps import (
+    get_current_sentinel,
+    get_current_user,
+    get_workspace_role,
+    role_cache,
+    user_cache,
+    user_from_token,
+)
+from ..api.middleware import ProfiledRoute
 from ..db import get_session
 from ..models import (
-    HealthEvent,
+    HealthStatus,
     Membership,
     NotificationRecipient,
     Role,
+    Sentinel,
     ServiceWatcher,
     User,
     Workspace,
 )
 from ..schemas import (
-    HealthEventOut,
+    HealthEventPage,
     InviteMemberRequest,
+    LatencyPercentilesOut,
     LoginRequest,
     MembershipUpdate,
+    PublicStatusOut,
+    PurgeStatusOut,
     RecipientCreate,
     RecipientOut,
     RecipientUpdate,
+    SentinelAssignmentOut,
+    SentinelBatchOut,
     Token,
     UserCreate,
     UserOut,
     UserUpdate,
     WatcherCreate,
+    WatcherImportOut,
     WatcherOut,
     WatcherUpdate,
     WorkspaceCreate,
     WorkspaceMember,
     WorkspaceOut,
+    WorkspaceOverviewOut,
+    WorkspaceUptimeOut,
 )
 from ..services import auth as auth_service
+from ..services import events as event_service
+from ..services import latency as latency_service
+from ..services import overview as overview_service
+from ..services import purge as purge_service
+from ..services import rollups as rollup_service
+from ..services import sentinels as sentinel_service
 from ..services import watchers as watcher_service
 
-router = APIRouter(prefix="/api/v1")
+router = APIRouter(prefix="/api/v1", route_class=ProfiledRoute)
+
+# one snapshot rebuild per workspace and process at a time
+_snapshot_rebuilds: dict[uuid.UUID, asyncio.Lock] = {}
 
 
 @router.post("/auth/register", response_model=UserOut, status_code=status.HTTP_201_CREATED)
@@ -52,6 +83,31 @@ async def login_for_access_token(payload: LoginRequest, session=Depends(get_sess
     return await auth_service.login_for_access_token(payload, session)
 
 
+@router.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@router.post("/sentinel/results", response_model=SentinelBatchOut)
+async def ingest_sentinel_results(
+    request: Request,
+    sentinel: Sentinel = Depends(get_current_sentinel),
+    session=Depends(get_session),
+):
+    # read raw: batches arrive gzip-compressed (Content-Encoding: gzip)
+    batch = sentinel_service.decode_batch(
+        await sentinel_service.read_body(request), request.headers.get("content-encoding")
+    )
+    return await sentinel_service.ingest_batch(sentinel, batch, session)
+
+
+@router.get("/sentinel/watchers", response_model=SentinelAssignmentOut)
+async def sentinel_watchers(
+    sentinel: Sentinel = Depends(get_current_sentinel), session=Depends(get_session)
+):
+    return await sentinel_service.sentinel_assignment(sentinel, session)
+
+
 @router.get("/me", response_model=UserOut)
 async def read_users_me(current_user: User = Depends(get_current_user)):
     return current_user
@@ -66,17 +122,20 @@ async def update_users_me(
     payload = data.model_dump(exclude_unset=True)
     if not payload:
         return current_user
+    # current_user may come from the auth cache; edit the row loaded in this session
+    user = await session.get(User, current_user.id)
     if ("first_name" in payload or "last_name" in payload) and "full_name" not in payload:
-        first = payload.get("first_name", current_user.first_name)
-        last = payload.get("last_name", current_user.last_name)
+        first = payload.get("first_name", user.first_name)
+        last = payload.get("last_name", user.last_name)
         full_name = " ".join([part for part in [first, last] if part])
         payload["full_name"] = full_name or None
     for key, value in payload.items():
-        setattr(current_user, key, value)
-    session.add(current_user)
+        setattr(user, key, value)
+    session.add(user)
     await session.commit()
-    await session.refresh(current_user)
-    return current_user
+    await session.refresh(user)
+    user_cache.invalidate(user.id)
+    return user
 
 
 @router.post("/workspaces", response_model=WorkspaceOut, status_code=status.HTTP_201_CREATED)
@@ -87,11 +146,7 @@ async def create_workspace(
 ):
     workspace = Workspace(name=data.name, is_public=data.is_public)
     session.add(workspace)
-    await session.commit()
-    await session.refresh(workspace)
-
-    membership = Membership(workspace_id=workspace.id, user_id=current_user.id, role=Role.owner)
-    session.add(membership)
+    session.add(Membership(workspace_id=workspace.id, user_id=current_user.id, role=Role.owner))
     await session.commit()
     return workspace
 
@@ -166,6 +221,7 @@ async def invite_member(
     membership = Membership(workspace_id=workspace_id, user_id=invited_user.id, role=payload.role)
     session.add(membership)
     await session.commit()
+    role_cache.invalidate((workspace_id, invited_user.id))
     return WorkspaceMember(
         workspace_id=workspace_id,
         user_id=invited_user.id,
@@ -188,13 +244,20 @@ async def update_member_role(
 ):
     role = await get_workspace_role(workspace_id, current_user, session)
     _require_admin_or_owner(role)
-    membership = await session.get(Membership, (workspace_id, user_id))
-    if not membership:
+    # the member's user row comes along, so the response needs no query after the commit
+    result = await session.exec(
+        select(Membership, User)
+        .join(User, Membership.user_id == User.id)
+        .where(Membership.workspace_id == workspace_id, Membership.user_id == user_id)
+    )
+    row = result.first()
+    if not row:
         raise HTTPException(status_code=404, detail="Membership not found")
+    membership, user = row
     membership.role = data.role
     session.add(membership)
     await session.commit()
-    user = await session.get(User, user_id)
+    role_cache.invalidate((workspace_id, user_id))
     return WorkspaceMember(
         workspace_id=workspace_id,
         user_id=user_id,
@@ -222,6 +285,7 @@ async def remove_member(
     session.add(membership)
     await session.delete(membership)
     await session.commit()
+    role_cache.invalidate((workspace_id, user_id))
     return None
 
 
@@ -330,6 +394,41 @@ async def create_watcher(
     return watcher
 
 
+@router.post(
+    "/workspaces/{workspace_id}/watchers/import",
+    response_model=WatcherImportOut,
+    status_code=status.HTTP_201_CREATED,
+)
+async def import_watchers(
+    workspace_id: uuid.UUID,
+    request: Request,
+    role: Role = Depends(get_workspace_role),
+    session=Depends(get_session),
+):
+    # read raw: the list may come as JSON or as YAML
+    items = watcher_service.parse_watcher_import(
+        await request.body(), request.headers.get("content-type")
+    )
+    return await watcher_service.import_watchers(workspace_id, items, role, session)
+
+
+@router.get("/workspaces/{workspace_id}/watchers/export")
+async def export_watchers(
+    workspace_id: uuid.UUID,
+    format: Literal["json", "yaml"] = "json",
+    role: Role = Depends(get_workspace_role),
+    session=Depends(get_session),
+):
+    export = await watcher_service.export_watchers(workspace_id, session)
+    body, media_type = watcher_service.dump_watchers(export, format)
+    filename = f"healther-watchers-{workspace_id}.{format}"
+    return Response(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
 @router.patch("/watchers/{watcher_id}", response_model=WatcherOut)
 async def update_watcher(
     watcher_id: uuid.UUID,
@@ -338,25 +437,42 @@ async def update_watcher(
     session=Depends(get_session),
 ):
     watcher = await session.get(ServiceWatcher, watcher_id)
-    if not watcher:
+    if not watcher or watcher.deleted_at is not None:
         raise HTTPException(status_code=404, detail="Watcher not found")
     role = await get_workspace_role(watcher.workspace_id, current_user, session)
     updated = await watcher_service.update_watcher(watcher, data, role, session)
     return updated
 
 
-@router.delete("/watchers/{watcher_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete(
+    "/watchers/{watcher_id}",
+    response_model=PurgeStatusOut,
+    status_code=status.HTTP_202_ACCEPTED,
+)
 async def delete_watcher(
     watcher_id: uuid.UUID,
     current_user: User = Depends(get_current_user),
     session=Depends(get_session),
 ):
     watcher = await session.get(ServiceWatcher, watcher_id)
-    if not watcher:
+    if not watcher or watcher.deleted_at is not None:
         raise HTTPException(status_code=404, detail="Watcher not found")
     role = await get_workspace_role(watcher.workspace_id, current_user, session)
-    await watcher_service.delete_watcher(watcher, role, session)
-    return None
+    return await watcher_service.delete_watcher(watcher, role, session)
+
+
+@router.get("/watchers/{watcher_id}/purge", response_model=PurgeStatusOut)
+async def watcher_purge_status(
+    watcher_id: uuid.UUID,
+    current_user: User = Depends(get_current_user),
+    session=Depends(get_session),
+):
+    # the watcher row is gone once the purge finishes, so access is checked via the job
+    progress = purge_service.purge_status(watcher_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="No purge for this watcher")
+    await get_workspace_role(uuid.UUID(progress["workspace_id"]), current_user, session)
+    return progress
 
 
 @router.get("/workspaces/{workspace_id}/watchers", response_model=list[WatcherOut])
@@ -370,51 +486,199 @@ async def list_watchers(
     return await watcher_service.list_watchers(workspace_id, session)
 
 
-@router.get("/workspaces/{workspace_id}/events", response_model=list[HealthEventOut])
+@router.get("/workspaces/{workspace_id}/overview", response_model=WorkspaceOverviewOut)
+async def workspace_overview(
+    workspace_id: uuid.UUID,
+    current_user: User = Depends(get_current_user),
+    session=Depends(get_session),
+):
+    await get_workspace_role(workspace_id, current_user, session)
+    return await overview_service.workspace_overview(workspace_id, session)
+
+
+def event_filters(
+    since: datetime | None = None,
+    until: datetime | None = None,
+    status: HealthStatus | None = None,
+    cursor: str | None = None,
+    limit: int = Query(100, ge=1, le=1000),
+) -> dict:
+    """Query parameters shared by the paginated event listings."""
+    return {"since": since, "until": until, "status": status, "cursor": cursor, "limit": limit}
+
+
+@router.get("/workspaces/{workspace_id}/events", response_model=HealthEventPage)
 async def list_workspace_events(
     workspace_id: uuid.UUID,
+    filters: dict = Depends(event_filters),
+    current_user: User = Depends(get_current_user),
+    session=Depends(get_session),
+):
+    await get_workspace_role(workspace_id, current_user, session)
+    return await event_service.list_events_page(session, workspace_id=workspace_id, **filters)
+
+
+_EXPORT_FORMATS = {
+    "ndjson": (event_service.export_ndjson, "application/x-ndjson"),
+    "csv": (event_service.export_csv, "text/csv"),
+}
+
+
+@router.get("/workspaces/{workspace_id}/events/export")
+async def export_workspace_events(
+    workspace_id: uuid.UUID,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    watcher_id: uuid.UUID | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    status: HealthStatus | None = None,
     current_user: User = Depends(get_current_user),
     session=Depends(get_session),
 ):
+    """Stream the full event history, oldest first, without buffering it in memory."""
     await get_workspace_role(workspace_id, current_user, session)
-    events = await session.exec(
-        select(HealthEvent).join(ServiceWatcher).where(ServiceWatcher.workspace_id == workspace_id)
+    export, media_type = _EXPORT_FORMATS[format]
+    rows = export(
+        session,
+        workspace_id=workspace_id,
+        watcher_id=watcher_id,
+        since=since,
+        until=until,
+        status=status,
+    )
+    filename = f"healther-events-{workspace_id}.{format}"
+    return StreamingResponse(
+        rows,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
-    return events.all()
 
 
-@router.get("/watchers/{watcher_id}/events", response_model=list[HealthEventOut])
+def _live_response(workspace_id: uuid.UUID) -> StreamingResponse:
+    return StreamingResponse(
+        live.sse_stream(workspace_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# SSE streams stay open for minutes, so these routes release their DB session before
+# streaming, and take the token as a query parameter because EventSource sends no headers.
+@router.get("/workspaces/{workspace_id}/live")
+async def workspace_live(
+    workspace_id: uuid.UUID,
+    token: str,
+    session=Depends(get_session, scope="function"),
+):
+    current_user = await user_from_token(token, session)
+    await get_workspace_role(workspace_id, current_user, session)
+    return _live_response(workspace_id)
+
+
+@router.get("/workspaces/{workspace_id}/uptime", response_model=WorkspaceUptimeOut)
+async def workspace_uptime(
+    workspace_id: uuid.UUID,
+    days: int = Query(90, ge=1, le=365),
+    current_user: User = Depends(get_current_user),
+    session=Depends(get_session),
+):
+    await get_workspace_role(workspace_id, current_user, session)
+    return await rollup_service.workspace_uptime(workspace_id, session, days=days)
+
+
+@router.get("/watchers/{watcher_id}/events", response_model=HealthEventPage)
 async def list_events(
     watcher_id: uuid.UUID,
+    filters: dict = Depends(event_filters),
     current_user: User = Depends(get_current_user),
     session=Depends(get_session),
 ):
     result = await session.exec(select(ServiceWatcher).where(ServiceWatcher.id == watcher_id))
     watcher = result.first()
-    if not watcher:
+    if not watcher or watcher.deleted_at is not None:
+        raise HTTPException(status_code=404, detail="Watcher not found")
+    await get_workspace_role(watcher.workspace_id, current_user, session)
+    return await event_service.list_events_page(session, watcher_id=watcher_id, **filters)
+
+
+@router.get("/watchers/{watcher_id}/latency", response_model=LatencyPercentilesOut)
+async def watcher_latency(
+    watcher_id: uuid.UUID,
+    window: Literal["1h", "24h", "7d", "90d"] = "24h",
+    current_user: User = Depends(get_current_user),
+    session=Depends(get_session),
+):
+    watcher = await session.get(ServiceWatcher, watcher_id)
+    if not watcher or watcher.deleted_at is not None:
         raise HTTPException(status_code=404, detail="Watcher not found")
     await get_workspace_role(watcher.workspace_id, current_user, session)
-    events = await session.exec(select(HealthEvent).where(HealthEvent.watcher_id == watcher_id))
-    return events.all()
+    return await latency_service.latency_percentiles(watcher_id, session, window=window)
 
 
-@router.get("/public/workspaces/{workspace_id}/events", response_model=list[HealthEventOut])
-async def public_events(workspace_id: uuid.UUID, session=Depends(get_session)):
+@router.get("/public/workspaces/{workspace_id}/events", response_model=HealthEventPage)
+async def public_events(
+    workspace_id: uuid.UUID,
+    filters: dict = Depends(event_filters),
+    session=Depends(get_session),
+):
+    # public history is the snapshot's incidents: the latest non-healthy events
+    snapshot = await _public_snapshot(workspace_id, session)
+    return event_service.events_page(snapshot.incidents, **filters)
+
+
+@router.get("/public/workspaces/{workspace_id}/live")
+async def public_live(workspace_id: uuid.UUID, session=Depends(get_session, scope="function")):
     workspace = await session.get(Workspace, workspace_id)
     if not workspace or not workspace.is_public:
         raise HTTPException(status_code=404, detail="Workspace not public")
-    events = await session.exec(
-        select(HealthEvent).join(ServiceWatcher).where(ServiceWatcher.workspace_id == workspace_id)
-    )
-    return events.all()
+    return _live_response(workspace_id)
+
+
+@router.get("/public/workspaces/{workspace_id}/uptime", response_model=WorkspaceUptimeOut)
+async def public_uptime(
+    workspace_id: uuid.UUID,
+    days: int = Query(90, ge=1, le=365),
+    session=Depends(get_session),
+):
+    snapshot = await _public_snapshot(workspace_id, session)
+    if snapshot.uptime.days == days:
+        return snapshot.uptime
+    return await rollup_service.workspace_uptime(workspace_id, session, days=days)
 
 
 @router.get("/public/workspaces/{workspace_id}/watchers", response_model=list[WatcherOut])
 async def public_watchers(workspace_id: uuid.UUID, session=Depends(get_session)):
-    workspace = await session.get(Workspace, workspace_id)
-    if not workspace or not workspace.is_public:
+    snapshot = await _public_snapshot(workspace_id, session)
+    return snapshot.watchers
+
+
+@router.get("/public/workspaces/{workspace_id}/status", response_model=PublicStatusOut)
+async def public_status(workspace_id: uuid.UUID, session=Depends(get_session)):
+    return await _public_snapshot(workspace_id, session)
+
+
+async def _public_snapshot(workspace_id: uuid.UUID, session) -> PublicStatusOut:
+    """Serve the precomputed snapshot, building it after a miss.
+
+    Concurrent misses in this process wait for a single rebuild and then read its result.
+    A workspace that turns out private or missing is remembered for
+    ``SNAPSHOT_NOT_PUBLIC_TTL_SECONDS``.
+    """
+    snapshot = snapshots.load_snapshot(workspace_id)
+    if snapshot is None and snapshots.not_public_cache.get(workspace_id) is not True:
+        lock = _snapshot_rebuilds.setdefault(workspace_id, asyncio.Lock())
+        try:
+            async with lock:
+                snapshot = snapshots.load_snapshot(workspace_id)
+                if snapshot is None and snapshots.not_public_cache.get(workspace_id) is not True:
+                    snapshot = await snapshots.build_snapshot(workspace_id, session)
+                    if snapshot is None:
+                        snapshots.not_public_cache.set(workspace_id, True)
+                    else:
+                        snapshots.save_snapshot(workspace_id, snapshot)
+        finally:
+            if not lock.locked():
+                _snapshot_rebuilds.pop(workspace_id, None)
+    if snapshot is None:
         raise HTTPException(status_code=404, detail="Workspace not public")
-    result = await session.exec(
-        select(ServiceWatcher).where(ServiceWatcher.workspace_id == workspace_id)
-    )
-    return result.all()
+    return snapshot
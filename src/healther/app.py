@@ -1,14 +1,54 @@
 """Application factory for Healther FastAPI app."""
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
+from . import alerts, db, live, metrics, profiling, scheduler, snapshots
+from .api.deps import auth_cache_collector
+from .api.middleware import MetricsMiddleware, ProfilingMiddleware
 from .api.routes import router
+from .config import settings
 from .db import lifespan
+from .live import broadcaster
+from .services import purge
+
+
+@asynccontextmanager
+async def _lifespan(app):
+    async with lifespan(app):
+        yield
+    await broadcaster.aclose()
+
+
+async def _metrics() -> Response:
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+def _add_profiling(app: FastAPI) -> None:
+    profiling.instrument_engine(db.engine.sync_engine, settings.profiling_slow_query_ms)
+    for conn in (
+        scheduler.check_scheduler.conn,
+        alerts.alert_pipeline.conn,
+        live.live_publisher.conn,
+        purge.purge_queue.connection,
+        getattr(snapshots.snapshot_store, "conn", None),
+    ):
+        if conn is not None:
+            profiling.instrument_redis(conn)
+    sampler = None
+    if settings.profiling_stack_sampling:
+        sampler = profiling.StackSampler(settings.profiling_sample_interval_ms / 1000)
+    app.add_middleware(
+        ProfilingMiddleware,
+        slow_request_ms=settings.profiling_slow_request_ms,
+        sampler=sampler,
+    )
 
 
 def create_app() -> FastAPI:
-    app = FastAPI(title="Healther", lifespan=lifespan, docs_url="/docs")
+    app = FastAPI(title="Healther", lifespan=_lifespan, docs_url="/docs")
 
     app.add_middleware(
         CORSMiddleware,
@@ -22,6 +62,12 @@ def create_app() -> FastAPI:
     )
 
     app.include_router(router)
+    if settings.metrics_enabled:
+        app.add_middleware(MetricsMiddleware)
+        app.add_api_route("/metrics", _metrics, include_in_schema=False)
+        metrics.registry.add_collector(auth_cache_collector)
+    if settings.profiling_enabled:
+        _add_profiling(app)
     return app
 
 
@@ -0,0 +1,423 @@
+"""Long-lived asyncio check engine.
+
+Runs many watcher checks concurrently inside one event loop and one DB pool, instead of
+forking an RQ work horse and starting a fresh loop per check. With
+``CHECK_BACKEND=sharded`` several engines split the watchers between them by consistent
+hashing (``ShardedCheckEngine``).
+"""
+
+import asyncio
+import logging
+import signal
+import time
+import uuid
+
+from redis import Redis
+from sqlmodel import select
+
+from . import db, metrics
+from .alerts import alert_pipeline
+from .config import settings
+from .event_sink import EventSink
+from .http_client import http_clients
+from .live import live_publisher
+from .models import ServiceWatcher
+from .scheduler import CheckScheduler, LocalScheduler, check_scheduler
+from .services.purge import purge_deleted
+from .services.retention import apply_retention
+from .services.watchers import _interval_as_timedelta, check_config, run_http_check
+from .sharding import HashRing, ShardMembership
+from .snapshots import SnapshotRefresher
+
+logger = logging.getLogger(__name__)
+
+# watchers fetched per IN (...) list when a shard reloads its slice
+_LOAD_CHUNK = 1000
+
+
+class CheckStats:
+    """Throughput counters reported periodically by the engine."""
+
+    def __init__(self) -> None:
+        self.completed = 0
+        self.failed = 0
+        self._window_started = time.monotonic()
+        self._window_completed = 0
+
+    def record(self, ok: bool) -> None:
+        self.completed += 1
+        self._window_completed += 1
+        if not ok:
+            self.failed += 1
+
+    def rate(self) -> float:
+        """Checks per second since the previous call."""
+        now = time.monotonic()
+        elapsed = now - self._window_started
+        rate = self._window_completed / elapsed if elapsed > 0 else 0.0
+        self._window_started = now
+        self._window_completed = 0
+        return rate
+
+
+class CheckEngine:
+    """Runs the checks the central schedule says are due, with a bound on concurrency."""
+
+    def __init__(
+        self,
+        concurrency: int | None = None,
+        session_factory=None,
+        sink: EventSink | None = None,
+        scheduler: CheckScheduler | None = None,
+    ) -> None:
+        self.concurrency = concurrency or settings.check_concurrency
+        self.session_factory = session_factory or db.SessionLocal
+        self.scheduler = check_scheduler if scheduler is None else scheduler
+        self.sink = sink or EventSink(self.session_factory)
+        self.sink.listeners.append(self._alert)
+        self.sink.listeners.append(self._mark_snapshots)
+        self.sink.listeners.append(self._publish_live)
+        self.snapshots = SnapshotRefresher(self.session_factory)
+        self.stats = CheckStats()
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._watchers: dict[uuid.UUID, ServiceWatcher] = {}
+        self._completed: dict[uuid.UUID, float] = {}
+        # when each watcher's last check ended, to spot checks an edit moved forward
+        self._finished: dict[uuid.UUID, float] = {}
+        self._in_flight: set[uuid.UUID] = set()
+        self._tasks: set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+        self._retention: asyncio.Task | None = None
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    async def refresh(self) -> None:
+        """Reload watchers and add the ones the schedule has never seen."""
+        async with self.session_factory() as session:
+            result = await session.exec(
+                select(ServiceWatcher).where(ServiceWatcher.deleted_at.is_(None))
+            )
+            watchers = {watcher.id: watcher for watcher in result.all()}
+        self._seed_live(watchers.values())
+        self.scheduler.add_many(
+            {
+                watcher_id: _interval_as_timedelta(watchers[watcher_id]).total_seconds()
+                for watcher_id in watchers.keys() - self._watchers.keys()
+            }
+        )
+        self._watchers = watchers
+        self._forget_finished()
+
+    def _seed_live(self, watchers) -> None:
+        # a restarted engine still reports the first flip against the stored status
+        live_publisher.seed(
+            {watcher.id: watcher.last_status for watcher in watchers if watcher.last_status}
+        )
+
+    def _forget_finished(self) -> None:
+        self._finished = {
+            watcher_id: finished
+            for watcher_id, finished in self._finished.items()
+            if watcher_id in self._watchers
+        }
+
+    async def _load_watchers(self, watcher_ids: list[uuid.UUID]) -> None:
+        """Fetch watchers that are new or edited since the last refresh; cancel ones that
+        no longer exist."""
+        async with self.session_factory() as session:
+            result = await session.exec(
+                select(ServiceWatcher).where(
+                    ServiceWatcher.id.in_(watcher_ids), ServiceWatcher.deleted_at.is_(None)
+                )
+            )
+            found = {watcher.id: watcher for watcher in result.all()}
+        self._watchers.update(found)
+        self._seed_live(found.values())
+        for watcher_id in watcher_ids:
+            if watcher_id not in found:
+                self.scheduler.cancel(watcher_id)
+                if watcher_id not in self._in_flight:
+                    self._watchers.pop(watcher_id, None)
+
+    def _rescheduled(self, watcher_id: uuid.UUID) -> bool:
+        """Claimed sooner than its interval allows: an edit moved the check to now."""
+        finished = self._finished.get(watcher_id)
+        if finished is None:
+            return False
+        interval = _interval_as_timedelta(self._watchers[watcher_id]).total_seconds()
+        return time.time() - finished < interval * (1 - self.scheduler.jitter_ratio)
+
+    async def dispatch(self) -> int:
+        """Claim due watchers, no more than there are free slots, and start their checks."""
+        claimed = self.scheduler.claim_due(limit=self.concurrency - self.in_flight)
+        # edits reach this process through the schedule before the next refresh does
+        stale = [
+            watcher_id
+            for watcher_id in claimed
+            if watcher_id not in self._watchers or self._rescheduled(watcher_id)
+        ]
+        if stale:
+            await self._load_watchers(stale)
+        started = 0
+        for watcher_id in claimed:
+            watcher = self._watchers.get(watcher_id)
+            if watcher is None or watcher_id in self._in_flight:
+                continue
+            self._in_flight.add(watcher_id)
+            task = asyncio.create_task(self._run_one(watcher))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            started += 1
+        return started
+
+    def flush_schedule(self) -> None:
+        """Write the next run of every finished check to the schedule in one round trip."""
+        completed, self._completed = self._completed, {}
+        self.scheduler.complete_many(completed)
+
+    async def _run_one(self, watcher: ServiceWatcher) -> None:
+        ok = True
+        try:
+            async with self._semaphore:
+                event = await run_http_check(watcher)
+            await self.sink.add(event)
+        except Exception:
+            ok = False
+            logger.exception("Check failed for watcher %s", watcher.id)
+        finally:
+            self.stats.record(ok)
+            self._in_flight.discard(watcher.id)
+            self._finished[watcher.id] = time.time()
+            self._completed[watcher.id] = _interval_as_timedelta(watcher).total_seconds()
+
+    def _workspace_ids(self, events) -> dict[uuid.UUID, uuid.UUID]:
+        return {
+            event.watcher_id: self._watchers[event.watcher_id].workspace_id
+            for event in events
+            if event.watcher_id in self._watchers
+        }
+
+    def _alert(self, events) -> None:
+        alert_pipeline.observe(events, self._workspace_ids(events))
+
+    def _mark_snapshots(self, events) -> None:
+        """Flag the public snapshots of workspaces that just got new events."""
+        self.snapshots.mark_dirty(self._workspace_ids(events).values())
+
+    def _publish_live(self, events) -> None:
+        live_publisher.publish(events, self._workspace_ids(events))
+
+    def start_retention(self) -> None:
+        """Archive expired events and purge deleted watchers unless a run is still going."""
+        if self._retention is None or self._retention.done():
+            self._retention = asyncio.create_task(self._run_retention())
+
+    async def _run_retention(self) -> None:
+        try:
+            async with self.session_factory() as session:
+                await apply_retention(session)
+                await purge_deleted(session)
+        except Exception:
+            logger.exception("Retention run failed")
+
+    def report(self) -> None:
+        sink = self.sink.stats
+        logger.info(
+            "checks/sec=%.2f completed=%d failed=%d in_flight=%d watchers=%d "
+            "flushes=%d batch_mean=%.1f batch_max=%d flush_ms_mean=%.1f flush_ms_max=%.1f "
+            "pending=%d",
+            self.stats.rate(),
+            self.stats.completed,
+            self.stats.failed,
+            self.in_flight,
+            len(self._watchers),
+            sink.flushes,
+            sink.mean_batch_size,
+            sink.max_batch_size,
+            sink.mean_flush_seconds * 1000,
+            sink.max_flush_seconds * 1000,
+            self.sink.pending,
+        )
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def run(self) -> None:
+        """Main loop: refresh watchers, dispatch due checks and report until stopped."""
+        last_refresh = last_report = last_retention = float("-inf")
+        flusher = asyncio.create_task(self.sink.run(self._stopping))
+        refresher = asyncio.create_task(self.snapshots.run(self._stopping))
+        while not self._stopping.is_set():
+            now = time.monotonic()
+            if self._refresh_due(now - last_refresh):
+                await self.refresh()
+                last_refresh = now
+            self.flush_schedule()
+            await self.dispatch()
+            if now - last_retention >= settings.retention_interval_seconds:
+                self.start_retention()
+                last_retention = now
+            if now - last_report >= settings.check_report_seconds:
+                self.report()
+                last_report = now
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self._sleep_for())
+            except TimeoutError:
+                pass
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self.flush_schedule()
+        await flusher
+        await self.sink.flush()
+        await refresher
+        if self._retention is not None:
+            await self._retention
+        await self.snapshots.refresh_dirty()
+        self.report()
+
+    def _refresh_due(self, since_refresh: float) -> bool:
+        return since_refresh >= settings.check_refresh_seconds
+
+    def _sleep_for(self) -> float:
+        next_due = self.scheduler.next_due()
+        if next_due is None:
+            return 1.0
+        return min(max(next_due - time.time(), 0.05), 1.0)
+
+
+class ShardedCheckEngine(CheckEngine):
+    """A check engine that owns a consistent-hash slice of the watchers.
+
+    Shards find each other through heartbeats in Redis and rebuild the ring whenever one
+    joins or leaves, then pick up or drop watchers at once. The schedule of the slice is
+    kept in memory, so each watcher is always checked from the same process and reuses
+    that process's keep-alive connections. Edits made through the API reach the shard on
+    its next refresh and move the watcher's check to now, as the central schedule does.
+    """
+
+    def __init__(self, membership: ShardMembership | None = None, **options) -> None:
+        options.setdefault("scheduler", LocalScheduler())
+        super().__init__(**options)
+        self.membership = membership or ShardMembership(Redis.from_url(settings.redis_url))
+        self.ring = HashRing([])
+        self._last_heartbeat = float("-inf")
+
+    @property
+    def shard_id(self) -> str:
+        return self.membership.shard_id
+
+    def owns(self, key) -> bool:
+        return self.ring.owner(key) == self.shard_id
+
+    def heartbeat(self) -> bool:
+        """Beat and rebuild the ring; ``True`` when the set of live shards changed."""
+        self._last_heartbeat = time.monotonic()
+        members = self.membership.heartbeat()
+        if members == self.ring.members:
+            return False
+        logger.info("Shard %s sees %d live shards: %s", self.shard_id, len(members), members)
+        self.ring = HashRing(members)
+        return True
+
+    async def refresh(self) -> None:
+        """Reload the owned watchers: add new ones, drop lost ones, recheck edited ones."""
+        async with self.session_factory() as session:
+            result = await session.exec(
+                select(ServiceWatcher.id).where(ServiceWatcher.deleted_at.is_(None))
+            )
+            owned = [watcher_id for watcher_id in result.all() if self.owns(watcher_id)]
+            watchers: dict[uuid.UUID, ServiceWatcher] = {}
+            for start in range(0, len(owned), _LOAD_CHUNK):
+                result = await session.exec(
+                    select(ServiceWatcher).where(
+                        ServiceWatcher.id.in_(owned[start : start + _LOAD_CHUNK])
+                    )
+                )
+                watchers.update((watcher.id, watcher) for watcher in result.all())
+        self._seed_live(watchers.values())
+        for watcher_id in self._watchers.keys() - watchers.keys():
+            # deleted, or now owned by another shard
+            self.scheduler.cancel(watcher_id)
+        self.scheduler.add_many(
+            {
+                watcher_id: _interval_as_timedelta(watcher).total_seconds()
+                for watcher_id, watcher in watchers.items()
+                if watcher_id not in self._watchers
+            }
+        )
+        for watcher_id, watcher in watchers.items():
+            previous = self._watchers.get(watcher_id)
+            if previous is not None and check_config(previous) != check_config(watcher):
+                self.scheduler.reschedule(watcher_id)
+        # checks still running for dropped watchers need their workspace when they land
+        for watcher_id in self._in_flight - watchers.keys():
+            if watcher_id in self._watchers:
+                watchers[watcher_id] = self._watchers[watcher_id]
+        self._watchers = watchers
+        self._forget_finished()
+        logger.info("Shard %s owns %d watchers", self.shard_id, len(self.scheduler))
+
+    def start_retention(self) -> None:
+        # one shard runs retention for everyone: whichever owns the job's key
+        if self.owns("retention"):
+            super().start_retention()
+
+    def _refresh_due(self, since_refresh: float) -> bool:
+        if time.monotonic() - self._last_heartbeat >= settings.shard_heartbeat_seconds:
+            if self.heartbeat():
+                return True
+        return super()._refresh_due(since_refresh)
+
+    async def run(self) -> None:
+        try:
+            await super().run()
+        finally:
+            self.membership.leave()
+
+
+def _engine_collector(engine: CheckEngine):
+    conn = Redis.from_url(settings.redis_url)
+    # shards keep their schedule in memory; the central one only matters to plain engines
+    schedule_key = None if isinstance(engine, ShardedCheckEngine) else check_scheduler.key
+    schedule = metrics.queue_collector(conn, [], schedule_key=schedule_key)
+
+    def collect():
+        yield "healther_checks_in_flight", "Checks running now.", (), [((), engine.in_flight)]
+        yield (
+            "healther_event_sink_pending",
+            "Check results waiting to be written.",
+            (),
+            [((), engine.sink.pending)],
+        )
+        yield from schedule()
+
+    return collect
+
+
+async def _main_async() -> None:
+    engine = ShardedCheckEngine() if settings.check_backend == "sharded" else CheckEngine()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, engine.stop)
+    if settings.metrics_enabled:
+        metrics.registry.add_collector(_engine_collector(engine))
+        metrics.serve_metrics(settings.metrics_port)
+    logger.info("Check engine started with concurrency=%d", engine.concurrency)
+    if isinstance(engine, ShardedCheckEngine):
+        logger.info("Running as shard %s", engine.shard_id)
+    try:
+        await engine.run()
+    finally:
+        await http_clients.aclose()
+        await db.engine.dispose()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main_async())
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,11 @@ class Settings(BaseSettings):
     secret_key: str = "dev-secret-change-me"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 60
+    # per-process cache of users and workspace roles looked up by auth dependencies
+    auth_cache_ttl_seconds: float = 30.0
+    auth_cache_size: int = 10_000
+    # threads hashing passwords per process; requests beyond this wait off the event loop
+    password_hash_workers: int = 4
 
     # database config (prefer individual vars; DATABASE_URL optional override)
     database_url: str | None = None
@@ -26,6 +31,91 @@ class Settings(BaseSettings):
     smtp_host: str = "mailhog"
     smtp_port: int = 1025
 
+    # alerts fire on confirmed status transitions and are mailed as per-workspace digests
+    alert_confirm_checks: int = 2
+    alert_flap_window_seconds: float = 3600.0
+    alert_flap_threshold: int = 4
+    alert_digest_seconds: float = 60.0
+    # a digest job still not run this long after its window closed is taken as lost
+    alert_digest_lost_seconds: float = 300.0
+
+    # health checks: "rq" runs one RQ job per check, "engine" uses the long-lived check engine,
+    # "sharded" runs several engines that split the watchers between them
+    check_backend: str = "rq"
+    check_concurrency: int = 200
+    check_refresh_seconds: float = 30.0
+    check_report_seconds: float = 60.0
+    # central schedule (Redis sorted set): claimed checks re-fire after the lease
+    scheduler_lease_seconds: float = 300.0
+    scheduler_jitter_ratio: float = 0.05
+    scheduler_initial_jitter_seconds: float = 60.0
+    scheduler_batch_size: int = 1000
+    # bulk watcher import: most watchers accepted per request
+    watcher_import_max: int = 5000
+    event_batch_size: int = 500
+    event_flush_seconds: float = 1.0
+    event_max_pending: int = 50_000
+    # sentinels: remote runners that check watchers and ship results in batches
+    sentinel_max_batch: int = 5000
+    sentinel_max_body_bytes: int = 10_000_000
+    sentinel_max_skew_seconds: float = 300.0
+    sentinel_max_age_seconds: float = 86400.0
+    sentinel_api_url: str = "http://api:8000/api/v1"
+    sentinel_token: str | None = None
+    sentinel_flush_seconds: float = 60.0
+    sentinel_refresh_seconds: float = 300.0
+    sentinel_max_buffer: int = 50_000
+
+    # sharded engines: heartbeats in Redis decide which shards are alive
+    shard_id: str | None = None
+    shard_heartbeat_seconds: float = 5.0
+    shard_ttl_seconds: float = 15.0
+    shard_vnodes: int = 64
+
+    # public status page snapshots: "redis" or "disk"
+    snapshot_backend: str = "redis"
+    snapshot_dir: str = "./snapshots"
+    snapshot_min_interval_seconds: float = 10.0
+    snapshot_recent_latencies: int = 60
+    snapshot_incidents: int = 20
+    # per API process: ids found private or missing are not looked up again for a while
+    snapshot_not_public_ttl_seconds: float = 60.0
+    snapshot_not_public_cache_size: int = 10_000
+
+    # raw events older than the window move to gzip segments under archive_dir
+    retention_days: int = 90
+    retention_chunk_size: int = 5000
+    retention_interval_seconds: float = 3600.0
+    archive_dir: str = "./archive"
+    # deleted watchers are purged in the background, one chunk of rows per transaction
+    purge_chunk_size: int = 5000
+    purge_job_timeout_seconds: int = 3600
+    purge_status_ttl_seconds: int = 86400
+
+    # Prometheus metrics: GET /metrics on the API, a listener on METRICS_PORT elsewhere
+    metrics_enabled: bool = True
+    metrics_port: int = 9100
+
+    # opt-in request profiling: Server-Timing header, SQL counts, slow query/request logs
+    profiling_enabled: bool = False
+    profiling_slow_query_ms: float = 100.0
+    profiling_slow_request_ms: float = 500.0
+    # sample the event loop's stack while requests run; slow requests log the samples
+    profiling_stack_sampling: bool = False
+    profiling_sample_interval_ms: float = 5.0
+
+    # live SSE feed
+    live_queue_size: int = 100
+    live_heartbeat_seconds: float = 15.0
+
+    # outbound HTTP pool shared by checks
+    http_timeout_seconds: float = 10.0
+    http_max_connections: int = 500
+    http_max_keepalive_connections: int = 100
+    http_keepalive_expiry_seconds: float = 30.0
+    http_per_host_limit: int = 20
+    http2: bool = False
+
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", extra="ignore")
 
 
@@ -9,6 +9,7 @@ from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlmodel import SQLModel
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+from . import metrics
 from .config import settings
 
 
@@ -36,6 +37,7 @@ def _normalized_url(raw_url: str) -> str:
 database_url = _normalized_url(settings.database_url)
 engine = create_async_engine(database_url, echo=False)
 SessionLocal = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+metrics.instrument_sessions(AsyncSession.sync_session_class)
 
 
 @asynccontextmanager
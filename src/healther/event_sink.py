@@ -0,0 +1,153 @@
+"""Buffered, batched writer for check results produced by the check engine."""
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+
+from sqlmodel import select
+
+from . import db
+from .config import settings
+from .models import HealthEvent, ServiceWatcher
+from .services.events import write_events
+
+logger = logging.getLogger(__name__)
+
+
+class SinkStats:
+    """Batch size and flush latency counters."""
+
+    def __init__(self) -> None:
+        self.flushes = 0
+        self.events = 0
+        self.errors = 0
+        self.last_batch_size = 0
+        self.max_batch_size = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+
+    def record(self, batch_size: int, seconds: float) -> None:
+        self.flushes += 1
+        self.events += batch_size
+        self.last_batch_size = batch_size
+        self.max_batch_size = max(self.max_batch_size, batch_size)
+        self.last_flush_seconds = seconds
+        self.max_flush_seconds = max(self.max_flush_seconds, seconds)
+        self.total_flush_seconds += seconds
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.events / self.flushes if self.flushes else 0.0
+
+    @property
+    def mean_flush_seconds(self) -> float:
+        return self.total_flush_seconds / self.flushes if self.flushes else 0.0
+
+
+class EventSink:
+    """Collects events and writes them in one transaction per batch.
+
+    A flush happens when ``max_batch`` events are pending or ``max_delay`` seconds
+    after the oldest pending event. ``listeners`` (alerts, live feed, snapshots) are
+    called with each batch only after it commits.
+    """
+
+    def __init__(
+        self,
+        session_factory=None,
+        *,
+        max_batch: int | None = None,
+        max_delay: float | None = None,
+        max_pending: int | None = None,
+    ) -> None:
+        self.session_factory = session_factory or db.SessionLocal
+        self.max_batch = max_batch or settings.event_batch_size
+        self.max_delay = max_delay if max_delay is not None else settings.event_flush_seconds
+        self.max_pending = max_pending or settings.event_max_pending
+        self.stats = SinkStats()
+        self.listeners: list[Callable[[list[HealthEvent]], None]] = []
+        self._pending: list[HealthEvent] = []
+        self._oldest: float | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def add(self, event: HealthEvent) -> None:
+        if not self._pending:
+            self._oldest = time.monotonic()
+        self._pending.append(event)
+        if len(self._pending) >= self.max_batch:
+            await self.flush()
+
+    def flush_due(self, now: float) -> bool:
+        return self._oldest is not None and now - self._oldest >= self.max_delay
+
+    async def flush(self) -> int:
+        """Write every pending event; on failure the batch is kept for the next attempt.
+
+        Events of watchers deleted meanwhile are dropped before requeueing: their
+        foreign key would fail every retry and hold up every other event.
+        """
+        async with self._lock:
+            batch, self._pending = self._pending, []
+            self._oldest = None
+            if not batch:
+                return 0
+            started = time.perf_counter()
+            try:
+                async with self.session_factory() as session:
+                    await write_events(batch, session)
+                    await session.commit()
+            except Exception:
+                self.stats.errors += 1
+                logger.exception("Failed to flush %d health events", len(batch))
+                self._requeue(await self._live_only(batch))
+                return 0
+            self.stats.record(len(batch), time.perf_counter() - started)
+        for listener in self.listeners:
+            try:
+                listener(batch)
+            except Exception:
+                logger.exception("Event sink listener %r failed", listener)
+        return len(batch)
+
+    async def _live_only(self, batch: list[HealthEvent]) -> list[HealthEvent]:
+        watcher_ids = {event.watcher_id for event in batch}
+        try:
+            async with self.session_factory() as session:
+                rows = await session.exec(
+                    select(ServiceWatcher.id).where(
+                        ServiceWatcher.id.in_(watcher_ids), ServiceWatcher.deleted_at.is_(None)
+                    )
+                )
+                live = set(rows.all())
+        except Exception:
+            # the database itself is failing: keep everything for the next attempt
+            return batch
+        kept = [event for event in batch if event.watcher_id in live]
+        if len(kept) < len(batch):
+            logger.warning("Dropping %d health events of deleted watchers", len(batch) - len(kept))
+        return kept
+
+    def _requeue(self, batch: list[HealthEvent]) -> None:
+        self._pending = batch + self._pending
+        overflow = len(self._pending) - self.max_pending
+        if overflow > 0:
+            logger.error("Dropping %d health events, sink is over capacity", overflow)
+            self._pending = self._pending[overflow:]
+        self._oldest = time.monotonic()
+
+    async def run(self, stopping: asyncio.Event) -> None:
+        """Flush on the time trigger until ``stopping`` is set, then drain."""
+        while not stopping.is_set():
+            if self.flush_due(time.monotonic()):
+                await self.flush()
+            try:
+                await asyncio.wait_for(stopping.wait(), timeout=min(self.max_delay, 0.5) or 0.05)
+            except TimeoutError:
+                pass
+        await self.flush()
@@ -0,0 +1,113 @@
+"""Process-wide pooled HTTP client used by health checks."""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+import httpx
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class HttpClientManager:
+    """Shares one keep-alive connection pool between checks and caps per-host concurrency.
+
+    The client and semaphores are bound to the running event loop, so they are rebuilt
+    transparently when a new loop is used (e.g. one ``asyncio.run`` per RQ job).
+    """
+
+    def __init__(
+        self,
+        *,
+        timeout: float = 10.0,
+        max_connections: int = 500,
+        max_keepalive_connections: int = 100,
+        keepalive_expiry: float = 30.0,
+        per_host_limit: int = 20,
+        http2: bool = False,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.per_host_limit = per_host_limit
+        self.http2 = http2
+        if http2 and not _http2_available():
+            logger.warning("HTTP/2 requested but the 'h2' package is missing; using HTTP/1.1")
+            self.http2 = False
+        self._transport = transport
+        self._client: httpx.AsyncClient | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._host_slots: dict[str, asyncio.Semaphore] = {}
+
+    @classmethod
+    def from_settings(cls) -> "HttpClientManager":
+        return cls(
+            timeout=settings.http_timeout_seconds,
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry_seconds,
+            per_host_limit=settings.http_per_host_limit,
+            http2=settings.http2,
+        )
+
+    def client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2,
+                transport=self._transport,
+            )
+            self._loop = loop
+            self._host_slots = {}
+        return self._client
+
+    @asynccontextmanager
+    async def host_slot(self, url: str):
+        """Hold one of the ``per_host_limit`` slots for the URL's host."""
+        self.client()
+        host = httpx.URL(url).host
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = asyncio.Semaphore(self.per_host_limit)
+        async with slot:
+            yield
+
+    async def request(self, method: str, url: str, *, cold: bool = False) -> httpx.Response:
+        """Send a request through the shared pool, or a throwaway client when ``cold``.
+
+        Cold requests pay for a new TCP/TLS handshake, which is what users who want to
+        measure it expect to see in ``response_time_ms``.
+        """
+        async with self.host_slot(url):
+            if cold:
+                async with httpx.AsyncClient(
+                    timeout=self.timeout, http2=self.http2, transport=self._transport
+                ) as client:
+                    return await client.request(method, url)
+            return await self.client().request(method, url)
+
+    async def aclose(self) -> None:
+        if self._client is not None and self._loop is asyncio.get_running_loop():
+            await self._client.aclose()
+        self._client = None
+        self._loop = None
+        self._host_slots = {}
+
+
+http_clients = HttpClientManager.from_settings()
@@ -0,0 +1,197 @@
+"""Live health event feed over Redis pub/sub and Server-Sent Events.
+
+Workers publish every recorded event to ``healther:events:{workspace_id}``. Each API
+process holds one subscription per watched workspace and fans messages out to its
+SSE clients through bounded in-memory queues.
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import uuid
+from collections.abc import AsyncIterator, Mapping
+
+import redis.asyncio as aioredis
+from redis import Redis
+
+from .config import settings
+from .models import HealthEvent, HealthStatus
+from .schemas import HealthEventOut
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "healther:events:"
+
+
+def channel(workspace_id: uuid.UUID) -> str:
+    return f"{CHANNEL_PREFIX}{workspace_id}"
+
+
+class LivePublisher:
+    """Publishes recorded events, plus a status change message when a watcher flips."""
+
+    def __init__(self, conn: Redis) -> None:
+        self.conn = conn
+        self._last_status: dict[uuid.UUID, HealthStatus] = {}
+
+    def remember(self, watcher_id: uuid.UUID, status: HealthStatus) -> None:
+        """Seed the previous status, e.g. from the database in a one-shot job."""
+        self._last_status[watcher_id] = HealthStatus(status)
+
+    def seed(self, statuses: Mapping[uuid.UUID, HealthStatus]) -> None:
+        """Fill in previous statuses this process has not seen yet; published ones win."""
+        for watcher_id, status in statuses.items():
+            self._last_status.setdefault(watcher_id, HealthStatus(status))
+
+    def publish(
+        self, events: list[HealthEvent], workspace_ids: Mapping[uuid.UUID, uuid.UUID]
+    ) -> int:
+        """Publish ``events`` in one pipeline; ``workspace_ids`` maps watcher to workspace."""
+        pipe = self.conn.pipeline(transaction=False)
+        published = 0
+        for event in events:
+            workspace_id = workspace_ids.get(event.watcher_id)
+            if workspace_id is None:
+                continue
+            data = HealthEventOut.model_validate(event).model_dump(mode="json")
+            pipe.publish(channel(workspace_id), json.dumps({"event": "health_event", "data": data}))
+            published += 1
+            status = HealthStatus(event.status)
+            previous = self._last_status.get(event.watcher_id)
+            self._last_status[event.watcher_id] = status
+            if previous is not None and previous != status:
+                change = {
+                    "watcher_id": data["watcher_id"],
+                    "previous": previous.value,
+                    "status": status.value,
+                    "changed_at": data["created_at"],
+                }
+                pipe.publish(
+                    channel(workspace_id), json.dumps({"event": "status_change", "data": change})
+                )
+        if published:
+            pipe.execute()
+        return published
+
+
+live_publisher = LivePublisher(Redis.from_url(settings.redis_url))
+
+
+def _sse_frame(message: str) -> str:
+    payload = json.loads(message)
+    return f"event: {payload['event']}\ndata: {json.dumps(payload['data'])}\n\n"
+
+
+class Broadcaster:
+    """One Redis pub/sub connection per API process, shared by every SSE client.
+
+    A channel is subscribed while at least one client watches the workspace. Slow
+    clients have a bounded queue and lose their oldest frames instead of growing it.
+    """
+
+    def __init__(self, url: str | None = None, queue_size: int | None = None) -> None:
+        self.url = url or settings.redis_url
+        self.queue_size = queue_size or settings.live_queue_size
+        self._subscribers: dict[str, set[asyncio.Queue]] = {}
+        self._lock = asyncio.Lock()
+        self._redis = None
+        self._pubsub = None
+        self._reader: asyncio.Task | None = None
+
+    @property
+    def channels(self) -> int:
+        return len(self._subscribers)
+
+    async def _ensure_started(self) -> None:
+        if self._reader is None or self._reader.done():
+            self._redis = aioredis.from_url(self.url)
+            self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            self._reader = asyncio.create_task(self._read())
+
+    @contextlib.asynccontextmanager
+    async def subscribe(self, workspace_id: uuid.UUID) -> AsyncIterator[asyncio.Queue]:
+        name = channel(workspace_id)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        async with self._lock:
+            await self._ensure_started()
+            subscribers = self._subscribers.setdefault(name, set())
+            if not subscribers:
+                await self._pubsub.subscribe(name)
+            subscribers.add(queue)
+        try:
+            yield queue
+        finally:
+            async with self._lock:
+                subscribers.discard(queue)
+                if not subscribers and self._subscribers.get(name) is subscribers:
+                    del self._subscribers[name]
+                    with contextlib.suppress(Exception):
+                        await self._pubsub.unsubscribe(name)
+
+    def dispatch(self, name: str, message: str) -> None:
+        """Format a message once and hand it to every client of the channel."""
+        subscribers = self._subscribers.get(name)
+        if not subscribers:
+            return
+        frame = _sse_frame(message)
+        for queue in subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(frame)
+
+    async def _read(self) -> None:
+        while True:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Live feed subscription failed, reconnecting")
+                await asyncio.sleep(1.0)
+                await self._resubscribe()
+                continue
+            if message is None or message["type"] != "message":
+                continue
+            name, data = message["channel"], message["data"]
+            self.dispatch(
+                name.decode() if isinstance(name, bytes) else name,
+                data.decode() if isinstance(data, bytes) else data,
+            )
+
+    async def _resubscribe(self) -> None:
+        async with self._lock:
+            with contextlib.suppress(Exception):
+                await self._pubsub.aclose()
+            self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            if self._subscribers:
+                with contextlib.suppress(Exception):
+                    await self._pubsub.subscribe(*self._subscribers)
+
+    async def aclose(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._reader
+            self._reader = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+
+broadcaster = Broadcaster()
+
+
+async def sse_stream(workspace_id: uuid.UUID, *, heartbeat: float | None = None):
+    """SSE body for one client; comment lines keep idle proxies from closing it."""
+    heartbeat = heartbeat or settings.live_heartbeat_seconds
+    async with broadcaster.subscribe(workspace_id) as queue:
+        yield ": connected\n\n"
+        while True:
+            try:
+                yield await asyncio.wait_for(queue.get(), timeout=heartbeat)
+            except TimeoutError:
+                yield ": keepalive\n\n"
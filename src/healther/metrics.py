@@ -0,0 +1,344 @@
+"""Prometheus metrics kept in process memory and rendered in the text exposition format.
+
+Recording is a bisect and an add under a per-metric lock, cheap enough for every request
+and check. Each process exposes its own numbers: the API on ``GET /metrics``, the RQ
+worker and the check engine on a listener at ``METRICS_PORT`` (``serve_metrics``).
+RQ runs every job in a forked work horse, so the horse spools what it recorded to
+``spool_dir`` when the job ends and the worker folds the file in as soon as the horse
+exits, so at most one file per running horse is ever on disk.
+"""
+
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable, Iterable
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)  # fmt: skip
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _reset(self) -> None:
+        with self._lock:
+            self._values = {}
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def _state(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+    def _merge(self, values: dict) -> None:
+        with self._lock:
+            for key, value in values.items():
+                self._values[key] = self._values.get(key, 0.0) + value
+
+    def render(self) -> list[str]:
+        return [
+            f"{self.name}{_labels(self.labels, key)} {_number(value)}"
+            for key, value in sorted(self._state().items())
+        ]
+
+
+class Histogram(_Metric):
+    """Per label set: one count per bucket (not cumulative until rendered), then the sum."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                state = self._values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    @contextmanager
+    def time(self, *label_values: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *label_values)
+
+    def _state(self) -> dict:
+        with self._lock:
+            return {key: list(state) for key, state in self._values.items()}
+
+    def _merge(self, values: dict) -> None:
+        with self._lock:
+            for key, state in values.items():
+                current = self._values.get(key)
+                if current is None:
+                    self._values[key] = list(state)
+                else:
+                    self._values[key] = [a + b for a, b in zip(current, state)]
+
+    def render(self) -> list[str]:
+        lines = []
+        for key, state in sorted(self._state().items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), state):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_number(state[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+# a collector runs at scrape time and returns gauge families:
+# (name, help, label names, [(label values, value), ...])
+Collector = Callable[[], Iterable[tuple[str, str, tuple[str, ...], list[tuple[tuple, float]]]]]
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Counter | Histogram] = {}
+        self._collectors: list[Collector] = []
+        self._spool_lock = threading.Lock()
+        self.spool_dir: str | None = None
+
+    def counter(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels=(), **options) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, **options))
+
+    def _register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector: Collector) -> None:
+        if collector not in self._collectors:
+            self._collectors.append(collector)
+
+    def reset(self) -> None:
+        for metric in self._metrics.values():
+            metric._reset()
+
+    def spool(self) -> None:
+        """Write what this (forked) process recorded for the parent to pick up."""
+        if self.spool_dir is None:
+            return
+        state = {
+            name: [[list(key), value] for key, value in metric._state().items()]
+            for name, metric in self._metrics.items()
+        }
+        path = Path(self.spool_dir) / f"{os.getpid()}-{time.monotonic_ns()}.json"
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(state))
+        os.replace(tmp, path)
+
+    def absorb_spool(self) -> None:
+        if self.spool_dir is None:
+            return
+        # scrapes may overlap; each spool file must be added exactly once
+        with self._spool_lock:
+            for path in Path(self.spool_dir).glob("*.json"):
+                try:
+                    state = json.loads(path.read_text())
+                    path.unlink()
+                except (OSError, ValueError):  # fmt: skip
+                    logger.exception("Dropping unreadable metrics spool file %s", path)
+                    path.unlink(missing_ok=True)
+                    continue
+                for name, items in state.items():
+                    metric = self._metrics.get(name)
+                    if metric is not None:
+                        metric._merge({tuple(key): value for key, value in items})
+
+    def render(self) -> str:
+        self.absorb_spool()
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                families = list(collector())
+            except Exception:
+                logger.exception("Metrics collector %r failed", collector)
+                continue
+            for name, documentation, label_names, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} gauge")
+                lines.extend(
+                    f"{name}{_labels(label_names, key)} {_number(value)}" for key, value in samples
+                )
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.histogram(
+    "healther_http_request_duration_seconds",
+    "API request latency by route template, method and status code.",
+    ("method", "route", "status"),
+)
+check_duration = registry.histogram(
+    "healther_check_duration_seconds",
+    "Watcher HTTP check duration by outcome; _count is the number of checks per status.",
+    ("status",),
+)
+db_commit_duration = registry.histogram(
+    "healther_db_commit_duration_seconds", "Session flush and commit time."
+)
+db_transaction_duration = registry.histogram(
+    "healther_db_transaction_duration_seconds",
+    "Time a session held its transaction (and pooled connection), begin to commit/rollback.",
+)
+smtp_send_duration = registry.histogram(
+    "healther_smtp_send_duration_seconds", "Alert digest delivery time by outcome.", ("outcome",)
+)
+alert_notices = registry.counter(
+    "healther_alert_notices_total", "Alert notices queued for a digest, by kind.", ("kind",)
+)
+
+
+def instrument_sessions(session_class) -> None:
+    """Time commits and top-level transactions of every session of ``session_class``."""
+    from sqlalchemy import event
+
+    @event.listens_for(session_class, "after_transaction_create")
+    def _begin(session, transaction):
+        if transaction.parent is None:
+            session.info["metrics_transaction_started"] = time.perf_counter()
+
+    @event.listens_for(session_class, "after_transaction_end")
+    def _end(session, transaction):
+        if transaction.parent is None:
+            started = session.info.pop("metrics_transaction_started", None)
+            if started is not None:
+                db_transaction_duration.observe(time.perf_counter() - started)
+
+    @event.listens_for(session_class, "before_commit")
+    def _before_commit(session):
+        session.info["metrics_commit_started"] = time.perf_counter()
+
+    @event.listens_for(session_class, "after_commit")
+    def _after_commit(session):
+        started = session.info.pop("metrics_commit_started", None)
+        if started is not None:
+            db_commit_duration.observe(time.perf_counter() - started)
+
+
+def queue_collector(conn, queue_names: Iterable[str], schedule_key: str | None = None):
+    """Gauges read from Redis at scrape time: RQ queue depth and how late scheduled work is."""
+    from rq import Queue
+
+    queues = [Queue(name, connection=conn) for name in queue_names]
+
+    def collect():
+        now = time.time()
+        depth, scheduled, lag = [], [], []
+        for queue in queues:
+            registry_key = queue.scheduled_job_registry.key
+            first = conn.zrange(registry_key, 0, 0, withscores=True)
+            depth.append(((queue.name,), queue.count))
+            scheduled.append(((queue.name,), conn.zcard(registry_key)))
+            # a scheduled job past its time is waiting for the RQ scheduler to enqueue it
+            lag.append(((queue.name,), max(now - first[0][1], 0.0) if first else 0.0))
+        if queues:
+            yield "healther_rq_queue_depth", "Jobs waiting in the queue.", ("queue",), depth
+            yield "healther_rq_scheduled_jobs", "Jobs scheduled for later.", ("queue",), scheduled
+            yield (
+                "healther_rq_scheduled_lag_seconds",
+                "How far past its time the oldest scheduled job is.",
+                ("queue",),
+                lag,
+            )
+        if schedule_key is not None:
+            first = conn.zrange(schedule_key, 0, 0, withscores=True)
+            yield (
+                "healther_check_schedule_lag_seconds",
+                "How far past its time the most overdue watcher check is.",
+                (),
+                [((), max(now - first[0][1], 0.0) if first else 0.0)],
+            )
+            yield (
+                "healther_check_schedule_size",
+                "Watchers in the central check schedule.",
+                (),
+                [((), conn.zcard(schedule_key))],
+            )
+
+    return collect
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve ``GET /metrics`` from a daemon thread, for processes that are not the API."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info("Serving metrics on %s:%d/metrics", host, port)
+    return server
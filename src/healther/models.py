@@ -4,6 +4,7 @@ import datetime as dt
 import uuid
 from enum import Enum
 
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship, SQLModel
 
 
@@ -56,7 +57,8 @@ class Workspace(SQLModel, table=True):
 
 class Membership(SQLModel, table=True):
     workspace_id: uuid.UUID = Field(foreign_key="workspace.id", primary_key=True)
-    user_id: uuid.UUID = Field(foreign_key="user.id", primary_key=True)
+    # the primary key serves per-workspace lookups; this one serves "my workspaces"
+    user_id: uuid.UUID = Field(foreign_key="user.id", primary_key=True, index=True)
     role: Role = Field(default=Role.observer)
 
     workspace: Workspace = Relationship(back_populates="memberships")
@@ -70,28 +72,44 @@ class WatchFrequency(str, Enum):
     weeks = "weeks"
 
 
+class HealthStatus(str, Enum):
+    healthy = "healthy"
+    degraded = "degraded"
+    down = "down"
+
+
 class ServiceWatcher(SQLModel, table=True):
+    # retention walks the live watchers and the purge sweep the deleted ones
+    __table_args__ = (Index("ix_servicewatcher_deleted", "deleted_at", "id"),)
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
-    workspace_id: uuid.UUID = Field(foreign_key="workspace.id")
+    workspace_id: uuid.UUID = Field(foreign_key="workspace.id", index=True)
     name: str
     url: str
     expected_status: int = 200
     expected_body: str | None = None
     every_value: int = 15
     every_unit: WatchFrequency = Field(default=WatchFrequency.minutes)
+    # open a fresh connection per check so latency includes the TCP/TLS handshake
+    cold_connection: bool = False
     created_at: dt.datetime = Field(default_factory=lambda: dt.datetime.now(dt.timezone.utc))
+    # current status, written in the same transaction as each batch of health events
+    last_status: HealthStatus | None = None
+    last_checked_at: dt.datetime | None = None
+    last_latency_ms: float | None = None
+    status_since: dt.datetime | None = None
+    # set on delete: the watcher is hidden and unscheduled at once, its history purged later
+    deleted_at: dt.datetime | None = None
 
     workspace: Workspace = Relationship(back_populates="watchers")
     events: list["HealthEvent"] = Relationship(back_populates="watcher")
 
 
-class HealthStatus(str, Enum):
-    healthy = "healthy"
-    degraded = "degraded"
-    down = "down"
-
-
 class HealthEvent(SQLModel, table=True):
+    # Every read is "events of these watchers, newest first, keyset on (created_at, id)";
+    # B-tree indexes scan backwards just as well, so ascending order serves DESC pages.
+    __table_args__ = (Index("ix_healthevent_watcher_created", "watcher_id", "created_at", "id"),)
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     watcher_id: uuid.UUID = Field(foreign_key="servicewatcher.id")
     status: HealthStatus
@@ -99,10 +117,37 @@ class HealthEvent(SQLModel, table=True):
     response_time_ms: float | None = None
     created_at: dt.datetime = Field(default_factory=lambda: dt.datetime.now(dt.timezone.utc))
     message: str | None = None
+    # set for results posted by a sentinel; only the main checker's (None) feed the
+    # watcher's current status and rollups
+    region: str | None = None
 
     watcher: ServiceWatcher = Relationship(back_populates="events")
 
 
+class UptimeRollup(SQLModel):
+    """Per-watcher counts and latency aggregates for one time bucket."""
+
+    watcher_id: uuid.UUID = Field(foreign_key="servicewatcher.id", primary_key=True)
+    bucket_start: dt.datetime = Field(primary_key=True)
+    healthy_count: int = 0
+    degraded_count: int = 0
+    down_count: int = 0
+    latency_count: int = 0
+    latency_sum_ms: float = 0.0
+    latency_min_ms: float | None = None
+    latency_max_ms: float | None = None
+    # serialized healther.sketch.LatencySketch; merged, never recomputed from events
+    latency_sketch: str | None = None
+
+
+class HourlyUptime(UptimeRollup, table=True):
+    pass
+
+
+class DailyUptime(UptimeRollup, table=True):
+    pass
+
+
 class NotificationRecipient(SQLModel, table=True):
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     workspace_id: uuid.UUID = Field(foreign_key="workspace.id", index=True)
@@ -112,3 +157,16 @@ class NotificationRecipient(SQLModel, table=True):
     created_at: dt.datetime = Field(default_factory=lambda: dt.datetime.now(dt.timezone.utc))
 
     workspace: Workspace = Relationship(back_populates="recipients")
+
+
+class Sentinel(SQLModel, table=True):
+    """A remote runner that checks watchers from its region and ships results in batches."""
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    name: str
+    region: str
+    # sha256 of the bearer token; the token itself is shown once, when it is issued
+    token_hash: str = Field(index=True, unique=True)
+    is_active: bool = True
+    created_at: dt.datetime = Field(default_factory=lambda: dt.datetime.now(dt.timezone.utc))
+    last_seen_at: dt.datetime | None = None
@@ -1,73 +1,140 @@
-"""Email notification jobs and queue helpers."""
+"""Email notification jobs: alert digests built from ``alerts`` notices."""
 
 from __future__ import annotations
 
 import asyncio
 import logging
 import smtplib
+import time
 import uuid
+import warnings
 from email.message import EmailMessage
 
-from redis import Redis
-from rq import Queue
 from sqlmodel import select
 
+from . import metrics
+from .alerts import AlertPipeline, alert_pipeline
 from .config import settings
 from .db import SessionLocal
 from .models import HealthEvent, HealthStatus, NotificationRecipient, ServiceWatcher, Workspace
 
 logger = logging.getLogger(__name__)
 
-redis_conn = Redis.from_url(settings.redis_url)
-queue = Queue("email-alerts", connection=redis_conn)
 
-
-def enqueue_alert(event_id: uuid.UUID) -> None:
-    """Enqueue an email alert for a health event."""
-    queue.enqueue("healther.notifications.send_alerts", event_id)
-
-
-def send_alerts(event_id: uuid.UUID) -> None:
-    """RQ entrypoint: send alert emails for the provided event id."""
-    asyncio.run(_send_alerts_async(event_id))
+def send_digest(workspace_id: uuid.UUID) -> None:
+    """RQ entrypoint: mail every alert notice collected for a workspace in one message."""
+    asyncio.run(_send_digest_async(workspace_id))
 
 
-async def _send_alerts_async(event_id: uuid.UUID) -> None:
+async def _send_digest_async(workspace_id: uuid.UUID, pipeline: AlertPipeline | None = None):
+    notices = (pipeline or alert_pipeline).drain(workspace_id)
+    if not notices:
+        return
     async with SessionLocal() as session:
-        event = await session.get(HealthEvent, event_id)
-        if not event or event.status == HealthStatus.healthy:
-            return
-        watcher = await session.get(ServiceWatcher, event.watcher_id)
-        if not watcher:
-            return
-        workspace = await session.get(Workspace, watcher.workspace_id)
+        workspace = await session.get(Workspace, workspace_id)
         if not workspace:
             return
         result = await session.exec(
             select(NotificationRecipient).where(
-                NotificationRecipient.workspace_id == watcher.workspace_id,
+                NotificationRecipient.workspace_id == workspace_id,
                 NotificationRecipient.is_active.is_(True),
             )
         )
         recipients = result.all()
         if not recipients:
             return
+        watcher_ids = {uuid.UUID(notice["watcher_id"]) for notice in notices}
+        result = await session.exec(
+            select(ServiceWatcher).where(
+                ServiceWatcher.id.in_(watcher_ids), ServiceWatcher.deleted_at.is_(None)
+            )
+        )
+        watchers = {watcher.id: watcher for watcher in result.all()}
+
+    subject, body = format_digest(workspace, watchers, notices)
+    if body:
+        _send_email([recipient.email for recipient in recipients], subject, body)
+
 
-        subject = f"[Healther] {watcher.name} is {event.status.value.upper()}"
-        lines = [
-            f"Workspace: {workspace.name}",
-            f"Service: {watcher.name}",
-            f"URL: {watcher.url}",
-            f"Status: {event.status.value}",
-            f"Expected status: {watcher.expected_status}",
-            f"Observed status: {event.response_status or 'N/A'}",
-            f"Latency (ms): {event.response_time_ms or 'N/A'}",
-            f"Message: {event.message or 'N/A'}",
-            f"Event time: {event.created_at.isoformat()}",
-        ]
-        body = "\n".join(lines)
-        emails = [recipient.email for recipient in recipients]
-        _send_email(emails, subject, body)
+def enqueue_alert(event_id: uuid.UUID) -> None:
+    """Deprecated: alerts follow committed results through ``alerts.alert_pipeline``.
+
+    Kept for one release for callers outside this package; the job feeds the event to
+    the pipeline instead of mailing it on its own.
+    """
+    warnings.warn(
+        "enqueue_alert is deprecated; alerts are raised from committed check results",
+        DeprecationWarning,
+        stacklevel=2,
+    )
+    alert_pipeline.queue.enqueue("healther.notifications.send_alerts", event_id)
+
+
+def send_alerts(event_id: uuid.UUID) -> None:
+    """Deprecated RQ entrypoint, kept for one release so jobs queued before the upgrade
+    still reach the digest pipeline."""
+    asyncio.run(_send_alerts_async(event_id))
+
+
+async def _send_alerts_async(event_id: uuid.UUID, pipeline: AlertPipeline | None = None):
+    async with SessionLocal() as session:
+        event = await session.get(HealthEvent, event_id)
+        if not event:
+            return
+        watcher = await session.get(ServiceWatcher, event.watcher_id)
+        if not watcher or watcher.deleted_at is not None:
+            return
+    (pipeline or alert_pipeline).observe([event], {watcher.id: watcher.workspace_id})
+
+
+def _label(notice: dict) -> str:
+    if notice["kind"] != "transition":
+        return notice["kind"]
+    if notice["status"] == HealthStatus.healthy.value:
+        return "recovered"
+    return notice["status"]
+
+
+def _describe(notice: dict) -> str:
+    label = _label(notice)
+    if label == "flapping":
+        return f"is FLAPPING (now {notice['status']}); changes are muted until it settles"
+    if label == "settled":
+        return f"stopped flapping and is {notice['status']}"
+    if label == "recovered":
+        return f"RECOVERED (was {notice['previous']})"
+    return f"is {notice['status'].upper()} (was {notice['previous']})"
+
+
+def format_digest(
+    workspace: Workspace, watchers: dict[uuid.UUID, ServiceWatcher], notices: list[dict]
+) -> tuple[str, str]:
+    """Subject and body for a digest; notices of watchers deleted since are left out."""
+    counts: dict[str, int] = {}
+    headlines = []
+    lines = [f"Workspace: {workspace.name}", ""]
+    for notice in notices:
+        watcher = watchers.get(uuid.UUID(notice["watcher_id"]))
+        if watcher is None:
+            continue
+        label = _label(notice)
+        counts[label] = counts.get(label, 0) + 1
+        headlines.append(f"{watcher.name} {_describe(notice)}")
+        lines.append(f"{notice['at']}  {headlines[-1]}")
+        lines.append(f"    URL: {watcher.url}")
+        if label in (HealthStatus.degraded.value, HealthStatus.down.value):
+            lines.append(
+                f"    Expected status: {watcher.expected_status}, "
+                f"observed: {notice['response_status'] or 'N/A'}, "
+                f"latency (ms): {notice['response_time_ms'] or 'N/A'}, "
+                f"message: {notice['message'] or 'N/A'}"
+            )
+    if not headlines:
+        return "", ""
+    if len(headlines) == 1:
+        return f"[Healther] {headlines[0]}", "\n".join(lines)
+    summary = ", ".join(f"{count} {label}" for label, count in sorted(counts.items()))
+    return f"[Healther] {workspace.name}: {summary}", "\n".join(lines)
 
 
 def _send_email(recipients: list[str], subject: str, body: str) -> None:
@@ -77,8 +144,13 @@ def _send_email(recipients: list[str], subject: str, body: str) -> None:
     message["Subject"] = subject
     message.set_content(body)
 
+    started = time.perf_counter()
+    outcome = "sent"
     try:
         with smtplib.SMTP(settings.smtp_host, settings.smtp_port, timeout=10) as server:
             server.send_message(message)
     except OSError as exc:
+        outcome = "failed"
         logger.exception("Failed to send alert email: %s", exc)
+    finally:
+        metrics.smtp_send_duration.observe(time.perf_counter() - started, outcome)
@@ -0,0 +1,216 @@
+"""Opt-in per-request profiling: time per phase, SQL counts and stack samples.
+
+With ``PROFILING_ENABLED`` the API attaches a ``RequestProfile`` to every request (a
+context variable, so it follows the request into SQLAlchemy's greenlets and FastAPI's
+threadpool). Engine events count statements and their time, ``phase`` times named
+sections such as auth, and ``ProfilingMiddleware`` reports the totals in a
+``Server-Timing`` header. Phases overlap: the query that loads the user counts under
+both ``db`` and ``auth``.
+
+``StackSampler`` is the optional sampling mode: a thread that looks at the event loop's
+stack every few milliseconds and files each sample under the request whose coroutine
+is running. Only requests slower than ``PROFILING_SLOW_REQUEST_MS`` log what it saw.
+"""
+
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+_current: ContextVar["RequestProfile | None"] = ContextVar("request_profile", default=None)
+
+
+class RequestProfile:
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.phases: dict[str, float] = {}
+        self.queries = 0
+        self.endpoint_done: float | None = None
+        self.stacks: Counter[str] = Counter()
+
+    def add(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def server_timing(self, now: float) -> str:
+        """``Server-Timing`` value; ``serialize`` is from endpoint return to response start."""
+        phases = dict(self.phases)
+        if self.endpoint_done is not None:
+            phases["serialize"] = now - self.endpoint_done
+        entries = []
+        for name, seconds in phases.items():
+            entry = f"{name};dur={seconds * 1000:.1f}"
+            if name == "db":
+                entry += f';desc="{self.queries} queries"'
+            entries.append(entry)
+        entries.append(f"total;dur={(now - self.started) * 1000:.1f}")
+        return ", ".join(entries)
+
+
+@contextmanager
+def profile_request():
+    profile = RequestProfile()
+    token = _current.set(profile)
+    try:
+        yield profile
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def phase(name: str):
+    """Add the time spent in the block to the current request's ``name`` phase, if any."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, time.perf_counter() - started)
+
+
+def mark_endpoint_done() -> None:
+    profile = _current.get()
+    if profile is not None:
+        profile.endpoint_done = time.perf_counter()
+
+
+def instrument_engine(sync_engine, slow_query_ms: float) -> None:
+    """Count and time every statement; log those slower than ``slow_query_ms``.
+
+    The slow query log carries the SQL with its placeholders, never the bound values,
+    which may be password hashes or tokens.
+    """
+    from sqlalchemy import event
+
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(
+        sync_engine,
+        "after_cursor_execute",
+        lambda *args: _after_cursor_execute(*args, slow_query_ms=slow_query_ms),
+    )
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("profiling_query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany, *, slow_query_ms
+):
+    elapsed = time.perf_counter() - conn.info["profiling_query_started"].pop()
+    profile = _current.get()
+    if profile is not None:
+        profile.queries += 1
+        profile.add("db", elapsed)
+    if elapsed * 1000 >= slow_query_ms:
+        count = len(parameters) if isinstance(parameters, (list, tuple, dict)) else 0
+        logger.warning(
+            "Slow query (%.1f ms, %d parameters redacted%s): %s",
+            elapsed * 1000,
+            count,
+            ", executemany" if executemany else "",
+            " ".join(statement.split()),
+        )
+
+
+def instrument_redis(conn) -> None:
+    """Time commands and pipelines sent through ``conn`` as the ``redis`` phase.
+
+    redis-py has no hooks, so the client's own ``execute_command`` and ``pipeline`` are
+    wrapped; scripts go through ``execute_command`` too. Clients without them (test
+    fakes) are left alone.
+    """
+    if getattr(conn, "_profiling_instrumented", False):
+        return
+    execute_command = getattr(conn, "execute_command", None)
+    pipeline = getattr(conn, "pipeline", None)
+    if execute_command is not None:
+
+        def timed_execute_command(*args, **options):
+            with phase("redis"):
+                return execute_command(*args, **options)
+
+        conn.execute_command = timed_execute_command
+    if pipeline is not None:
+
+        def timed_pipeline(*args, **options):
+            pipe = pipeline(*args, **options)
+            execute = pipe.execute
+
+            def timed_execute(*execute_args, **execute_options):
+                with phase("redis"):
+                    return execute(*execute_args, **execute_options)
+
+            pipe.execute = timed_execute
+            return pipe
+
+        conn.pipeline = timed_pipeline
+    conn._profiling_instrumented = True
+
+
+class StackSampler:
+    """Samples the stacks of threads running profiled requests every ``interval`` seconds.
+
+    A request registers the frame of the middleware coroutine that wraps it. A sample
+    belongs to the request whose frame sits below it on the running stack, and only the
+    frames above that one are kept, as ``outer;inner`` lines (the collapsed format that
+    flame graph tools read). Sync endpoints run in FastAPI's threadpool and are not seen.
+    """
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._active: dict[int, tuple] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def register(self, frame, profile: RequestProfile) -> None:
+        with self._lock:
+            self._active[id(frame)] = (frame, threading.get_ident(), profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def unregister(self, frame) -> None:
+        with self._lock:
+            self._active.pop(id(frame), None)
+
+    def _run(self) -> None:
+        while True:
+            if not self._active:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            time.sleep(self.interval)
+            self.sample()
+
+    def sample(self) -> None:
+        frames = sys._current_frames()
+        with self._lock:
+            threads = {thread_id for _, thread_id, _ in self._active.values()}
+            for thread_id in threads:
+                stack = []
+                frame = frames.get(thread_id)
+                while frame is not None:
+                    entry = self._active.get(id(frame))
+                    if entry is not None and entry[0] is frame:
+                        if stack:
+                            entry[2].stacks[";".join(reversed(stack))] += 1
+                        break
+                    code = frame.f_code
+                    stack.append(f"{code.co_qualname} ({code.co_filename}:{frame.f_lineno})")
+                    frame = frame.f_back
+
+
+def format_stacks(stacks: Counter[str], limit: int = 25) -> str:
+    return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common(limit))
@@ -0,0 +1,271 @@
+"""Central check schedule: one next-fire time per watcher in a Redis sorted set.
+
+Members are watcher ids and scores are the unix time of the next check. Creating a
+watcher adds it, updating moves it in place and deleting removes it, so a watcher can
+never have more than one pending check. Dispatchers claim due members with a lease: a
+check that dies mid-flight fires again once the lease runs out.
+
+``python -m healther.scheduler`` is the dispatcher for ``CHECK_BACKEND=rq``; it turns
+due members into ``run_check`` jobs. The check engine claims from the same set itself.
+Sharded check engines keep their own slice of the schedule in memory (``LocalScheduler``).
+"""
+
+import asyncio
+import heapq
+import logging
+import random
+import time
+import uuid
+from collections.abc import Iterable, Mapping
+
+from redis import Redis
+from rq import Queue
+from sqlmodel import select
+
+from .config import settings
+from .db import SessionLocal
+from .models import ServiceWatcher
+
+logger = logging.getLogger(__name__)
+
+# claim at most ARGV[2] members due by ARGV[1] and push them to ARGV[3] (the lease end)
+_CLAIM_DUE = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, member in ipairs(due) do
+    redis.call('ZADD', KEYS[1], 'XX', ARGV[3], member)
+end
+return due
+"""
+
+
+class ScheduleTiming:
+    """Lease and jitter rules shared by the Redis schedule and the in-process one."""
+
+    def __init__(
+        self,
+        *,
+        lease_seconds: float | None = None,
+        jitter_ratio: float | None = None,
+        initial_jitter_seconds: float | None = None,
+    ) -> None:
+        self.lease_seconds = lease_seconds or settings.scheduler_lease_seconds
+        self.jitter_ratio = (
+            jitter_ratio if jitter_ratio is not None else settings.scheduler_jitter_ratio
+        )
+        self.initial_jitter_seconds = (
+            initial_jitter_seconds
+            if initial_jitter_seconds is not None
+            else settings.scheduler_initial_jitter_seconds
+        )
+
+    def _first_fire(self, interval: float, now: float, spread: float | None = None) -> float:
+        # watchers created together start spread out instead of in the same second
+        window = self.initial_jitter_seconds if spread is None else spread
+        return now + random.uniform(0, min(interval, window))
+
+    def _next_fire(self, interval: float, now: float) -> float:
+        # a little jitter on every run keeps phases from lining up again over time
+        return now + interval * (1 + random.uniform(-self.jitter_ratio, self.jitter_ratio))
+
+
+class CheckScheduler(ScheduleTiming):
+    def __init__(self, conn: Redis, key: str = "healther:schedule", **timing) -> None:
+        super().__init__(**timing)
+        self.conn = conn
+        self.key = key
+        self._claim_due = conn.register_script(_CLAIM_DUE)
+
+    def add(self, watcher_id: uuid.UUID, interval: float, *, now: float | None = None) -> None:
+        """Schedule a new watcher; a watcher that is already scheduled keeps its time."""
+        self.add_many({watcher_id: interval}, now=now)
+
+    def add_many(
+        self,
+        intervals: Mapping[uuid.UUID, float],
+        *,
+        now: float | None = None,
+        spread: float | None = None,
+    ) -> None:
+        """Schedule many watchers with one ZADD, first runs spread over ``spread`` seconds
+        (capped at each watcher's interval; default ``SCHEDULER_INITIAL_JITTER_SECONDS``)."""
+        if not intervals:
+            return
+        now = now if now is not None else time.time()
+        mapping = {
+            str(watcher_id): self._first_fire(interval, now, spread)
+            for watcher_id, interval in intervals.items()
+        }
+        self.conn.zadd(self.key, mapping, nx=True)
+
+    def reschedule(self, watcher_id: uuid.UUID, at: float | None = None) -> None:
+        """Move a watcher's single pending check, by default to now."""
+        self.conn.zadd(self.key, {str(watcher_id): at if at is not None else time.time()})
+
+    def cancel(self, watcher_id: uuid.UUID) -> None:
+        self.conn.zrem(self.key, str(watcher_id))
+
+    def claim_due(self, *, now: float | None = None, limit: int = 1000) -> list[uuid.UUID]:
+        """Take up to ``limit`` due watchers, leasing them for ``lease_seconds``."""
+        if limit <= 0:
+            return []
+        now = now if now is not None else time.time()
+        members = self._claim_due(keys=[self.key], args=[now, limit, now + self.lease_seconds])
+        return [uuid.UUID(member.decode()) for member in members]
+
+    def complete(self, watcher_id: uuid.UUID, interval: float, *, now: float | None = None) -> None:
+        self.complete_many({watcher_id: interval}, now=now)
+
+    def complete_many(
+        self, intervals: Mapping[uuid.UUID, float], *, now: float | None = None
+    ) -> None:
+        """Set the next run after finished checks; watchers deleted meanwhile stay gone."""
+        if not intervals:
+            return
+        now = now if now is not None else time.time()
+        mapping = {
+            str(watcher_id): self._next_fire(interval, now)
+            for watcher_id, interval in intervals.items()
+        }
+        self.conn.zadd(self.key, mapping, xx=True)
+
+    def next_due(self) -> float | None:
+        first = self.conn.zrange(self.key, 0, 0, withscores=True)
+        return first[0][1] if first else None
+
+    def sync(self, intervals: Mapping[uuid.UUID, float], *, now: float | None = None) -> int:
+        """Match the set to the watcher table: add missing watchers, drop unknown ones."""
+        known = {str(watcher_id) for watcher_id in intervals}
+        stale = [
+            member for member in self.conn.zrange(self.key, 0, -1) if member.decode() not in known
+        ]
+        if stale:
+            self.conn.zrem(self.key, *stale)
+        self.add_many(intervals, now=now)
+        return len(stale)
+
+    def __len__(self) -> int:
+        return self.conn.zcard(self.key)
+
+
+class LocalScheduler(ScheduleTiming):
+    """The same schedule kept in one process, for a check engine shard that owns its watchers.
+
+    A heap orders next-fire times; moving a watcher pushes a new entry and the old one is
+    skipped when it surfaces, so every call stays O(log n).
+    """
+
+    def __init__(self, **timing) -> None:
+        super().__init__(**timing)
+        self._due: dict[uuid.UUID, float] = {}
+        self._heap: list[tuple[float, uuid.UUID]] = []
+
+    def _set(self, watcher_id: uuid.UUID, at: float) -> None:
+        self._due[watcher_id] = at
+        heapq.heappush(self._heap, (at, watcher_id))
+
+    def _discard_stale(self) -> None:
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def add(self, watcher_id: uuid.UUID, interval: float, *, now: float | None = None) -> None:
+        self.add_many({watcher_id: interval}, now=now)
+
+    def add_many(
+        self,
+        intervals: Mapping[uuid.UUID, float],
+        *,
+        now: float | None = None,
+        spread: float | None = None,
+    ) -> None:
+        now = now if now is not None else time.time()
+        for watcher_id, interval in intervals.items():
+            if watcher_id not in self._due:
+                self._set(watcher_id, self._first_fire(interval, now, spread))
+
+    def reschedule(self, watcher_id: uuid.UUID, at: float | None = None) -> None:
+        self._set(watcher_id, at if at is not None else time.time())
+
+    def cancel(self, watcher_id: uuid.UUID) -> None:
+        self._due.pop(watcher_id, None)
+
+    def claim_due(self, *, now: float | None = None, limit: int = 1000) -> list[uuid.UUID]:
+        now = now if now is not None else time.time()
+        claimed: list[uuid.UUID] = []
+        self._discard_stale()
+        while self._heap and self._heap[0][0] <= now and len(claimed) < limit:
+            _, watcher_id = heapq.heappop(self._heap)
+            claimed.append(watcher_id)
+            self._set(watcher_id, now + self.lease_seconds)
+            self._discard_stale()
+        return claimed
+
+    def complete(self, watcher_id: uuid.UUID, interval: float, *, now: float | None = None) -> None:
+        self.complete_many({watcher_id: interval}, now=now)
+
+    def complete_many(
+        self, intervals: Mapping[uuid.UUID, float], *, now: float | None = None
+    ) -> None:
+        now = now if now is not None else time.time()
+        for watcher_id, interval in intervals.items():
+            if watcher_id in self._due:
+                self._set(watcher_id, self._next_fire(interval, now))
+
+    def next_due(self) -> float | None:
+        self._discard_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+
+check_scheduler = CheckScheduler(Redis.from_url(settings.redis_url))
+
+
+async def load_intervals(session, watcher_ids: Iterable[uuid.UUID] | None = None) -> dict:
+    """Check interval in seconds for every watcher, or for ``watcher_ids`` only."""
+    # services.watchers imports this module to keep the schedule in step with edits
+    from .services.watchers import _interval_as_timedelta
+
+    stmt = select(ServiceWatcher).where(ServiceWatcher.deleted_at.is_(None))
+    if watcher_ids is not None:
+        stmt = stmt.where(ServiceWatcher.id.in_(list(watcher_ids)))
+    result = await session.exec(stmt)
+    return {watcher.id: _interval_as_timedelta(watcher).total_seconds() for watcher in result.all()}
+
+
+async def sync_schedule(session, scheduler: CheckScheduler | None = None) -> None:
+    """Backfill the schedule from the database, e.g. on first start after upgrading."""
+    scheduler = scheduler or check_scheduler
+    intervals = await load_intervals(session)
+    removed = scheduler.sync(intervals)
+    logger.info("Schedule synced: %d watchers, %d stale entries removed", len(intervals), removed)
+
+
+def dispatch_due(scheduler: CheckScheduler, queue, *, limit: int = 1000) -> int:
+    """Enqueue a ``run_check`` job for every claimed watcher."""
+    watcher_ids = scheduler.claim_due(limit=limit)
+    for watcher_id in watcher_ids:
+        queue.enqueue("healther.workers.run_check", watcher_id)
+    return len(watcher_ids)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+
+    async def _sync():
+        async with SessionLocal() as session:
+            await sync_schedule(session)
+
+    asyncio.run(_sync())
+    queue = Queue("health-checks", connection=check_scheduler.conn)
+    logger.info("Dispatching due checks from %s", check_scheduler.key)
+    while True:
+        if dispatch_due(check_scheduler, queue, limit=settings.scheduler_batch_size):
+            continue
+        next_due = check_scheduler.next_due()
+        wait = 1.0 if next_due is None else next_due - time.time()
+        time.sleep(min(max(wait, 0.05), 1.0))
+
+
+if __name__ == "__main__":
+    main()
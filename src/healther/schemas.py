@@ -1,10 +1,10 @@
 """Pydantic schemas for API requests and responses."""
 
 import uuid
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
 
-from pydantic import BaseModel, ConfigDict, EmailStr
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
 
 from .models import HealthStatus, ProfileVisibility, Role, WatchFrequency
 
@@ -101,6 +101,7 @@ class WatcherCreate(BaseModel):
     expected_body: str | None = None
     every_value: int = 15
     every_unit: WatchFrequency = WatchFrequency.minutes
+    cold_connection: bool = False
 
 
 class WatcherUpdate(BaseModel):
@@ -110,6 +111,7 @@ class WatcherUpdate(BaseModel):
     expected_body: Optional[str] = None
     every_value: Optional[int] = None
     every_unit: Optional[WatchFrequency] = None
+    cold_connection: Optional[bool] = None
 
 
 class WatcherOut(BaseModel):
@@ -120,10 +122,26 @@ class WatcherOut(BaseModel):
     expected_body: str | None
     every_value: int
     every_unit: WatchFrequency
+    cold_connection: bool = False
+    last_status: HealthStatus | None = None
+    last_checked_at: datetime | None = None
+    last_latency_ms: float | None = None
+    status_since: datetime | None = None
 
     model_config = ConfigDict(from_attributes=True)
 
 
+class WatcherImport(BaseModel):
+    """A workspace's watcher configuration, as exported and as accepted by the import."""
+
+    watchers: list[WatcherCreate]
+
+
+class WatcherImportOut(BaseModel):
+    created: list[WatcherOut]
+    skipped: list[WatcherCreate]
+
+
 class HealthEventOut(BaseModel):
     id: uuid.UUID
     watcher_id: uuid.UUID
@@ -132,10 +150,90 @@ class HealthEventOut(BaseModel):
     response_time_ms: float | None
     message: str | None
     created_at: datetime
+    region: str | None = None
 
     model_config = ConfigDict(from_attributes=True)
 
 
+class HealthEventPage(BaseModel):
+    items: list[HealthEventOut]
+    next_cursor: str | None = None
+
+
+class UptimeBar(BaseModel):
+    day: date
+    healthy: int
+    degraded: int
+    down: int
+    ratio: float | None
+    latency_avg_ms: float | None = None
+
+
+class WatcherUptime(BaseModel):
+    watcher_id: uuid.UUID
+    uptime_percentage: float | None
+    bars: list[UptimeBar]
+
+
+class WorkspaceUptimeOut(BaseModel):
+    workspace_id: uuid.UUID
+    days: int
+    uptime_percentage: float | None
+    watchers: list[WatcherUptime]
+
+
+class LatencyPercentilesOut(BaseModel):
+    watcher_id: uuid.UUID
+    window: str
+    since: datetime
+    count: int
+    min_ms: float | None = None
+    max_ms: float | None = None
+    p50: float | None = None
+    p90: float | None = None
+    p95: float | None = None
+    p99: float | None = None
+
+
+class PurgeStatusOut(BaseModel):
+    watcher_id: uuid.UUID
+    workspace_id: uuid.UUID
+    status: str
+    events_purged: int = 0
+    rollups_purged: int = 0
+    done: bool = False
+
+
+class WatcherOverview(WatcherOut):
+    uptime_24h: float | None = None
+    uptime_90d: float | None = None
+
+
+class WorkspaceOverviewOut(BaseModel):
+    workspace_id: uuid.UUID
+    name: str
+    is_public: bool
+    member_count: int
+    recipient_count: int
+    watchers: list[WatcherOverview]
+
+
+class PublicWatcherStatus(WatcherOut):
+    status: HealthStatus | None = None
+    recent_latency_ms: list[float] = []
+
+
+class PublicStatusOut(BaseModel):
+    """Precomputed public status page; ``generated_at`` shows how fresh it is."""
+
+    workspace_id: uuid.UUID
+    name: str
+    generated_at: datetime
+    watchers: list[PublicWatcherStatus]
+    uptime: WorkspaceUptimeOut
+    incidents: list[HealthEventOut]
+
+
 class MembershipOut(BaseModel):
     workspace_id: uuid.UUID
     user_id: uuid.UUID
@@ -165,3 +263,48 @@ class RecipientOut(BaseModel):
     created_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class SentinelResult(BaseModel):
+    idempotency_key: str = Field(min_length=1, max_length=128)
+    watcher_id: uuid.UUID
+    status: HealthStatus
+    response_status: int | None = None
+    response_time_ms: float | None = Field(default=None, ge=0)
+    message: str | None = Field(default=None, max_length=1000)
+    checked_at: datetime
+
+
+class SentinelBatch(BaseModel):
+    sentinel_id: uuid.UUID
+    region: str
+    results: list[SentinelResult]
+
+
+class RejectedResult(BaseModel):
+    idempotency_key: str
+    reason: str
+
+
+class SentinelBatchOut(BaseModel):
+    accepted: int
+    duplicates: int
+    rejected: list[RejectedResult] = []
+
+
+class SentinelWatcher(BaseModel):
+    id: uuid.UUID
+    url: str
+    expected_status: int
+    expected_body: str | None
+    every_value: int
+    every_unit: WatchFrequency
+    cold_connection: bool = False
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class SentinelAssignmentOut(BaseModel):
+    sentinel_id: uuid.UUID
+    region: str
+    watchers: list[SentinelWatcher]
@@ -1,5 +1,9 @@
 """Auth utilities for JWT handling and password hashing."""
 
+import asyncio
+import hashlib
+import secrets
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Any
 
@@ -19,6 +23,23 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+# hashlib's pbkdf2 releases the GIL, so threads hash in parallel while the loop keeps serving
+_hash_pool = ThreadPoolExecutor(
+    max_workers=settings.password_hash_workers, thread_name_prefix="healther-hash"
+)
+
+
+async def hash_password_async(password: str) -> str:
+    """``hash_password`` on the bounded hashing pool, for use from request handlers."""
+    return await asyncio.get_running_loop().run_in_executor(_hash_pool, hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await asyncio.get_running_loop().run_in_executor(
+        _hash_pool, verify_password, plain_password, hashed_password
+    )
+
+
 def create_access_token(data: dict[str, Any], expires_minutes: int | None = None) -> str:
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(
@@ -35,3 +56,12 @@ def decode_token(token: str) -> dict[str, Any] | None:
         return payload
     except JWTError:
         return None
+
+
+def new_sentinel_token() -> str:
+    return secrets.token_urlsafe(32)
+
+
+def hash_sentinel_token(token: str) -> str:
+    # tokens are 256 random bits, so a fast digest is enough to keep them out of the DB
+    return hashlib.sha256(token.encode()).hexdigest()
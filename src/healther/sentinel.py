@@ -0,0 +1,239 @@
+"""Sentinel runner: check watchers from a remote region and ship the results in batches.
+
+``python -m healther.sentinel`` needs only ``SENTINEL_API_URL`` and ``SENTINEL_TOKEN``;
+it never touches the database. Watchers are fetched from the API and scheduled in
+memory, checks reuse ``run_http_check``, and results are buffered and posted as one
+gzip-compressed batch every ``SENTINEL_FLUSH_SECONDS``. A batch that fails to send is
+kept and sent again with the same idempotency keys, so the API stores it only once;
+one the API refuses outright (a 4xx other than 409) is dropped.
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import signal
+import time
+import uuid
+
+import httpx
+
+from .config import settings
+from .http_client import http_clients
+from .models import HealthEvent, ServiceWatcher
+from .scheduler import LocalScheduler
+from .schemas import SentinelWatcher
+from .services.watchers import _interval_as_timedelta, check_config, run_http_check
+
+logger = logging.getLogger(__name__)
+
+
+def result_payload(event: HealthEvent) -> dict:
+    return {
+        "idempotency_key": str(event.id),
+        "watcher_id": str(event.watcher_id),
+        "status": event.status.value,
+        "response_status": event.response_status,
+        "response_time_ms": event.response_time_ms,
+        "message": event.message,
+        "checked_at": event.created_at.isoformat(),
+    }
+
+
+class SentinelRunner:
+    def __init__(
+        self,
+        api: httpx.AsyncClient,
+        *,
+        concurrency: int | None = None,
+        max_batch: int | None = None,
+        max_buffer: int | None = None,
+    ) -> None:
+        self.api = api
+        self.concurrency = concurrency or settings.check_concurrency
+        self.max_batch = max_batch or settings.sentinel_max_batch
+        self.max_buffer = max_buffer or settings.sentinel_max_buffer
+        self.scheduler = LocalScheduler()
+        self.sentinel_id: uuid.UUID | None = None
+        self.region: str | None = None
+        self.dropped = 0
+        self._watchers: dict[uuid.UUID, ServiceWatcher] = {}
+        self._buffer: list[dict] = []
+        self._in_flight: set[uuid.UUID] = set()
+        self._tasks: set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    async def refresh(self) -> None:
+        """Fetch the watcher list; add new watchers, drop removed ones, recheck edited ones."""
+        resp = await self.api.get("/sentinel/watchers")
+        resp.raise_for_status()
+        data = resp.json()
+        self.sentinel_id = uuid.UUID(data["sentinel_id"])
+        self.region = data["region"]
+        watchers = {}
+        for item in data["watchers"]:
+            watcher = ServiceWatcher(**SentinelWatcher.model_validate(item).model_dump())
+            watchers[watcher.id] = watcher
+        for watcher_id in self._watchers.keys() - watchers.keys():
+            self.scheduler.cancel(watcher_id)
+        self.scheduler.add_many(
+            {
+                watcher_id: _interval_as_timedelta(watcher).total_seconds()
+                for watcher_id, watcher in watchers.items()
+                if watcher_id not in self._watchers
+            }
+        )
+        for watcher_id, watcher in watchers.items():
+            previous = self._watchers.get(watcher_id)
+            if previous is not None and check_config(previous) != check_config(watcher):
+                self.scheduler.reschedule(watcher_id)
+        self._watchers = watchers
+
+    def dispatch(self) -> int:
+        claimed = self.scheduler.claim_due(limit=self.concurrency - len(self._in_flight))
+        started = 0
+        for watcher_id in claimed:
+            watcher = self._watchers.get(watcher_id)
+            if watcher is None or watcher_id in self._in_flight:
+                continue
+            self._in_flight.add(watcher_id)
+            task = asyncio.create_task(self._run_one(watcher))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            started += 1
+        return started
+
+    async def _run_one(self, watcher: ServiceWatcher) -> None:
+        try:
+            self._buffer.append(result_payload(await run_http_check(watcher)))
+            if len(self._buffer) > self.max_buffer:
+                # the API has been unreachable for a long time: keep the newest results
+                overflow = len(self._buffer) - self.max_buffer
+                del self._buffer[:overflow]
+                self.dropped += overflow
+        except Exception:
+            logger.exception("Check failed for watcher %s", watcher.id)
+        finally:
+            self._in_flight.discard(watcher.id)
+            self.scheduler.complete(watcher.id, _interval_as_timedelta(watcher).total_seconds())
+
+    async def ship(self) -> int:
+        """Post buffered results, a batch at a time; anything not acknowledged stays.
+
+        Transport errors, 5xx and 409 (the same batch is still being stored) are retried
+        on the next flush. Any other 4xx will not get better by resending, so that batch
+        is logged and dropped.
+        """
+        shipped = 0
+        while self._buffer and self.sentinel_id is not None:
+            results = self._buffer[: self.max_batch]
+            body = {"sentinel_id": str(self.sentinel_id), "region": self.region, "results": results}
+            try:
+                resp = await self.api.post(
+                    "/sentinel/results",
+                    content=gzip.compress(json.dumps(body).encode()),
+                    headers={"Content-Encoding": "gzip", "Content-Type": "application/json"},
+                )
+            except httpx.TransportError as exc:
+                logger.warning("Shipping %d results failed, will retry: %s", len(results), exc)
+                break
+            if resp.status_code >= 500 or resp.status_code == 409:
+                logger.warning(
+                    "Shipping %d results failed with %d, will retry",
+                    len(results),
+                    resp.status_code,
+                )
+                break
+            # checks finishing during the await may have trimmed the front of the buffer,
+            # so remove what was sent by key rather than by position
+            sent = {result["idempotency_key"] for result in results}
+            self._buffer = [
+                result for result in self._buffer if result["idempotency_key"] not in sent
+            ]
+            if resp.status_code >= 400:
+                logger.error(
+                    "Dropping %d results refused with %d: %s",
+                    len(results),
+                    resp.status_code,
+                    resp.text[:500],
+                )
+                self.dropped += len(results)
+                continue
+            summary = resp.json()
+            for rejected in summary["rejected"]:
+                logger.warning(
+                    "Result %s rejected: %s", rejected["idempotency_key"], rejected["reason"]
+                )
+            shipped += len(results)
+        return shipped
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def run(self) -> None:
+        last_refresh = last_ship = float("-inf")
+        while not self._stopping.is_set():
+            now = time.monotonic()
+            if now - last_refresh >= settings.sentinel_refresh_seconds:
+                try:
+                    await self.refresh()
+                    last_refresh = now
+                except httpx.HTTPError as exc:
+                    logger.warning("Fetching watchers failed: %s", exc)
+            self.dispatch()
+            if now - last_ship >= settings.sentinel_flush_seconds:
+                shipped = await self.ship()
+                logger.info(
+                    "shipped=%d pending=%d in_flight=%d watchers=%d dropped=%d",
+                    shipped,
+                    self.pending,
+                    len(self._in_flight),
+                    len(self._watchers),
+                    self.dropped,
+                )
+                last_ship = now
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self._sleep_for())
+            except TimeoutError:
+                pass
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.ship()
+
+    def _sleep_for(self) -> float:
+        next_due = self.scheduler.next_due()
+        if next_due is None:
+            return 1.0
+        return min(max(next_due - time.time(), 0.05), 1.0)
+
+
+async def _main_async() -> None:
+    if not settings.sentinel_token:
+        raise SystemExit("SENTINEL_TOKEN is not set")
+    api = httpx.AsyncClient(
+        base_url=settings.sentinel_api_url,
+        headers={"Authorization": f"Bearer {settings.sentinel_token}"},
+        timeout=30.0,
+    )
+    runner = SentinelRunner(api)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, runner.stop)
+    try:
+        await runner.run()
+    finally:
+        await api.aclose()
+        await http_clients.aclose()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main_async())
+
+
+if __name__ == "__main__":
+    main()
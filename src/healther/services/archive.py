@@ -0,0 +1,141 @@
+"""Append-only, gzip-compressed segment files holding archived health events.
+
+Layout: ``{archive_dir}/{watcher_id}/{YYYY-MM}.ndjson.gz`` with one JSON object per event,
+oldest first. Every append writes a new gzip member, so existing bytes are never rewritten.
+"""
+
+import datetime as dt
+import enum
+import gzip
+import heapq
+import json
+import os
+import shutil
+import uuid
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+from ..models import HealthStatus
+from ..utils import as_utc
+
+EVENT_COLUMNS = (
+    "id",
+    "watcher_id",
+    "status",
+    "response_status",
+    "response_time_ms",
+    "created_at",
+    "message",
+    "region",
+)
+_SUFFIX = ".ndjson.gz"
+
+
+def encode_value(value):
+    """JSON-friendly form of a column value, shared by segments and exports."""
+    if isinstance(value, dt.datetime):
+        return as_utc(value).isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+
+def month_of(value: dt.datetime) -> str:
+    return as_utc(value).strftime("%Y-%m")
+
+
+def segment_path(root: str | Path, watcher_id: uuid.UUID, month: str) -> Path:
+    return Path(root) / str(watcher_id) / f"{month}{_SUFFIX}"
+
+
+def append_segment(root: str | Path, watcher_id: uuid.UUID, month: str, rows: list[dict]) -> None:
+    """Append encoded rows to a segment and fsync before the caller deletes them."""
+    path = segment_path(root, watcher_id, month)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = "".join(json.dumps(row) + "\n" for row in rows).encode()
+    with open(path, "ab") as segment:
+        segment.write(gzip.compress(data))
+        segment.flush()
+        os.fsync(segment.fileno())
+
+
+def archived_watchers(root: str | Path) -> set[uuid.UUID]:
+    """Watchers that have at least one archive segment."""
+    root = Path(root)
+    if not root.is_dir():
+        return set()
+    return {
+        uuid.UUID(path.name)
+        for path in root.iterdir()
+        if path.is_dir() and any(path.glob(f"*{_SUFFIX}"))
+    }
+
+
+def remove_watcher(root: str | Path, watcher_id: uuid.UUID) -> None:
+    shutil.rmtree(Path(root) / str(watcher_id), ignore_errors=True)
+
+
+def _segment_rows(path: Path) -> Iterator[tuple[tuple, dict]]:
+    # rows are appended in (created_at, id) order; anything not past the previous row is a
+    # copy left by a run that archived a chunk but died before deleting it
+    last = None
+    with gzip.open(path, "rt") as segment:
+        for line in segment:
+            row = json.loads(line)
+            key = (dt.datetime.fromisoformat(row["created_at"]), row["id"])
+            if last is not None and key <= last:
+                continue
+            last = key
+            yield key, row
+
+
+def _month_bounds(month: str) -> tuple[dt.datetime, dt.datetime]:
+    start = dt.datetime.strptime(month, "%Y-%m").replace(tzinfo=dt.timezone.utc)
+    end = (start + dt.timedelta(days=32)).replace(day=1)
+    return start, end
+
+
+def read_archive(
+    root: str | Path,
+    watcher_ids: Iterable[uuid.UUID],
+    *,
+    since: dt.datetime | None = None,
+    until: dt.datetime | None = None,
+    status: HealthStatus | None = None,
+    chunk_rows: int = 500,
+) -> Iterator[list[list]]:
+    """Archived rows for ``watcher_ids`` oldest first, as chunks of ``EVENT_COLUMNS`` lists.
+
+    Segments are read a month at a time and merged across watchers, so only one month's
+    files are open at once and memory does not depend on archive size.
+    """
+    root = Path(root)
+    since = as_utc(since) if since is not None else None
+    until = as_utc(until) if until is not None else None
+    wanted_status = HealthStatus(status).value if status is not None else None
+    segments: dict[str, list[Path]] = {}
+    for watcher_id in watcher_ids:
+        for path in (root / str(watcher_id)).glob(f"*{_SUFFIX}"):
+            segments.setdefault(path.name.removesuffix(_SUFFIX), []).append(path)
+
+    chunk: list[list] = []
+    for month in sorted(segments):
+        start, end = _month_bounds(month)
+        if (since is not None and end <= since) or (until is not None and start >= until):
+            continue
+        merged = heapq.merge(*(_segment_rows(path) for path in segments[month]))
+        for (created_at, _), row in merged:
+            if since is not None and created_at < since:
+                continue
+            if until is not None and created_at >= until:
+                break
+            if wanted_status is not None and row["status"] != wanted_status:
+                continue
+            chunk.append([row.get(column) for column in EVENT_COLUMNS])
+            if len(chunk) >= chunk_rows:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
@@ -8,7 +8,7 @@ from sqlmodel import select
 from ..db import get_session
 from ..models import Membership, Role, User, Workspace
 from ..schemas import LoginRequest, Token, UserCreate
-from ..security import create_access_token, hash_password, verify_password
+from ..security import create_access_token, hash_password_async, verify_password_async
 
 
 async def register_user(user_data: UserCreate, session=Depends(get_session)) -> User:
@@ -19,19 +19,13 @@ async def register_user(user_data: UserCreate, session=Depends(get_session)) ->
     user = User(
         email=user_data.email,
         full_name=user_data.full_name,
-        hashed_password=hash_password(user_data.password),
+        hashed_password=await hash_password_async(user_data.password),
     )
-    session.add(user)
-    await session.commit()
-    await session.refresh(user)
-
+    # ids and timestamps are set client-side: one transaction, nothing to read back
     workspace = Workspace(name=f"{user.email} workspace", is_public=False)
+    session.add(user)
     session.add(workspace)
-    await session.commit()
-    await session.refresh(workspace)
-
-    membership = Membership(user_id=user.id, workspace_id=workspace.id, role=Role.owner)
-    session.add(membership)
+    session.add(Membership(user_id=user.id, workspace_id=workspace.id, role=Role.owner))
     await session.commit()
     return user
 
@@ -40,7 +34,7 @@ async def login_for_access_token(login: LoginRequest, session=Depends(get_sessio
     """Authenticate a user via username/password and return a JWT access token."""
     result = await session.exec(select(User).where(User.email == login.username))
     user = result.first()
-    if not user or not verify_password(login.password, user.hashed_password):
+    if not user or not await verify_password_async(login.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect email or password"
         )
@@ -58,7 +52,11 @@ async def get_or_create_user(
         return user
 
     random_password = secrets.token_urlsafe(16)
-    user = User(email=email, full_name=full_name, hashed_password=hash_password(random_password))
+    user = User(
+        email=email,
+        full_name=full_name,
+        hashed_password=await hash_password_async(random_password),
+    )
     session.add(user)
     await session.commit()
     await session.refresh(user)
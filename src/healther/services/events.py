@@ -0,0 +1,264 @@
+"""Health event persistence and listing shared by the API, RQ jobs and the check engine."""
+
+import asyncio
+import base64
+import csv
+import datetime as dt
+import io
+import json
+import uuid
+from collections.abc import AsyncIterator
+
+from fastapi import HTTPException
+from sqlalchemy import and_, bindparam, case, func, insert, or_, update
+from sqlalchemy import select as select_columns
+from sqlmodel import select
+
+from ..config import settings
+from ..models import HealthEvent, HealthStatus, ServiceWatcher
+from ..schemas import HealthEventPage
+from ..utils import as_utc
+from .archive import EVENT_COLUMNS as _EVENT_COLUMNS
+from .archive import encode_value, read_archive
+from .rollups import apply_events
+
+# rows fetched per round trip by the export cursor, and rows per streamed chunk
+EXPORT_FETCH_SIZE = 1000
+EXPORT_CHUNK_ROWS = 500
+
+
+_watchers = ServiceWatcher.__table__
+_since = bindparam("b_since", type_=_watchers.c.status_since.type)
+# one executemany per batch; an older event never overwrites a newer status, and
+# status_since only moves when the status actually changes
+_SET_CURRENT_STATUS = (
+    update(_watchers)
+    .where(_watchers.c.id == bindparam("b_id"))
+    .where(
+        or_(
+            _watchers.c.last_checked_at.is_(None),
+            _watchers.c.last_checked_at <= bindparam("b_checked_at"),
+        )
+    )
+    .values(
+        last_status=bindparam("b_status"),
+        last_checked_at=bindparam("b_checked_at"),
+        last_latency_ms=bindparam("b_latency"),
+        status_since=case(
+            (
+                _watchers.c.last_status == bindparam("b_continues"),
+                func.coalesce(_watchers.c.status_since, _since),
+            ),
+            else_=_since,
+        ),
+    )
+)
+
+
+def current_status_rows(events: list[HealthEvent]) -> list[dict]:
+    """Per watcher: its newest event, and where the run of that status starts in the batch.
+
+    ``b_continues`` is the status only if the run covers the whole batch, so the stored
+    ``status_since`` is kept when the watcher was already in that status before it.
+    Sentinel results (with a ``region``) never set the current status.
+    """
+    rows: dict[uuid.UUID, dict] = {}
+    shared = [event for event in events if event.region is None]
+    for event in sorted(shared, key=lambda event: as_utc(event.created_at)):
+        status = HealthStatus(event.status)
+        created_at = as_utc(event.created_at)
+        row = rows.get(event.watcher_id)
+        if row is None:
+            row = rows[event.watcher_id] = {"b_id": event.watcher_id, "b_continues": status}
+            row["b_since"] = created_at
+        elif row["b_status"] != status:
+            row["b_continues"], row["b_since"] = None, created_at
+        row.update(b_status=status, b_checked_at=created_at, b_latency=event.response_time_ms)
+    return list(rows.values())
+
+
+async def write_events(events: list[HealthEvent], session, *, chunk_size: int = 1000) -> None:
+    """Insert events, update rollups and watcher status in the caller's transaction.
+
+    Rows go out as multi-row INSERT statements; the caller owns the commit.
+    """
+    rows = [{column: getattr(event, column) for column in _EVENT_COLUMNS} for event in events]
+    for start in range(0, len(rows), chunk_size):
+        await session.exec(insert(HealthEvent).values(rows[start : start + chunk_size]))
+    await apply_events(events, session)
+    status_rows = current_status_rows(events)
+    if status_rows:
+        await session.exec(_SET_CURRENT_STATUS, params=status_rows)
+
+
+def encode_cursor(event: HealthEvent) -> str:
+    """Opaque keyset cursor pointing just past ``event`` in (created_at, id) DESC order."""
+    raw = json.dumps([event.created_at.isoformat(), str(event.id)])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[dt.datetime, uuid.UUID]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, event_id = json.loads(base64.urlsafe_b64decode(padded))
+        return dt.datetime.fromisoformat(created_at), uuid.UUID(event_id)
+    except (ValueError, TypeError):  # fmt: skip
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _filter_events(
+    stmt,
+    *,
+    workspace_id: uuid.UUID | None = None,
+    watcher_id: uuid.UUID | None = None,
+    since: dt.datetime | None = None,
+    until: dt.datetime | None = None,
+    status: HealthStatus | None = None,
+):
+    if workspace_id is not None:
+        stmt = stmt.join(ServiceWatcher, HealthEvent.watcher_id == ServiceWatcher.id).where(
+            ServiceWatcher.workspace_id == workspace_id, ServiceWatcher.deleted_at.is_(None)
+        )
+    if watcher_id is not None:
+        stmt = stmt.where(HealthEvent.watcher_id == watcher_id)
+    if since is not None:
+        stmt = stmt.where(HealthEvent.created_at >= as_utc(since))
+    if until is not None:
+        stmt = stmt.where(HealthEvent.created_at < as_utc(until))
+    if status is not None:
+        stmt = stmt.where(HealthEvent.status == status)
+    return stmt
+
+
+def events_query(
+    *,
+    workspace_id: uuid.UUID | None = None,
+    watcher_id: uuid.UUID | None = None,
+    since: dt.datetime | None = None,
+    until: dt.datetime | None = None,
+    status: HealthStatus | None = None,
+    cursor: str | None = None,
+    limit: int | None = None,
+):
+    """Newest-first event select; ``since`` is inclusive and ``until`` exclusive."""
+    stmt = _filter_events(
+        select(HealthEvent),
+        workspace_id=workspace_id,
+        watcher_id=watcher_id,
+        since=since,
+        until=until,
+        status=status,
+    )
+    if cursor is not None:
+        created_at, event_id = decode_cursor(cursor)
+        stmt = stmt.where(
+            or_(
+                HealthEvent.created_at < created_at,
+                and_(HealthEvent.created_at == created_at, HealthEvent.id < event_id),
+            )
+        )
+    stmt = stmt.order_by(HealthEvent.created_at.desc(), HealthEvent.id.desc())
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+async def list_events_page(session, *, limit: int, **filters) -> HealthEventPage:
+    """One page of events plus the cursor for the next one (``None`` on the last page)."""
+    result = await session.exec(events_query(limit=limit + 1, **filters))
+    events = result.all()
+    next_cursor = encode_cursor(events[limit - 1]) if len(events) > limit else None
+    return HealthEventPage(items=events[:limit], next_cursor=next_cursor)
+
+
+def events_page(
+    events: list,
+    *,
+    limit: int,
+    since: dt.datetime | None = None,
+    until: dt.datetime | None = None,
+    status: HealthStatus | None = None,
+    cursor: str | None = None,
+) -> HealthEventPage:
+    """``list_events_page`` over events already in memory, newest first, e.g. a snapshot's."""
+    after = decode_cursor(cursor) if cursor is not None else None
+    if after is not None:
+        after = (as_utc(after[0]), after[1])
+    selected = []
+    for event in events:
+        created_at = as_utc(event.created_at)
+        if since is not None and created_at < as_utc(since):
+            continue
+        if until is not None and created_at >= as_utc(until):
+            continue
+        if status is not None and event.status != status:
+            continue
+        if after is not None and (created_at, event.id) >= after:
+            continue
+        selected.append(event)
+        if len(selected) > limit:
+            break
+    next_cursor = encode_cursor(selected[limit - 1]) if len(selected) > limit else None
+    return HealthEventPage(items=selected[:limit], next_cursor=next_cursor)
+
+
+def export_query(**filters):
+    """Oldest-first plain column select for exports; no ORM objects are built."""
+    columns = [HealthEvent.__table__.c[column] for column in _EVENT_COLUMNS]
+    stmt = _filter_events(select_columns(*columns), **filters)
+    return stmt.order_by(HealthEvent.created_at, HealthEvent.id).execution_options(
+        yield_per=EXPORT_FETCH_SIZE
+    )
+
+
+async def _archived_watchers(session, filters: dict) -> list[uuid.UUID]:
+    stmt = select(ServiceWatcher.id).where(ServiceWatcher.deleted_at.is_(None))
+    if filters.get("workspace_id") is not None:
+        stmt = stmt.where(ServiceWatcher.workspace_id == filters["workspace_id"])
+    if filters.get("watcher_id") is not None:
+        stmt = stmt.where(ServiceWatcher.id == filters["watcher_id"])
+    return (await session.exec(stmt)).all()
+
+
+async def _export_chunks(session, filters: dict) -> AsyncIterator[list[list]]:
+    """Archived segments first, then live rows through a server-side cursor."""
+    archive = read_archive(
+        settings.archive_dir,
+        await _archived_watchers(session, filters),
+        since=filters.get("since"),
+        until=filters.get("until"),
+        status=filters.get("status"),
+        chunk_rows=EXPORT_CHUNK_ROWS,
+    )
+    # segment reads are blocking file I/O
+    while chunk := await asyncio.to_thread(next, archive, None):
+        yield chunk
+
+    result = await session.stream(export_query(**filters))
+    chunk = []
+    async for row in result:
+        chunk.append([encode_value(value) for value in row])
+        if len(chunk) >= EXPORT_CHUNK_ROWS:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def export_ndjson(session, **filters) -> AsyncIterator[str]:
+    """One JSON object per line."""
+    async for chunk in _export_chunks(session, filters):
+        yield "".join(json.dumps(dict(zip(_EVENT_COLUMNS, row))) + "\n" for row in chunk)
+
+
+async def export_csv(session, **filters) -> AsyncIterator[str]:
+    """Header row, then one row per event."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(_EVENT_COLUMNS)
+    yield buffer.getvalue()
+    async for chunk in _export_chunks(session, filters):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(chunk)
+        yield buffer.getvalue()
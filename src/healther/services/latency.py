@@ -0,0 +1,51 @@
+"""Latency percentiles merged from the sketches stored on the uptime rollups."""
+
+import datetime as dt
+import uuid
+
+from sqlalchemy import select as select_columns
+
+from ..models import DailyUptime, HourlyUptime
+from ..schemas import LatencyPercentilesOut
+from ..sketch import LatencySketch
+from .rollups import day_start, hour_start
+
+# window -> (span, rollup table, bucket floor); short windows read hours, long ones days
+WINDOWS = {
+    "1h": (dt.timedelta(hours=1), HourlyUptime, hour_start),
+    "24h": (dt.timedelta(hours=24), HourlyUptime, hour_start),
+    "7d": (dt.timedelta(days=7), DailyUptime, day_start),
+    "90d": (dt.timedelta(days=90), DailyUptime, day_start),
+}
+QUANTILES = {"p50": 0.5, "p90": 0.9, "p95": 0.95, "p99": 0.99}
+
+
+async def latency_percentiles(
+    watcher_id: uuid.UUID, session, *, window: str = "24h", now: dt.datetime | None = None
+) -> LatencyPercentilesOut:
+    """Merge at most 25 hourly or 91 daily sketches, however many checks they hold.
+
+    Windows are rounded out to whole buckets, so "1h" covers the current and the
+    previous hour.
+    """
+    span, model, bucket = WINDOWS[window]
+    since = bucket((now or dt.datetime.now(dt.timezone.utc)) - span)
+    result = await session.exec(
+        select_columns(model.latency_sketch).where(
+            model.watcher_id == watcher_id,
+            model.bucket_start >= since,
+            model.latency_sketch.is_not(None),
+        )
+    )
+    sketch = LatencySketch()
+    for (raw,) in result.all():
+        sketch.merge(LatencySketch.from_json(raw))
+    return LatencyPercentilesOut(
+        watcher_id=watcher_id,
+        window=window,
+        since=since,
+        count=sketch.count,
+        min_ms=sketch.min,
+        max_ms=sketch.max,
+        **{name: sketch.quantile(q) for name, q in QUANTILES.items()},
+    )
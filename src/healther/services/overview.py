@@ -0,0 +1,154 @@
+"""Workspace overview: every watcher's current status and uptime in one query."""
+
+import asyncio
+import datetime as dt
+import uuid
+
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy import select as select_columns
+from sqlmodel import select
+
+from ..models import (
+    DailyUptime,
+    HealthEvent,
+    HourlyUptime,
+    Membership,
+    NotificationRecipient,
+    ServiceWatcher,
+    Workspace,
+)
+from ..schemas import WatcherOut, WatcherOverview, WorkspaceOverviewOut
+from .events import events_query
+from .rollups import day_start, hour_start
+
+
+def _uptime_since(model, since: dt.datetime):
+    """Healthy percentage of the outer query's watcher since ``since``, NULL without data."""
+    total = func.sum(model.healthy_count + model.degraded_count + model.down_count)
+    return (
+        select_columns(func.sum(model.healthy_count) * 100.0 / func.nullif(total, 0))
+        .where(model.watcher_id == ServiceWatcher.id, model.bucket_start >= since)
+        .scalar_subquery()
+    )
+
+
+def overview_query(workspace_id: uuid.UUID, now: dt.datetime | None = None):
+    now = now or dt.datetime.now(dt.timezone.utc)
+    members = (
+        select_columns(func.count())
+        .select_from(Membership)
+        .where(Membership.workspace_id == Workspace.id)
+        .scalar_subquery()
+    )
+    recipients = (
+        select_columns(func.count())
+        .select_from(NotificationRecipient)
+        .where(
+            NotificationRecipient.workspace_id == Workspace.id,
+            NotificationRecipient.is_active.is_(True),
+        )
+        .scalar_subquery()
+    )
+    # rollup buckets are hours and days, so the windows are the last 24 and 90 of them
+    day = _uptime_since(HourlyUptime, hour_start(now) - dt.timedelta(hours=23))
+    quarter = _uptime_since(DailyUptime, day_start(now) - dt.timedelta(days=89))
+    return (
+        select(
+            Workspace,
+            members.label("member_count"),
+            recipients.label("recipient_count"),
+            ServiceWatcher,
+            day.label("uptime_24h"),
+            quarter.label("uptime_90d"),
+        )
+        .select_from(Workspace)
+        .outerjoin(
+            ServiceWatcher,
+            (ServiceWatcher.workspace_id == Workspace.id) & ServiceWatcher.deleted_at.is_(None),
+        )
+        .where(Workspace.id == workspace_id)
+        .order_by(ServiceWatcher.created_at, ServiceWatcher.id)
+    )
+
+
+def _rounded(value: float | None) -> float | None:
+    return round(value, 2) if value is not None else None
+
+
+async def workspace_overview(
+    workspace_id: uuid.UUID, session, *, now: dt.datetime | None = None
+) -> WorkspaceOverviewOut:
+    rows = (await session.exec(overview_query(workspace_id, now))).all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="Workspace not found")
+    workspace, member_count, recipient_count = rows[0][:3]
+    return WorkspaceOverviewOut(
+        workspace_id=workspace.id,
+        name=workspace.name,
+        is_public=workspace.is_public,
+        member_count=member_count,
+        recipient_count=recipient_count,
+        watchers=[
+            WatcherOverview(
+                **WatcherOut.model_validate(watcher).model_dump(),
+                uptime_24h=_rounded(uptime_24h),
+                uptime_90d=_rounded(uptime_90d),
+            )
+            for _, _, _, watcher, uptime_24h, uptime_90d in rows
+            if watcher is not None
+        ],
+    )
+
+
+async def backfill_current_status(session) -> int:
+    """Fill in current status from raw events, e.g. after upgrading an existing database."""
+    watchers = (
+        await session.exec(select(ServiceWatcher).where(ServiceWatcher.deleted_at.is_(None)))
+    ).all()
+    filled = 0
+    for watcher in watchers:
+        latest = (
+            await session.exec(
+                events_query(watcher_id=watcher.id, limit=1).where(HealthEvent.region.is_(None))
+            )
+        ).first()
+        if latest is None:
+            continue
+        # the run of the current status starts right after the last event that differs
+        changed = await session.exec(
+            select_columns(HealthEvent.created_at)
+            .where(
+                HealthEvent.watcher_id == watcher.id,
+                HealthEvent.region.is_(None),
+                HealthEvent.status != latest.status,
+            )
+            .order_by(HealthEvent.created_at.desc())
+            .limit(1)
+        )
+        changed_at = changed.first()
+        since = select_columns(func.min(HealthEvent.created_at)).where(
+            HealthEvent.watcher_id == watcher.id, HealthEvent.region.is_(None)
+        )
+        if changed_at is not None:
+            since = since.where(HealthEvent.created_at > changed_at[0])
+        watcher.last_status = latest.status
+        watcher.last_checked_at = latest.created_at
+        watcher.last_latency_ms = latest.response_time_ms
+        watcher.status_since = (await session.exec(since)).first()[0]
+        session.add(watcher)
+        filled += 1
+    await session.commit()
+    return filled
+
+
+async def _main_async() -> None:
+    from ..db import SessionLocal
+
+    async with SessionLocal() as session:
+        filled = await backfill_current_status(session)
+    print(f"Backfilled current status for {filled} watchers")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main_async())
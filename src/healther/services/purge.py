@@ -0,0 +1,167 @@
+"""Background purge of deleted watchers: history goes in bounded chunks, the row goes last.
+
+Deleting a watcher only marks it (``deleted_at``), which hides it and stops its checks at
+once. The purge job then removes its events and rollups a chunk per transaction, so a
+watcher with years of history never holds locks or memory for more than one chunk.
+
+A check claimed just before the delete may still be running, and its result may sit in
+an event sink until the next flush. The purge therefore starts ``purge_delay()`` after the
+delete, once the check's scheduler lease has run out and its result has been written.
+"""
+
+import asyncio
+import datetime as dt
+import logging
+import uuid
+from collections.abc import Callable
+
+from redis import Redis
+from rq import Queue
+from rq.job import JobStatus
+from sqlalchemy import delete
+from sqlalchemy import select as select_columns
+from sqlmodel import select
+
+from ..config import settings
+from ..models import DailyUptime, HealthEvent, HourlyUptime, ServiceWatcher
+from ..utils import as_utc
+from . import archive
+
+logger = logging.getLogger(__name__)
+
+purge_queue = Queue("maintenance", connection=Redis.from_url(settings.redis_url))
+
+
+def purge_delay() -> dt.timedelta:
+    return dt.timedelta(seconds=settings.scheduler_lease_seconds + settings.event_flush_seconds)
+
+
+def purge_job_id(watcher_id: uuid.UUID) -> str:
+    return f"healther-purge-{watcher_id}"
+
+
+async def _delete_chunk(model, key, watcher_id: uuid.UUID, chunk_size: int, session) -> int:
+    """DELETE ... WHERE watcher_id = ? LIMIT n, spelled portably as a keyed subquery."""
+    chunk = select_columns(key).where(model.watcher_id == watcher_id).limit(chunk_size)
+    result = await session.exec(
+        delete(model)
+        .where(model.watcher_id == watcher_id, key.in_(chunk))
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    return result.rowcount
+
+
+async def purge_watcher(
+    watcher_id: uuid.UUID,
+    session,
+    *,
+    root=None,
+    chunk_size: int | None = None,
+    progress: Callable[[dict], None] | None = None,
+    now: dt.datetime | None = None,
+) -> dict:
+    """Remove a soft-deleted watcher's events, rollups, archive and finally its row.
+
+    Every chunk commits on its own and ``progress`` is called after each one, so an
+    interrupted purge simply resumes where it stopped when it is run again. A watcher
+    deleted less than ``purge_delay()`` ago is left alone (``done`` stays false); the
+    next retention run picks it up.
+    """
+    chunk_size = chunk_size or settings.purge_chunk_size
+    counts = {"events_purged": 0, "rollups_purged": 0, "done": False}
+    watcher = await session.get(ServiceWatcher, watcher_id)
+    if watcher is None or watcher.deleted_at is None:
+        # already purged, or restored behind our back: nothing to do
+        counts["done"] = True
+        return counts
+    now = now or dt.datetime.now(dt.timezone.utc)
+    if as_utc(watcher.deleted_at) > now - purge_delay():
+        logger.info("Not purging watcher %s yet: a check may still be writing", watcher_id)
+        return counts
+    tables = [
+        ("events_purged", HealthEvent, HealthEvent.id),
+        ("rollups_purged", HourlyUptime, HourlyUptime.bucket_start),
+        ("rollups_purged", DailyUptime, DailyUptime.bucket_start),
+    ]
+    for counter, model, key in tables:
+        while deleted := await _delete_chunk(model, key, watcher_id, chunk_size, session):
+            counts[counter] += deleted
+            if progress is not None:
+                progress(dict(counts))
+            if deleted < chunk_size:
+                break
+    await asyncio.to_thread(archive.remove_watcher, root or settings.archive_dir, watcher_id)
+    await session.exec(
+        delete(ServiceWatcher)
+        .where(ServiceWatcher.id == watcher_id)
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    counts["done"] = True
+    if progress is not None:
+        progress(dict(counts))
+    logger.info(
+        "Purged watcher %s: %d events, %d rollups",
+        watcher_id,
+        counts["events_purged"],
+        counts["rollups_purged"],
+    )
+    return counts
+
+
+async def purge_deleted(session, **options) -> int:
+    """Purge every soft-deleted watcher left over, e.g. when its job was lost."""
+    cutoff = dt.datetime.now(dt.timezone.utc) - purge_delay()
+    watcher_ids = (
+        await session.exec(
+            select(ServiceWatcher.id).where(
+                ServiceWatcher.deleted_at.is_not(None), ServiceWatcher.deleted_at <= cutoff
+            )
+        )
+    ).all()
+    for watcher_id in watcher_ids:
+        await purge_watcher(watcher_id, session, **options)
+    return len(watcher_ids)
+
+
+def _status(watcher_id: uuid.UUID, job) -> dict:
+    return {"watcher_id": watcher_id, "status": JobStatus(job.get_status()).value, **job.meta}
+
+
+def enqueue_purge(watcher: ServiceWatcher, queue: Queue | None = None) -> dict:
+    """Queue the purge once per watcher and return its status; the job's meta has progress."""
+    queue = purge_queue if queue is None else queue
+    job_id = purge_job_id(watcher.id)
+    job = queue.fetch_job(job_id)
+    if job is None:
+        job = queue.enqueue_in(
+            purge_delay(),
+            "healther.workers.purge_watcher",
+            watcher.id,
+            job_id=job_id,
+            job_timeout=settings.purge_job_timeout_seconds,
+            result_ttl=settings.purge_status_ttl_seconds,
+            meta={"workspace_id": str(watcher.workspace_id)},
+        )
+    return _status(watcher.id, job)
+
+
+def purge_status(watcher_id: uuid.UUID, queue: Queue | None = None) -> dict | None:
+    """Status and progress of a watcher's purge job, ``None`` once it has expired."""
+    job = (purge_queue if queue is None else queue).fetch_job(purge_job_id(watcher_id))
+    if job is None:
+        return None
+    return _status(watcher_id, job)
+
+
+async def _main_async() -> None:
+    from ..db import SessionLocal
+
+    async with SessionLocal() as session:
+        purged = await purge_deleted(session)
+    print(f"Purged {purged} deleted watchers")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main_async())
@@ -0,0 +1,292 @@
+"""Hourly/daily uptime rollups, maintained as health events are written."""
+
+import asyncio
+import datetime as dt
+import uuid
+
+from sqlalchemy import bindparam, delete, func, tuple_, update
+from sqlalchemy import select as select_columns
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import select
+
+from ..config import settings
+from ..models import DailyUptime, HealthEvent, HealthStatus, HourlyUptime, ServiceWatcher
+from ..schemas import UptimeBar, WatcherUptime, WorkspaceUptimeOut
+from ..sketch import LatencySketch
+from ..utils import as_utc
+from .archive import archived_watchers
+
+_COUNT_COLUMNS = {
+    HealthStatus.healthy: "healthy_count",
+    HealthStatus.degraded: "degraded_count",
+    HealthStatus.down: "down_count",
+}
+
+
+def hour_start(value: dt.datetime) -> dt.datetime:
+    return as_utc(value).replace(minute=0, second=0, microsecond=0)
+
+
+def day_start(value: dt.datetime) -> dt.datetime:
+    return as_utc(value).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _aggregate(events: list[HealthEvent], bucket) -> list[dict]:
+    rows: dict[tuple[uuid.UUID, dt.datetime], dict] = {}
+    for event in events:
+        key = (event.watcher_id, bucket(event.created_at))
+        row = rows.get(key)
+        if row is None:
+            row = rows[key] = {
+                "watcher_id": key[0],
+                "bucket_start": key[1],
+                "healthy_count": 0,
+                "degraded_count": 0,
+                "down_count": 0,
+                "latency_count": 0,
+                "latency_sum_ms": 0.0,
+                "latency_min_ms": None,
+                "latency_max_ms": None,
+            }
+        row[_COUNT_COLUMNS[HealthStatus(event.status)]] += 1
+        latency = event.response_time_ms
+        if latency is not None:
+            row["latency_count"] += 1
+            row["latency_sum_ms"] += latency
+            if row["latency_min_ms"] is None or latency < row["latency_min_ms"]:
+                row["latency_min_ms"] = latency
+            if row["latency_max_ms"] is None or latency > row["latency_max_ms"]:
+                row["latency_max_ms"] = latency
+    return list(rows.values())
+
+
+def _upsert(model, rows: list[dict], dialect: str):
+    """Build an INSERT .. ON CONFLICT that adds ``rows`` onto existing buckets."""
+    is_postgres = dialect == "postgresql"
+    stmt = (postgresql.insert if is_postgres else sqlite.insert)(model).values(rows)
+    table = model.__table__
+    new = stmt.excluded
+    least = func.least if is_postgres else func.min
+    greatest = func.greatest if is_postgres else func.max
+
+    def combine(pick, column):
+        # NULL means "no latency sample yet" on either side
+        return pick(
+            func.coalesce(table.c[column], new[column]), func.coalesce(new[column], table.c[column])
+        )
+
+    additive = [*_COUNT_COLUMNS.values(), "latency_count", "latency_sum_ms"]
+    updates = {column: table.c[column] + new[column] for column in additive}
+    updates["latency_min_ms"] = combine(least, "latency_min_ms")
+    updates["latency_max_ms"] = combine(greatest, "latency_max_ms")
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.watcher_id, table.c.bucket_start], set_=updates
+    )
+
+
+async def _merge_sketches(model, events: list[HealthEvent], bucket, session) -> None:
+    """Add the batch's latencies to the buckets' sketches.
+
+    Runs after the upsert, which created the rows and (on Postgres) locked them until
+    commit, so concurrent writers to the same bucket merge one after the other.
+    """
+    sketches: dict[tuple[uuid.UUID, dt.datetime], LatencySketch] = {}
+    for event in events:
+        if event.response_time_ms is not None:
+            key = (event.watcher_id, bucket(event.created_at))
+            sketches.setdefault(key, LatencySketch()).add(event.response_time_ms)
+    if not sketches:
+        return
+    table = model.__table__
+    stored = await session.exec(
+        select_columns(table.c.watcher_id, table.c.bucket_start, table.c.latency_sketch).where(
+            tuple_(table.c.watcher_id, table.c.bucket_start).in_(list(sketches))
+        )
+    )
+    for watcher_id, bucket_start, raw in stored.all():
+        sketch = sketches.get((watcher_id, as_utc(bucket_start)))
+        if sketch is not None:
+            sketch.merge(LatencySketch.from_json(raw))
+    await session.exec(
+        update(table)
+        .where(
+            table.c.watcher_id == bindparam("b_watcher_id"),
+            table.c.bucket_start == bindparam("b_bucket_start"),
+        )
+        .values(latency_sketch=bindparam("b_sketch")),
+        params=[
+            {"b_watcher_id": watcher_id, "b_bucket_start": start, "b_sketch": sketch.to_json()}
+            for (watcher_id, start), sketch in sketches.items()
+        ],
+    )
+
+
+async def apply_events(events: list[HealthEvent], session) -> None:
+    """Fold events into the hourly and daily rollups; the caller owns the commit.
+
+    Sentinel results (events with a ``region``) are left out: regions can disagree, and
+    one unreachable region must not count as downtime for everyone.
+    """
+    events = [event for event in events if event.region is None]
+    if not events:
+        return
+    dialect = session.bind.dialect.name
+    for model, bucket in ((HourlyUptime, hour_start), (DailyUptime, day_start)):
+        await session.exec(_upsert(model, _aggregate(events, bucket), dialect))
+        await _merge_sketches(model, events, bucket, session)
+
+
+def _ratio(healthy: int, total: int) -> float | None:
+    return healthy / total if total else None
+
+
+def _percentage(healthy: int, total: int) -> float | None:
+    return round(healthy / total * 100, 2) if total else None
+
+
+def build_uptime(
+    workspace_id: uuid.UUID,
+    watcher_ids: list[uuid.UUID],
+    rollups: list[DailyUptime],
+    *,
+    days: int,
+    now: dt.datetime | None = None,
+) -> WorkspaceUptimeOut:
+    """Shape daily rollup rows into ``days`` bars per watcher, oldest first."""
+    today = day_start(now or dt.datetime.now(dt.timezone.utc)).date()
+    window = [today - dt.timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+    by_key = {(row.watcher_id, row.bucket_start.date()): row for row in rollups}
+
+    watchers: list[WatcherUptime] = []
+    workspace_healthy = workspace_total = 0
+    for watcher_id in watcher_ids:
+        bars: list[UptimeBar] = []
+        healthy_sum = total_sum = 0
+        for day in window:
+            row = by_key.get((watcher_id, day))
+            healthy = row.healthy_count if row else 0
+            degraded = row.degraded_count if row else 0
+            down = row.down_count if row else 0
+            total = healthy + degraded + down
+            healthy_sum += healthy
+            total_sum += total
+            bars.append(
+                UptimeBar(
+                    day=day,
+                    healthy=healthy,
+                    degraded=degraded,
+                    down=down,
+                    ratio=_ratio(healthy, total),
+                    latency_avg_ms=(
+                        row.latency_sum_ms / row.latency_count if row and row.latency_count else None
+                    ),
+                )
+            )
+        workspace_healthy += healthy_sum
+        workspace_total += total_sum
+        watchers.append(
+            WatcherUptime(
+                watcher_id=watcher_id,
+                uptime_percentage=_percentage(healthy_sum, total_sum),
+                bars=bars,
+            )
+        )
+    return WorkspaceUptimeOut(
+        workspace_id=workspace_id,
+        days=days,
+        uptime_percentage=_percentage(workspace_healthy, workspace_total),
+        watchers=watchers,
+    )
+
+
+async def workspace_uptime(
+    workspace_id: uuid.UUID, session, *, days: int = 90, now: dt.datetime | None = None
+) -> WorkspaceUptimeOut:
+    """Daily bars and uptime for every watcher of a workspace, read from the rollups."""
+    start = day_start(now or dt.datetime.now(dt.timezone.utc)) - dt.timedelta(days=days - 1)
+    watcher_ids = await session.exec(
+        select(ServiceWatcher.id).where(
+            ServiceWatcher.workspace_id == workspace_id, ServiceWatcher.deleted_at.is_(None)
+        )
+    )
+    rollups = await session.exec(
+        select(DailyUptime)
+        .join(ServiceWatcher, DailyUptime.watcher_id == ServiceWatcher.id)
+        .where(
+            ServiceWatcher.workspace_id == workspace_id,
+            ServiceWatcher.deleted_at.is_(None),
+            DailyUptime.bucket_start >= start,
+        )
+    )
+    return build_uptime(workspace_id, watcher_ids.all(), rollups.all(), days=days, now=now)
+
+
+async def rebuild_rollups(session, *, chunk_size: int = 5000, archive_root=None) -> int:
+    """Recompute rollups from raw events, e.g. after upgrading an existing database.
+
+    Buckets holding archived events cannot be recomputed from the table, so for a watcher
+    with archive segments only whole days after its oldest remaining event are rebuilt;
+    older buckets are kept as they are.
+    """
+
+    archived = archived_watchers(archive_root or settings.archive_dir)
+    # per archived watcher, the first bucket made only of events still in the table
+    rebuild_from: dict[uuid.UUID, dt.datetime | None] = {}
+    if archived:
+        oldest = await session.exec(
+            select_columns(HealthEvent.watcher_id, func.min(HealthEvent.created_at))
+            .where(HealthEvent.watcher_id.in_(archived), HealthEvent.region.is_(None))
+            .group_by(HealthEvent.watcher_id)
+        )
+        for watcher_id, created_at in oldest.all():
+            start = day_start(created_at)
+            rebuild_from[watcher_id] = (
+                start if start == as_utc(created_at) else start + dt.timedelta(days=1)
+            )
+        for watcher_id in archived - rebuild_from.keys():
+            # everything archived: there is nothing to rebuild from
+            rebuild_from[watcher_id] = None
+    for model in (HourlyUptime, DailyUptime):
+        await session.exec(delete(model).where(model.watcher_id.not_in(archived)))
+        for watcher_id, start in rebuild_from.items():
+            if start is not None:
+                await session.exec(
+                    delete(model).where(model.watcher_id == watcher_id, model.bucket_start >= start)
+                )
+
+    processed = 0
+    last = None
+    while True:
+        stmt = select(HealthEvent).order_by(HealthEvent.created_at, HealthEvent.id)
+        if last is not None:
+            stmt = stmt.where(tuple_(HealthEvent.created_at, HealthEvent.id) > last)
+        events = (await session.exec(stmt.limit(chunk_size))).all()
+        if not events:
+            break
+        last = (events[-1].created_at, events[-1].id)
+        events = [
+            event
+            for event in events
+            if event.watcher_id not in archived
+            or (
+                rebuild_from[event.watcher_id] is not None
+                and as_utc(event.created_at) >= rebuild_from[event.watcher_id]
+            )
+        ]
+        if events:
+            await apply_events(events, session)
+            processed += len(events)
+    await session.commit()
+    return processed
+
+
+async def _main_async() -> None:
+    from ..db import SessionLocal
+
+    async with SessionLocal() as session:
+        processed = await rebuild_rollups(session)
+    print(f"Rebuilt uptime rollups from {processed} events")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main_async())
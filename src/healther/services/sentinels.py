@@ -0,0 +1,201 @@
+"""Sentinels: registration, watcher assignment and batched result ingestion.
+
+A sentinel checks watchers from its own region and posts what it saw about once a
+minute as one gzip-compressed batch. Every result carries an idempotency key; the event
+id is derived from it, so a batch that is retried after a lost response is stored once.
+
+Results are stored with the sentinel's region and kept out of the watcher's current
+status, its rollups, the live feed and public snapshots. Those describe what the main
+checker sees; mixing regions in would let one unreachable region flap every watcher.
+"""
+
+import asyncio
+import datetime as dt
+import logging
+import sys
+import uuid
+import zlib
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import select as select_columns
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+
+from ..config import settings
+from ..models import HealthEvent, Sentinel, ServiceWatcher
+from ..schemas import (
+    RejectedResult,
+    SentinelAssignmentOut,
+    SentinelBatch,
+    SentinelBatchOut,
+    SentinelWatcher,
+)
+from ..security import hash_sentinel_token, new_sentinel_token
+from ..utils import as_utc
+from .events import write_events
+
+logger = logging.getLogger(__name__)
+
+# namespace for event ids derived from (sentinel id, idempotency key)
+_EVENT_NAMESPACE = uuid.UUID("5f0b8f5e-2c1d-4a59-9c43-0d7f7f3e9a11")
+
+
+def event_id(sentinel_id: uuid.UUID, idempotency_key: str) -> uuid.UUID:
+    return uuid.uuid5(_EVENT_NAMESPACE, f"{sentinel_id}:{idempotency_key}")
+
+
+async def create_sentinel(name: str, region: str, session) -> tuple[Sentinel, str]:
+    """Register a sentinel and return it with its token, which is not stored anywhere."""
+    token = new_sentinel_token()
+    sentinel = Sentinel(name=name, region=region, token_hash=hash_sentinel_token(token))
+    session.add(sentinel)
+    await session.commit()
+    await session.refresh(sentinel)
+    return sentinel, token
+
+
+async def sentinel_assignment(sentinel: Sentinel, session) -> SentinelAssignmentOut:
+    """Every live watcher, with just what a sentinel needs to check it."""
+    result = await session.exec(
+        select(ServiceWatcher).where(ServiceWatcher.deleted_at.is_(None)).order_by(ServiceWatcher.id)
+    )
+    return SentinelAssignmentOut(
+        sentinel_id=sentinel.id,
+        region=sentinel.region,
+        watchers=[SentinelWatcher.model_validate(watcher) for watcher in result.all()],
+    )
+
+
+async def read_body(request) -> bytes:
+    """Read a raw batch body, refusing it as soon as it passes ``SENTINEL_MAX_BODY_BYTES``."""
+    limit = settings.sentinel_max_body_bytes
+    length = request.headers.get("content-length")
+    if length is not None and length.isdigit() and int(length) > limit:
+        raise HTTPException(status_code=413, detail="Batch body too large")
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            raise HTTPException(status_code=413, detail="Batch body too large")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def decode_batch(body: bytes, content_encoding: str | None) -> SentinelBatch:
+    """Inflate (gzip or identity) and validate a batch, refusing oversized bodies."""
+    limit = settings.sentinel_max_body_bytes
+    encoding = (content_encoding or "identity").strip().lower()
+    if encoding == "gzip":
+        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            data = inflater.decompress(body, limit + 1)
+        except zlib.error:
+            raise HTTPException(status_code=400, detail="Invalid gzip body")
+        if len(data) <= limit and not inflater.eof:
+            raise HTTPException(status_code=400, detail="Truncated gzip body")
+    elif encoding == "identity":
+        data = body
+    else:
+        raise HTTPException(status_code=415, detail=f"Unsupported encoding {encoding!r}")
+    if len(data) > limit:
+        raise HTTPException(status_code=413, detail="Batch body too large")
+    try:
+        batch = SentinelBatch.model_validate_json(data)
+    except ValidationError as exc:
+        raise HTTPException(status_code=422, detail=exc.errors(include_url=False))
+    if len(batch.results) > settings.sentinel_max_batch:
+        raise HTTPException(
+            status_code=413, detail=f"At most {settings.sentinel_max_batch} results per batch"
+        )
+    return batch
+
+
+async def ingest_batch(
+    sentinel: Sentinel, batch: SentinelBatch, session, *, now: dt.datetime | None = None
+) -> SentinelBatchOut:
+    """Store the new results of a batch with one bulk insert, skipping ones already seen."""
+    if batch.sentinel_id != sentinel.id or batch.region != sentinel.region:
+        raise HTTPException(status_code=403, detail="Batch is tagged for another sentinel")
+    now = now or dt.datetime.now(dt.timezone.utc)
+    earliest = now - dt.timedelta(seconds=settings.sentinel_max_age_seconds)
+    latest = now + dt.timedelta(seconds=settings.sentinel_max_skew_seconds)
+
+    rejected: list[RejectedResult] = []
+    candidates = {}
+    for result in batch.results:
+        checked_at = as_utc(result.checked_at)
+        if not earliest <= checked_at <= latest:
+            rejected.append(
+                RejectedResult(
+                    idempotency_key=result.idempotency_key, reason="checked_at out of range"
+                )
+            )
+            continue
+        # a key repeated within the batch is the same result
+        candidates.setdefault(event_id(sentinel.id, result.idempotency_key), result)
+
+    watcher_ids = {result.watcher_id for result in candidates.values()}
+    live_ids = set()
+    if watcher_ids:
+        rows = await session.exec(
+            select_columns(ServiceWatcher.id).where(
+                ServiceWatcher.id.in_(watcher_ids), ServiceWatcher.deleted_at.is_(None)
+            )
+        )
+        live_ids = {row[0] for row in rows.all()}
+    seen = set()
+    if candidates:
+        rows = await session.exec(
+            select_columns(HealthEvent.id).where(HealthEvent.id.in_(list(candidates)))
+        )
+        seen = {row[0] for row in rows.all()}
+
+    events = []
+    for key, result in candidates.items():
+        if result.watcher_id not in live_ids:
+            rejected.append(
+                RejectedResult(idempotency_key=result.idempotency_key, reason="unknown watcher")
+            )
+        elif key not in seen:
+            events.append(
+                HealthEvent(
+                    id=key,
+                    watcher_id=result.watcher_id,
+                    status=result.status,
+                    response_status=result.response_status,
+                    response_time_ms=result.response_time_ms,
+                    message=result.message,
+                    created_at=as_utc(result.checked_at),
+                    region=sentinel.region,
+                )
+            )
+    try:
+        await write_events(events, session)
+        sentinel.last_seen_at = now
+        session.add(sentinel)
+        await session.commit()
+    except IntegrityError:
+        # the same results are being stored by a concurrent retry of this batch
+        raise HTTPException(status_code=409, detail="Batch is already being ingested; retry")
+    return SentinelBatchOut(
+        accepted=len(events),
+        duplicates=len(batch.results) - len(rejected) - len(events),
+        rejected=rejected,
+    )
+
+
+async def _main_async(name: str, region: str) -> None:
+    from ..db import SessionLocal
+
+    async with SessionLocal() as session:
+        sentinel, token = await create_sentinel(name, region, session)
+    print(f"Sentinel {sentinel.id} ({name}, {region})")
+    print(f"SENTINEL_TOKEN={token}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m healther.services.sentinels NAME REGION")
+    asyncio.run(_main_async(sys.argv[1], sys.argv[2]))
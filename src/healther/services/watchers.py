@@ -1,103 +1,193 @@
-"""Service watchers CRUD and health check enqueueing."""
+"""Service watchers CRUD and health check scheduling."""
 
+import datetime as dt
+import json
+import time
 import uuid
 
 import httpx
 from fastapi import HTTPException
-from redis import Redis
-from rq import Queue
+from pydantic import ValidationError
+from sqlalchemy import select as select_columns
 from sqlmodel import select
 
+from .. import metrics
+from ..alerts import alert_pipeline
 from ..config import settings
+from ..http_client import http_clients
 from ..models import HealthEvent, HealthStatus, Role, ServiceWatcher, WatchFrequency
-from ..notifications import enqueue_alert
+from ..scheduler import check_scheduler
+from ..schemas import WatcherCreate, WatcherImport
+from ..snapshots import invalidate_snapshot
+from . import purge
+from .events import write_events
 
-# Single Redis connection and queue used by API to enqueue health checks
-redis_conn = Redis.from_url(settings.redis_url)
-queue = Queue("health-checks", connection=redis_conn)
+
+def _central_schedule() -> bool:
+    # sharded engines keep their slice of the schedule in memory and read watcher edits
+    # on their next refresh; nothing reads the Redis schedule then
+    return settings.check_backend != "sharded"
 
 
 async def create_watcher(workspace_id: uuid.UUID, data, role: Role, session):
-    """Create a watcher and enqueue its first check."""
+    """Create a watcher and add it to the check schedule."""
     if role not in (Role.owner, Role.admin):
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     watcher = ServiceWatcher(workspace_id=workspace_id, **data.model_dump())
     session.add(watcher)
     await session.commit()
     await session.refresh(watcher)
-    queue.enqueue("healther.workers.run_check", watcher.id)
+    if _central_schedule():
+        check_scheduler.add(watcher.id, _interval_as_timedelta(watcher).total_seconds())
+    invalidate_snapshot(watcher.workspace_id)
     return watcher
 
 
+_YAML_TYPES = {"application/yaml", "application/x-yaml", "text/yaml", "text/x-yaml"}
+
+
+def _yaml(status_code: int):
+    try:
+        import yaml
+    except ImportError:
+        raise HTTPException(status_code=status_code, detail="YAML needs PyYAML: pip install .[yaml]")
+    return yaml
+
+
+def parse_watcher_import(body: bytes, content_type: str | None) -> list[WatcherCreate]:
+    """Read a JSON or YAML watcher list: a bare list, or ``{"watchers": [...]}`` as exported."""
+    media_type = (content_type or "application/json").split(";")[0].strip().lower()
+    if media_type in _YAML_TYPES:
+        yaml = _yaml(415)
+        try:
+            data = yaml.safe_load(body)
+        except yaml.YAMLError:
+            raise HTTPException(status_code=400, detail="Invalid YAML body")
+    elif media_type == "application/json":
+        try:
+            data = json.loads(body)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid JSON body")
+    else:
+        raise HTTPException(status_code=415, detail=f"Unsupported content type {media_type!r}")
+    if isinstance(data, list):
+        data = {"watchers": data}
+    try:
+        watchers = WatcherImport.model_validate(data).watchers
+    except ValidationError as exc:
+        raise HTTPException(status_code=422, detail=exc.errors(include_url=False))
+    if len(watchers) > settings.watcher_import_max:
+        raise HTTPException(
+            status_code=413, detail=f"At most {settings.watcher_import_max} watchers per import"
+        )
+    return watchers
+
+
+async def import_watchers(
+    workspace_id: uuid.UUID, items: list[WatcherCreate], role: Role, session
+) -> dict:
+    """Create many watchers in one transaction and schedule them with one Redis call.
+
+    Items matching a live watcher of the workspace (same name and URL), or an earlier
+    item, are skipped, so importing the same export twice creates nothing the second time.
+    """
+    if role not in (Role.owner, Role.admin):
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    existing = await session.exec(
+        select_columns(ServiceWatcher.name, ServiceWatcher.url).where(
+            ServiceWatcher.workspace_id == workspace_id, ServiceWatcher.deleted_at.is_(None)
+        )
+    )
+    seen = {tuple(row) for row in existing.all()}
+    watchers, skipped = [], []
+    for item in items:
+        if (item.name, item.url) in seen:
+            skipped.append(item)
+            continue
+        seen.add((item.name, item.url))
+        watchers.append(ServiceWatcher(workspace_id=workspace_id, **item.model_dump()))
+    if watchers:
+        session.add_all(watchers)
+        await session.commit()
+        # first checks spread over each watcher's whole interval, so the new load starts flat
+        if _central_schedule():
+            check_scheduler.add_many(
+                {
+                    watcher.id: _interval_as_timedelta(watcher).total_seconds()
+                    for watcher in watchers
+                },
+                spread=float("inf"),
+            )
+        invalidate_snapshot(workspace_id)
+    return {"created": watchers, "skipped": skipped}
+
+
+async def export_watchers(workspace_id: uuid.UUID, session) -> WatcherImport:
+    """The workspace's watcher configuration, oldest first, in the shape the import takes."""
+    watchers = sorted(await list_watchers(workspace_id, session), key=lambda w: w.created_at)
+    return WatcherImport(
+        watchers=[WatcherCreate.model_validate(w, from_attributes=True) for w in watchers]
+    )
+
+
+def dump_watchers(export: WatcherImport, format: str) -> tuple[str, str]:
+    """Serialize an export; returns the body and its media type."""
+    if format == "yaml":
+        body = _yaml(406).safe_dump(export.model_dump(mode="json"), sort_keys=False)
+        return body, "application/yaml"
+    return export.model_dump_json(indent=2), "application/json"
+
+
 async def list_watchers(workspace_id: uuid.UUID, session):
     result = await session.exec(
-        select(ServiceWatcher).where(ServiceWatcher.workspace_id == workspace_id)
+        select(ServiceWatcher).where(
+            ServiceWatcher.workspace_id == workspace_id, ServiceWatcher.deleted_at.is_(None)
+        )
     )
     return result.all()
 
 
-async def record_event(
-    watcher_id: uuid.UUID,
-    status: HealthStatus,
-    response_status: int | None,
-    response_time: float | None,
-    message: str | None,
-    session,
-):
-    event = HealthEvent(
-        watcher_id=watcher_id,
-        status=status,
-        response_status=response_status,
-        response_time_ms=response_time,
-        message=message,
-    )
-    session.add(event)
-    await session.commit()
+async def run_http_check(watcher: ServiceWatcher) -> HealthEvent:
+    """Run the HTTP request for a watcher and classify it, without touching the DB."""
+    started = time.perf_counter()
+    event = await _http_check(watcher)
+    metrics.check_duration.observe(time.perf_counter() - started, event.status.value)
     return event
 
 
-async def perform_check(watcher: ServiceWatcher, session):
-    """Perform a single HTTP check for the watcher and persist a HealthEvent."""
-    event = None
+async def _http_check(watcher: ServiceWatcher) -> HealthEvent:
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            method = "HEAD"
-            if watcher.expected_body:
-                method = "GET"
-            response = await client.request(method, watcher.url)
-            elapsed_ms = response.elapsed.total_seconds() * 1000
-            if response.status_code != watcher.expected_status:
-                event = await record_event(
-                    watcher.id,
-                    HealthStatus.down,
-                    response.status_code,
-                    elapsed_ms,
-                    "Unexpected status",
-                    session,
-                )
-            elif watcher.expected_body and watcher.expected_body not in response.text:
-                event = await record_event(
-                    watcher.id,
-                    HealthStatus.degraded,
-                    response.status_code,
-                    elapsed_ms,
-                    "Body mismatch",
-                    session,
-                )
-            else:
-                event = await record_event(
-                    watcher.id, HealthStatus.healthy, response.status_code, elapsed_ms, None, session
-                )
-    except httpx.RequestError as exc:
-        event = await record_event(
-            watcher.id, HealthStatus.down, None, None, f"Error: {exc}", session
+        method = "HEAD"
+        if watcher.expected_body:
+            method = "GET"
+        response = await http_clients.request(method, watcher.url, cold=watcher.cold_connection)
+        elapsed_ms = response.elapsed.total_seconds() * 1000
+        if response.status_code != watcher.expected_status:
+            status, message = HealthStatus.down, "Unexpected status"
+        elif watcher.expected_body and watcher.expected_body not in response.text:
+            status, message = HealthStatus.degraded, "Body mismatch"
+        else:
+            status, message = HealthStatus.healthy, None
+        return HealthEvent(
+            watcher_id=watcher.id,
+            status=status,
+            response_status=response.status_code,
+            response_time_ms=elapsed_ms,
+            message=message,
         )
+    except httpx.RequestError as exc:
+        return HealthEvent(watcher_id=watcher.id, status=HealthStatus.down, message=f"Error: {exc}")
 
-    if event and event.status != HealthStatus.healthy:
-        enqueue_alert(event.id)
 
-    # schedule next run
-    queue.enqueue_in(_interval_as_timedelta(watcher), "healther.workers.run_check", watcher.id)
+async def perform_check(watcher: ServiceWatcher, session):
+    """Perform a single HTTP check for the watcher and persist a HealthEvent.
+
+    The next run is owned by the scheduler and alerting by the caller, not by this call.
+    """
+    event = await run_http_check(watcher)
+    await write_events([event], session)
+    await session.commit()
+    return event
 
 
 def _interval_as_timedelta(watcher: ServiceWatcher):
@@ -114,8 +204,20 @@ def _interval_as_timedelta(watcher: ServiceWatcher):
     return timedelta(minutes=15)
 
 
+def check_config(watcher: ServiceWatcher) -> tuple:
+    """The fields an edit can change that matter to the next check."""
+    return (
+        watcher.url,
+        watcher.expected_status,
+        watcher.expected_body,
+        watcher.every_value,
+        watcher.every_unit,
+        watcher.cold_connection,
+    )
+
+
 async def update_watcher(watcher: ServiceWatcher, data, role: Role, session):
-    """Update watcher fields and enqueue a fresh check."""
+    """Update watcher fields and move its next check to now."""
     if role not in (Role.owner, Role.admin):
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     payload = data.model_dump(exclude_unset=True)
@@ -126,16 +228,22 @@ async def update_watcher(watcher: ServiceWatcher, data, role: Role, session):
     session.add(watcher)
     await session.commit()
     await session.refresh(watcher)
-    queue.enqueue("healther.workers.run_check", watcher.id)
+    if _central_schedule():
+        check_scheduler.reschedule(watcher.id)
+    invalidate_snapshot(watcher.workspace_id)
     return watcher
 
 
-async def delete_watcher(watcher: ServiceWatcher, role: Role, session):
-    """Delete a watcher and its health events."""
+async def delete_watcher(watcher: ServiceWatcher, role: Role, session) -> dict:
+    """Hide and unschedule a watcher now; its history is purged by a background job."""
     if role not in (Role.owner, Role.admin):
         raise HTTPException(status_code=403, detail="Insufficient permissions")
-    events = await session.exec(select(HealthEvent).where(HealthEvent.watcher_id == watcher.id))
-    for event in events.all():
-        await session.delete(event)
-    await session.delete(watcher)
-    await session.commit()
+    if watcher.deleted_at is None:
+        watcher.deleted_at = dt.datetime.now(dt.timezone.utc)
+        session.add(watcher)
+        await session.commit()
+    if _central_schedule():
+        check_scheduler.cancel(watcher.id)
+    alert_pipeline.forget(watcher.id)
+    invalidate_snapshot(watcher.workspace_id)
+    return purge.enqueue_purge(watcher)
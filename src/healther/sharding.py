@@ -0,0 +1,79 @@
+"""Consistent-hash ownership of watchers across check engine shards.
+
+Every shard heartbeats into one Redis sorted set (member = shard id, score = last beat)
+and builds the same ring from the live members, so all shards agree on who owns which
+watcher without talking to each other. Each shard sits at ``SHARD_VNODES`` points on the
+ring; when one joins or leaves, only the watchers next to its points change hands,
+about 1/N of the total.
+"""
+
+import bisect
+import hashlib
+import os
+import socket
+import time
+from collections.abc import Iterable
+
+from redis import Redis
+
+from .config import settings
+
+
+def _point(value: str) -> int:
+    # stable across processes and machines, unlike hash()
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    def __init__(self, members: Iterable[str], vnodes: int | None = None) -> None:
+        self.members = sorted(set(members))
+        vnodes = vnodes or settings.shard_vnodes
+        ring = sorted(
+            (_point(f"{member}#{index}"), member)
+            for member in self.members
+            for index in range(vnodes)
+        )
+        self._points = [point for point, _ in ring]
+        self._owners = [member for _, member in ring]
+
+    def owner(self, key) -> str | None:
+        """The member owning ``key`` (any value with a stable ``str``), ``None`` if empty."""
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, _point(str(key))) % len(self._points)
+        return self._owners[index]
+
+
+def default_shard_id() -> str:
+    return settings.shard_id or f"{socket.gethostname()}:{os.getpid()}"
+
+
+class ShardMembership:
+    """Live shards as heartbeats in a sorted set; a shard that stops beating drops out."""
+
+    def __init__(
+        self,
+        conn: Redis,
+        shard_id: str | None = None,
+        *,
+        key: str = "healther:shards",
+        ttl_seconds: float | None = None,
+    ) -> None:
+        self.conn = conn
+        self.shard_id = shard_id or default_shard_id()
+        self.key = key
+        self.ttl_seconds = ttl_seconds or settings.shard_ttl_seconds
+
+    def heartbeat(self, *, now: float | None = None) -> list[str]:
+        """Beat, expire silent shards and return the live ones, in one round trip."""
+        now = now if now is not None else time.time()
+        pipe = self.conn.pipeline()
+        pipe.zadd(self.key, {self.shard_id: now})
+        pipe.zremrangebyscore(self.key, "-inf", now - self.ttl_seconds)
+        pipe.zrange(self.key, 0, -1)
+        members = pipe.execute()[-1]
+        return sorted(member.decode() for member in members)
+
+    def leave(self) -> None:
+        """Drop out at once on shutdown instead of waiting for the TTL."""
+        self.conn.zrem(self.key, self.shard_id)
@@ -0,0 +1,85 @@
+"""Mergeable latency quantile sketch with a bounded relative error.
+
+Values are counted in logarithmic bins: bin ``i`` holds values in ``(gamma**(i-1), gamma**i]``
+with ``gamma = (1 + a) / (1 - a)``, so any quantile read back is within ``a`` (1%) of a
+value that was really observed. Two sketches merge by adding their bin counts, which is
+what lets hourly and daily rollups be combined into any longer window.
+"""
+
+import json
+import math
+
+RELATIVE_ACCURACY = 0.01
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+# latencies at or below this are counted as zero
+_MIN_VALUE = 1e-3
+
+
+class LatencySketch:
+    def __init__(self) -> None:
+        self.bins: dict[int, int] = {}
+        self.zeros = 0
+        self.count = 0
+        self.min: float | None = None
+        self.max: float | None = None
+
+    def add(self, value: float, count: int = 1) -> None:
+        if value <= _MIN_VALUE:
+            self.zeros += count
+        else:
+            index = math.ceil(math.log(value) / _LOG_GAMMA)
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.count += count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: "LatencySketch") -> "LatencySketch":
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def quantile(self, q: float) -> float | None:
+        """Value at quantile ``q`` (0..1), or ``None`` for an empty sketch."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if rank < seen:
+                # the bin's midpoint in relative terms, clamped to what was observed
+                value = 2 * _GAMMA**index / (_GAMMA + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "b": {str(index): count for index, count in self.bins.items()},
+                "z": self.zeros,
+                "n": self.count,
+                "min": self.min,
+                "max": self.max,
+            },
+            separators=(",", ":"),
+        )
+
+    @classmethod
+    def from_json(cls, raw: str | None) -> "LatencySketch":
+        sketch = cls()
+        if raw:
+            data = json.loads(raw)
+            sketch.bins = {int(index): count for index, count in data["b"].items()}
+            sketch.zeros = data["z"]
+            sketch.count = data["n"]
+            sketch.min = data["min"]
+            sketch.max = data["max"]
+        return sketch
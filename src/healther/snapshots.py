@@ -0,0 +1,255 @@
+"""Precomputed public status page snapshots.
+
+Workers rebuild a workspace's snapshot when new events arrive for it; the public API
+serves the stored JSON without querying the database.
+"""
+
+import asyncio
+import datetime as dt
+import logging
+import os
+import time
+import uuid
+from pathlib import Path
+
+from redis import Redis
+from sqlalchemy import and_, func, or_
+from sqlalchemy import select as select_columns
+from sqlmodel import select
+
+from .cache import TTLCache
+from .config import settings
+from .models import HealthEvent, HealthStatus, ServiceWatcher, Workspace
+from .schemas import HealthEventOut, PublicStatusOut, PublicWatcherStatus, WatcherOut
+from .services.events import events_query
+from .services.rollups import workspace_uptime
+
+logger = logging.getLogger(__name__)
+
+# workspaces found private or missing, so neither public reads nor check refreshes keep
+# reaching the database for them
+not_public_cache = TTLCache(
+    settings.snapshot_not_public_cache_size, settings.snapshot_not_public_ttl_seconds
+)
+
+
+class RedisSnapshotStore:
+    def __init__(self, conn: Redis, prefix: str = "healther:public:") -> None:
+        self.conn = conn
+        self.prefix = prefix
+
+    def save(self, workspace_id: uuid.UUID, payload: str) -> None:
+        self.conn.set(f"{self.prefix}{workspace_id}", payload)
+
+    def load(self, workspace_id: uuid.UUID) -> str | None:
+        payload = self.conn.get(f"{self.prefix}{workspace_id}")
+        return payload.decode() if payload is not None else None
+
+    def delete(self, workspace_id: uuid.UUID) -> None:
+        self.conn.delete(f"{self.prefix}{workspace_id}")
+
+
+class DiskSnapshotStore:
+    def __init__(self, directory: str | Path) -> None:
+        self.directory = Path(directory)
+
+    def _path(self, workspace_id: uuid.UUID) -> Path:
+        return self.directory / f"{workspace_id}.json"
+
+    def save(self, workspace_id: uuid.UUID, payload: str) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(workspace_id)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(payload)
+        # readers never see a half-written file
+        os.replace(tmp, path)
+
+    def load(self, workspace_id: uuid.UUID) -> str | None:
+        try:
+            return self._path(workspace_id).read_text()
+        except FileNotFoundError:
+            return None
+
+    def delete(self, workspace_id: uuid.UUID) -> None:
+        self._path(workspace_id).unlink(missing_ok=True)
+
+
+def _store_from_settings():
+    if settings.snapshot_backend == "disk":
+        return DiskSnapshotStore(settings.snapshot_dir)
+    return RedisSnapshotStore(Redis.from_url(settings.redis_url))
+
+
+snapshot_store = _store_from_settings()
+
+
+async def _recent_latencies(watchers: list[ServiceWatcher], session) -> dict[uuid.UUID, list]:
+    """The latest ``SNAPSHOT_RECENT_LATENCIES`` latencies per watcher, oldest first, in one query.
+
+    Each watcher only looks back twice that many of its intervals, so the index range read
+    stays proportional to what is kept rather than to the watcher's whole history.
+    """
+    from .services.watchers import _interval_as_timedelta  # that module imports this one
+
+    if not watchers:
+        return {}
+    count = settings.snapshot_recent_latencies
+    now = dt.datetime.now(dt.timezone.utc)
+    by_interval: dict[dt.timedelta, list[uuid.UUID]] = {}
+    for watcher in watchers:
+        by_interval.setdefault(_interval_as_timedelta(watcher), []).append(watcher.id)
+    ranked = (
+        select_columns(
+            HealthEvent.watcher_id,
+            HealthEvent.response_time_ms,
+            func.row_number()
+            .over(
+                partition_by=HealthEvent.watcher_id,
+                order_by=(HealthEvent.created_at.desc(), HealthEvent.id.desc()),
+            )
+            .label("rank"),
+        )
+        .where(
+            HealthEvent.region.is_(None),
+            or_(
+                *(
+                    and_(
+                        HealthEvent.watcher_id.in_(ids),
+                        HealthEvent.created_at >= now - interval * count * 2,
+                    )
+                    for interval, ids in by_interval.items()
+                )
+            ),
+        )
+        .subquery()
+    )
+    rows = await session.exec(
+        select_columns(ranked.c.watcher_id, ranked.c.response_time_ms)
+        .where(ranked.c.rank <= count)
+        .order_by(ranked.c.watcher_id, ranked.c.rank.desc())
+    )
+    latencies: dict[uuid.UUID, list] = {}
+    for watcher_id, latency in rows.all():
+        if latency is not None:
+            latencies.setdefault(watcher_id, []).append(latency)
+    return latencies
+
+
+async def build_snapshot(workspace_id: uuid.UUID, session) -> PublicStatusOut | None:
+    """Assemble the public page for a workspace, or ``None`` if it is not public.
+
+    Current status comes from the watcher rows, so the query count does not grow with
+    the number of watchers.
+    """
+    workspace = await session.get(Workspace, workspace_id)
+    if not workspace or not workspace.is_public:
+        return None
+    result = await session.exec(
+        select(ServiceWatcher).where(
+            ServiceWatcher.workspace_id == workspace_id, ServiceWatcher.deleted_at.is_(None)
+        )
+    )
+    rows = result.all()
+    latencies = await _recent_latencies(rows, session)
+    watchers = [
+        PublicWatcherStatus(
+            **{
+                **WatcherOut.model_validate(watcher).model_dump(),
+                "status": watcher.last_status,
+                "last_checked_at": watcher.last_checked_at,
+            },
+            recent_latency_ms=latencies.get(watcher.id, []),
+        )
+        for watcher in rows
+    ]
+    incidents = await session.exec(
+        events_query(workspace_id=workspace_id, limit=settings.snapshot_incidents).where(
+            HealthEvent.status != HealthStatus.healthy, HealthEvent.region.is_(None)
+        )
+    )
+    return PublicStatusOut(
+        workspace_id=workspace_id,
+        name=workspace.name,
+        generated_at=dt.datetime.now(dt.timezone.utc),
+        watchers=watchers,
+        uptime=await workspace_uptime(workspace_id, session),
+        incidents=[HealthEventOut.model_validate(event) for event in incidents.all()],
+    )
+
+
+async def refresh_snapshot(workspace_id: uuid.UUID, session, store=None) -> PublicStatusOut | None:
+    """Rebuild and store a snapshot; private or missing workspaces have theirs removed.
+
+    A workspace found private is then skipped for ``SNAPSHOT_NOT_PUBLIC_TTL_SECONDS``.
+    """
+    store = store or snapshot_store
+    if not_public_cache.get(workspace_id) is True:
+        return None
+    snapshot = await build_snapshot(workspace_id, session)
+    if snapshot is None:
+        not_public_cache.set(workspace_id, True)
+        store.delete(workspace_id)
+    else:
+        save_snapshot(workspace_id, snapshot, store)
+    return snapshot
+
+
+def save_snapshot(workspace_id: uuid.UUID, snapshot: PublicStatusOut, store=None) -> None:
+    (store or snapshot_store).save(workspace_id, snapshot.model_dump_json())
+
+
+def load_snapshot(workspace_id: uuid.UUID, store=None) -> PublicStatusOut | None:
+    payload = (store or snapshot_store).load(workspace_id)
+    if payload is None:
+        return None
+    return PublicStatusOut.model_validate_json(payload)
+
+
+def invalidate_snapshot(workspace_id: uuid.UUID, store=None) -> None:
+    """Drop a snapshot after a config change; the next public read rebuilds it."""
+    (store or snapshot_store).delete(workspace_id)
+
+
+async def refresh_if_stale(workspace_id: uuid.UUID, session, store=None) -> None:
+    """Per-check refresh for one-shot RQ jobs, skipped while the snapshot is fresh."""
+    snapshot = load_snapshot(workspace_id, store)
+    if snapshot is not None:
+        age = dt.datetime.now(dt.timezone.utc) - snapshot.generated_at
+        if age.total_seconds() < settings.snapshot_min_interval_seconds:
+            return
+    await refresh_snapshot(workspace_id, session, store)
+
+
+class SnapshotRefresher:
+    """Coalesces "new events for workspace X" notifications into periodic refreshes."""
+
+    def __init__(self, session_factory, store=None, interval: float | None = None) -> None:
+        self.session_factory = session_factory
+        self.store = store
+        self.interval = interval if interval is not None else settings.snapshot_min_interval_seconds
+        self._dirty: set[uuid.UUID] = set()
+
+    def mark_dirty(self, workspace_ids) -> None:
+        self._dirty.update(workspace_ids)
+
+    async def refresh_dirty(self) -> int:
+        dirty, self._dirty = self._dirty, set()
+        for workspace_id in dirty:
+            try:
+                async with self.session_factory() as session:
+                    await refresh_snapshot(workspace_id, session, self.store)
+            except Exception:
+                logger.exception("Failed to refresh public snapshot for %s", workspace_id)
+                self._dirty.add(workspace_id)
+        return len(dirty)
+
+    async def run(self, stopping: asyncio.Event) -> None:
+        while not stopping.is_set():
+            started = time.monotonic()
+            await self.refresh_dirty()
+            remaining = max(self.interval - (time.monotonic() - started), 0.05)
+            try:
+                await asyncio.wait_for(stopping.wait(), timeout=remaining)
+            except TimeoutError:
+                pass
+        await self.refresh_dirty()
@@ -0,0 +1,10 @@
+"""Small helpers shared across layers."""
+
+import datetime as dt
+
+
+def as_utc(value: dt.datetime) -> dt.datetime:
+    """``value`` in UTC; naive datetimes, as SQLite returns them, are taken to be UTC."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=dt.timezone.utc)
+    return value.astimezone(dt.timezone.utc)
@@ -1,18 +1,29 @@
 """Background job worker functions."""
 
 import asyncio
+import datetime as dt
 import logging
 import os
+import tempfile
+import time
 import uuid
 
 from redis import Redis
-from rq import Worker
+from rq import Queue, Worker, get_current_job
 from rq.connections import Connection
 from sqlmodel import select
 
+from . import metrics
+from .alerts import alert_pipeline
+from .config import settings
 from .db import SessionLocal
-from .models import ServiceWatcher
-from .services.watchers import perform_check
+from .live import live_publisher
+from .models import ServiceWatcher, Workspace
+from .scheduler import check_scheduler
+from .services import purge as purge_service
+from .services.retention import apply_retention
+from .services.watchers import _interval_as_timedelta, perform_check
+from .snapshots import refresh_if_stale
 
 logger = logging.getLogger(__name__)
 
@@ -24,17 +35,123 @@ def run_check(watcher_id: uuid.UUID):
 
 async def _run_check_async(watcher_id: uuid.UUID):
     async with SessionLocal() as session:
-        result = await session.exec(select(ServiceWatcher).where(ServiceWatcher.id == watcher_id))
-        watcher = result.first()
-        if watcher:
-            await perform_check(watcher, session)
+        # the workspace flag rides along so private workspaces skip the snapshot refresh
+        result = await session.exec(
+            select(ServiceWatcher, Workspace.is_public)
+            .join(Workspace, Workspace.id == ServiceWatcher.workspace_id)
+            .where(ServiceWatcher.id == watcher_id)
+        )
+        watcher, is_public = result.first() or (None, False)
+        if watcher is None or watcher.deleted_at is not None:
+            # deleted after the dispatcher claimed it
+            check_scheduler.cancel(watcher_id)
+            return
+        # the status before this check, so the live feed can tell a change
+        previous_status = watcher.last_status
+        event = await perform_check(watcher, session)
+        check_scheduler.complete(watcher.id, _interval_as_timedelta(watcher).total_seconds())
+        if event is not None:
+            try:
+                alert_pipeline.observe([event], {watcher.id: watcher.workspace_id})
+            except Exception:
+                logger.exception("Failed to update alert state for %s", watcher.id)
+        try:
+            if previous_status is not None:
+                live_publisher.remember(watcher.id, previous_status)
+            if event is not None:
+                live_publisher.publish([event], {watcher.id: watcher.workspace_id})
+        except Exception:
+            logger.exception("Failed to publish live event for %s", watcher.id)
+        if not is_public:
+            return
+        try:
+            await refresh_if_stale(watcher.workspace_id, session)
+        except Exception:
+            logger.exception("Failed to refresh public snapshot for %s", watcher.workspace_id)
+
+
+def schedule_retention(queue: Queue, delay: float = 0.0) -> None:
+    """Schedule the retention job once per interval slot, however many workers ask."""
+    interval = settings.retention_interval_seconds
+    job_id = f"healther-retention-{int((time.time() + delay) // interval)}"
+    if queue.fetch_job(job_id) is None:
+        queue.enqueue_in(
+            dt.timedelta(seconds=delay), "healther.workers.run_retention", job_id=job_id
+        )
+
+
+def run_retention():
+    """RQ entrypoint: archive expired events, then schedule the next run even if this one failed."""
+    try:
+        asyncio.run(_run_retention_async())
+    finally:
+        queue = Queue("health-checks", connection=Redis.from_url(settings.redis_url))
+        schedule_retention(queue, delay=settings.retention_interval_seconds)
+
+
+async def _run_retention_async():
+    async with SessionLocal() as session:
+        await apply_retention(session)
+        await purge_service.purge_deleted(session)
+
+
+def purge_watcher(watcher_id: uuid.UUID):
+    """RQ entrypoint: purge a deleted watcher, reporting progress in the job's meta."""
+    asyncio.run(_purge_watcher_async(watcher_id, get_current_job()))
+
+
+async def _purge_watcher_async(watcher_id: uuid.UUID, job=None):
+    def report(progress: dict) -> None:
+        if job is not None:
+            job.meta.update(progress)
+            job.save_meta()
+
+    async with SessionLocal() as session:
+        return await purge_service.purge_watcher(watcher_id, session, progress=report)
+
+
+class MetricsWorker(Worker):
+    """An RQ worker whose forked work horses hand what they measured back to it."""
+
+    def perform_job(self, job, queue):
+        if not self._is_horse:
+            return super().perform_job(job, queue)
+        # the horse starts with a copy of the worker's numbers; count only its own
+        metrics.registry.reset()
+        try:
+            return super().perform_job(job, queue)
+        finally:
+            metrics.registry.spool()
+
+    def execute_job(self, job, queue):
+        # runs in the worker once the horse has exited: fold its spool file in right away,
+        # so files do not pile up between scrapes (or when nothing scrapes at all)
+        try:
+            return super().execute_job(job, queue)
+        finally:
+            metrics.registry.absorb_spool()
 
 
 def main():
     redis_url = os.getenv("REDIS_URL", "redis://redis:6379/0")
     redis_conn = Redis.from_url(redis_url)
     with Connection(redis_conn):
-        worker = Worker(["health-checks", "email-alerts"])
+        queues = ["email-alerts", "maintenance"]
+        if settings.check_backend == "rq":
+            # with the check engine running, RQ only has to deliver alerts and purges
+            queues.insert(0, "health-checks")
+            schedule_retention(Queue("health-checks"))
+        if settings.metrics_enabled:
+            metrics.registry.spool_dir = tempfile.mkdtemp(prefix="healther-metrics-")
+            metrics.registry.add_collector(
+                metrics.queue_collector(
+                    redis_conn,
+                    ["health-checks", *queues[-2:]],
+                    schedule_key=check_scheduler.key if settings.check_backend == "rq" else None,
+                )
+            )
+            metrics.serve_metrics(settings.metrics_port)
+        worker = MetricsWorker(queues)
         worker.work(with_scheduler=True)
 
 
@@ -1,8 +1,369 @@
 import pathlib
 import sys
+import time
+import uuid
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import event
+from sqlmodel import Session, SQLModel, create_engine
 
 # Ensure src/ is on path for tests
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 SRC = ROOT / "src"
 if str(SRC) not in sys.path:
     sys.path.insert(0, str(SRC))
+
+from healther import alerts, snapshots, workers  # noqa: E402
+from healther.api import deps  # noqa: E402
+from healther.app import create_app  # noqa: E402
+from healther.db import get_session as app_get_session  # noqa: E402
+from healther.services import purge as purge_service  # noqa: E402
+from healther.services import watchers as watcher_service  # noqa: E402
+
+
+class MemoryScheduler:
+    """In-process stand-in for CheckScheduler: same calls, no jitter, no Redis."""
+
+    def __init__(self, lease_seconds: float = 300.0):
+        self.lease_seconds = lease_seconds
+        self.jitter_ratio = 0.0
+        self.scores: dict[uuid.UUID, float] = {}
+
+    def add(self, watcher_id, interval, *, now=None):
+        self.add_many({watcher_id: interval}, now=now)
+
+    def add_many(self, intervals, *, now=None, spread=None):
+        for watcher_id in intervals:
+            self.scores.setdefault(watcher_id, now if now is not None else time.time())
+
+    def reschedule(self, watcher_id, at=None):
+        self.scores[watcher_id] = at if at is not None else time.time()
+
+    def cancel(self, watcher_id):
+        self.scores.pop(watcher_id, None)
+
+    def claim_due(self, *, now=None, limit=1000):
+        now = now if now is not None else time.time()
+        due = sorted(
+            (score, str(watcher_id)) for watcher_id, score in self.scores.items() if score <= now
+        )[: max(limit, 0)]
+        claimed = [uuid.UUID(watcher_id) for _, watcher_id in due]
+        for watcher_id in claimed:
+            self.scores[watcher_id] = now + self.lease_seconds
+        return claimed
+
+    def complete(self, watcher_id, interval, *, now=None):
+        self.complete_many({watcher_id: interval}, now=now)
+
+    def complete_many(self, intervals, *, now=None):
+        now = now if now is not None else time.time()
+        for watcher_id, interval in intervals.items():
+            if watcher_id in self.scores:
+                self.scores[watcher_id] = now + interval
+
+    def next_due(self):
+        return min(self.scores.values(), default=None)
+
+
+class MemoryRedis:
+    """The hash, list, sorted set and publish commands used outside the schedule, plus
+    pipelines."""
+
+    def __init__(self):
+        self.hashes: dict[str, dict] = {}
+        self.lists: dict[str, list] = {}
+        self.zsets: dict[str, dict] = {}
+        self.strings: dict[str, tuple] = {}
+        self.published: list[tuple] = []
+
+    def hmget(self, key, fields):
+        return [self.hashes.get(key, {}).get(field) for field in fields]
+
+    def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update(mapping)
+        return len(mapping)
+
+    def hdel(self, key, *fields):
+        return sum(self.hashes.get(key, {}).pop(field, None) is not None for field in fields)
+
+    def rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(values)
+        return len(self.lists[key])
+
+    def lrange(self, key, start, end):
+        items = self.lists.get(key, [])
+        return items[start : None if end == -1 else end + 1]
+
+    def set(self, key, value, nx=False, ex=None):
+        current = self.strings.get(key)
+        if nx and current is not None and (current[1] is None or current[1] > time.time()):
+            return None
+        self.strings[key] = (value, time.time() + ex if ex is not None else None)
+        return True
+
+    def delete(self, *keys):
+        return sum(
+            (self.lists.pop(key, None), self.strings.pop(key, None)) != (None, None) for key in keys
+        )
+
+    def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+        return len(mapping)
+
+    def zremrangebyscore(self, key, low, high):
+        low = float(low)
+        zset = self.zsets.get(key, {})
+        gone = [member for member, score in zset.items() if low <= score <= high]
+        for member in gone:
+            del zset[member]
+        return len(gone)
+
+    def zrange(self, key, start, end):
+        members = sorted(self.zsets.get(key, {}).items(), key=lambda item: (item[1], item[0]))
+        return [member.encode() for member, _ in members[start : None if end == -1 else end + 1]]
+
+    def zrem(self, key, *members):
+        return sum(self.zsets.get(key, {}).pop(member, None) is not None for member in members)
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+        return 0
+
+    def pipeline(self, transaction=True):
+        return _MemoryPipeline(self)
+
+
+class _MemoryPipeline:
+    def __init__(self, conn):
+        self._conn = conn
+        self._calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self._calls.append((name, args, kwargs))
+
+    def execute(self):
+        calls, self._calls = self._calls, []
+        return [getattr(self._conn, name)(*args, **kwargs) for name, args, kwargs in calls]
+
+
+class RecordedJob:
+    def __init__(self, job_id, func, args, meta):
+        self.id = job_id
+        self.func = func
+        self.args = args
+        self.meta = dict(meta)
+        self.status = "queued"
+
+    def get_status(self):
+        return self.status
+
+    def save_meta(self):
+        pass
+
+
+class RecordingQueue:
+    def __init__(self):
+        self.scheduled = []
+        self.jobs: dict[str, RecordedJob] = {}
+
+    def enqueue(self, func, *args, job_id=None, meta=None, **options):
+        job = RecordedJob(job_id or str(uuid.uuid4()), func, args, meta or {})
+        self.jobs[job.id] = job
+        return job
+
+    def enqueue_in(self, delay, func, *args, job_id=None, meta=None, **options):
+        self.scheduled.append((delay, func, *args))
+        job = RecordedJob(job_id or str(uuid.uuid4()), func, args, meta or {})
+        job.status = "scheduled"
+        self.jobs[job.id] = job
+        return job
+
+    def fetch_job(self, job_id):
+        return self.jobs.get(job_id)
+
+
+class _AsyncResultProxy:
+    """Async iteration over a sync result, like the AsyncResult from AsyncSession.stream."""
+
+    def __init__(self, result):
+        self._rows = iter(result)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._rows)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class AsyncSessionProxy:
+    """Async-ish proxy that mimics AsyncSession using a sync Session underneath."""
+
+    def __init__(self, sync_session: Session):
+        self._sync = sync_session
+
+    @property
+    def bind(self):
+        return self._sync.bind
+
+    # matches AsyncSession exec signature (awaitable)
+    async def exec(self, stmt, **kwargs):
+        return self._sync.exec(stmt, **kwargs)
+
+    async def stream(self, stmt, **kwargs):
+        return _AsyncResultProxy(self._sync.execute(stmt, **kwargs))
+
+    # AsyncSession.add is synchronous, so mirror that
+    def add(self, obj):
+        self._sync.add(obj)
+
+    def add_all(self, objs):
+        self._sync.add_all(objs)
+
+    async def delete(self, obj):
+        self._sync.delete(obj)
+
+    async def commit(self):
+        self._sync.commit()
+
+    async def refresh(self, obj):
+        self._sync.refresh(obj)
+
+    async def get(self, *args, **kwargs):
+        return self._sync.get(*args, **kwargs)
+
+    async def close(self):
+        self._sync.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+class QueryCounter:
+    """Records every statement the engine runs until closed; also a context manager."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements: list[tuple[str, object]] = []
+        event.listen(self.engine, "before_cursor_execute", self._record)
+
+    def close(self):
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((statement, parameters))
+
+
+@pytest.fixture
+def sync_engine(tmp_path):
+    db_path = tmp_path / "test.db"
+    engine = create_engine(f"sqlite:///{db_path}")
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+@pytest.fixture
+def session_factory(sync_engine):
+    """Callable returning proxied sessions, usable wherever `SessionLocal` is expected."""
+
+    def factory():
+        # same as SessionLocal, so tests see the queries production runs
+        return AsyncSessionProxy(Session(sync_engine, expire_on_commit=False))
+
+    return factory
+
+
+@pytest.fixture
+def count_queries(sync_engine):
+    """``with count_queries() as queries:`` collects the SQL run inside the block."""
+    return lambda: QueryCounter(sync_engine)
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    """Replace the Redis check schedule everywhere it is used."""
+    memory = MemoryScheduler()
+    monkeypatch.setattr(watcher_service, "check_scheduler", memory)
+    monkeypatch.setattr(workers, "check_scheduler", memory)
+    return memory
+
+
+@pytest.fixture
+def memory_redis():
+    return MemoryRedis()
+
+
+@pytest.fixture
+def alert_pipeline(monkeypatch):
+    """Alert state and digests in memory; scheduled digest jobs land in ``.queue``."""
+    pipeline = alerts.AlertPipeline(
+        MemoryRedis(),
+        RecordingQueue(),
+        confirm_checks=2,
+        flap_window_seconds=3600,
+        flap_threshold=4,
+        digest_seconds=60,
+        digest_lost_seconds=300,
+    )
+    monkeypatch.setattr(watcher_service, "alert_pipeline", pipeline)
+    monkeypatch.setattr(workers, "alert_pipeline", pipeline)
+    return pipeline
+
+
+@pytest.fixture
+def purge_queue(monkeypatch):
+    """Purge jobs are recorded instead of going to the maintenance queue."""
+    queue = RecordingQueue()
+    monkeypatch.setattr(purge_service, "purge_queue", queue)
+    return queue
+
+
+@pytest_asyncio.fixture
+async def app(monkeypatch, session_factory, scheduler, alert_pipeline, purge_queue, tmp_path):
+    async def override_get_session():
+        proxy = session_factory()
+        try:
+            yield proxy
+        finally:
+            await proxy.close()
+
+    # auth caches are per process; start every test cold
+    deps.user_cache.clear()
+    deps.role_cache.clear()
+    snapshots.not_public_cache.clear()
+    # public status snapshots go to disk instead of Redis
+    monkeypatch.setattr(
+        snapshots, "snapshot_store", snapshots.DiskSnapshotStore(tmp_path / "snapshots")
+    )
+
+    # disable default lifespan create_all
+    from contextlib import asynccontextmanager
+
+    import healther.app as app_module
+    import healther.db as db_module
+
+    @asynccontextmanager
+    async def noop_lifespan(app):
+        yield
+
+    monkeypatch.setattr(db_module, "lifespan", noop_lifespan)
+    monkeypatch.setattr(app_module, "lifespan", noop_lifespan)
+
+    application = create_app()
+    application.dependency_overrides[app_get_session] = override_get_session
+    return application
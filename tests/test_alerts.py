@@ -0,0 +1,188 @@
+import datetime as dt
+import uuid
+
+import pytest
+from sqlmodel import Session
+
+from healther import alerts, notifications
+from healther.models import (
+    HealthEvent,
+    HealthStatus,
+    NotificationRecipient,
+    ServiceWatcher,
+    Workspace,
+)
+
+START = dt.datetime(2026, 3, 1, tzinfo=dt.timezone.utc)
+
+
+def _events(watcher_id, statuses, *, every=dt.timedelta(minutes=1), start=START):
+    return [
+        HealthEvent(watcher_id=watcher_id, status=status, created_at=start + every * index)
+        for index, status in enumerate(statuses)
+    ]
+
+
+def _notices(events, **options):
+    options = {"confirm_checks": 2, "flap_window": 3600, "flap_threshold": 4, **options}
+    state, notices = None, []
+    for event in events:
+        state, notice = alerts.advance(state, event, **options)
+        if notice is not None:
+            notices.append((notice["kind"], notice["previous"], notice["status"]))
+    return state, notices
+
+
+def test_alerts_fire_on_confirmed_transitions_only():
+    watcher_id = uuid.uuid4()
+    healthy, down = HealthStatus.healthy, HealthStatus.down
+    # a single failed check is a blip; a day of downtime is one alert and one recovery
+    statuses = [healthy, down, healthy] + [down] * 1440 + [healthy, healthy]
+    _, notices = _notices(_events(watcher_id, statuses))
+    assert notices == [("transition", "healthy", "down"), ("transition", "down", "healthy")]
+
+    # a watcher that is broken from its first check alerts too
+    _, notices = _notices(_events(watcher_id, [down, down]), confirm_checks=2)
+    assert notices == [("transition", "healthy", "down")]
+
+
+def test_flapping_watchers_are_reported_once_then_muted_until_they_settle():
+    watcher_id = uuid.uuid4()
+    flaps = [HealthStatus.down, HealthStatus.healthy] * 10
+    events = _events(watcher_id, flaps, every=dt.timedelta(minutes=5))
+    state, notices = _notices(events, confirm_checks=1)
+    assert notices == [
+        ("transition", "healthy", "down"),
+        ("transition", "down", "healthy"),
+        ("transition", "healthy", "down"),
+        ("flapping", "down", "healthy"),
+    ]
+    assert state["flapping"]
+
+    # an hour without a change ends the flapping state with a single notice
+    quiet = _events(
+        watcher_id, [HealthStatus.healthy], start=events[-1].created_at + dt.timedelta(hours=1)
+    )
+    options = {"confirm_checks": 1, "flap_window": 3600, "flap_threshold": 4}
+    state, notice = alerts.advance(state, quiet[0], **options)
+    assert (notice["kind"], notice["status"]) == ("settled", "healthy")
+    assert not state["flapping"]
+
+
+@pytest.mark.anyio
+async def test_simultaneous_failures_are_mailed_as_one_digest_per_workspace(
+    monkeypatch, sync_engine, session_factory, alert_pipeline
+):
+    with Session(sync_engine) as session:
+        workspaces = [Workspace(name="Prod"), Workspace(name="Staging")]
+        session.add_all(workspaces)
+        session.flush()
+        watchers = [
+            ServiceWatcher(workspace_id=workspace.id, name=f"svc-{index}", url=f"http://{index}")
+            for workspace in workspaces
+            for index in range(5)
+        ]
+        session.add_all(watchers)
+        session.add(NotificationRecipient(workspace_id=workspaces[0].id, email="ops@example.com"))
+        session.commit()
+        workspace_ids = {watcher.id: watcher.workspace_id for watcher in watchers}
+        prod, staging = workspaces[0].id, workspaces[1].id
+        first_watcher = watchers[0].id
+
+    # three rounds of checks with every watcher down: one notice each, once confirmed
+    for round_ in range(3):
+        batch = [
+            HealthEvent(
+                watcher_id=watcher_id,
+                status=HealthStatus.down,
+                response_status=503,
+                created_at=START + dt.timedelta(minutes=round_),
+            )
+            for watcher_id in workspace_ids
+        ]
+        alert_pipeline.observe(batch, workspace_ids)
+    assert [args for _, _, *args in alert_pipeline.queue.scheduled] == [
+        [prod],
+        [staging],
+    ]
+    assert all(
+        func == "healther.notifications.send_digest" for _, func, _ in alert_pipeline.queue.scheduled
+    )
+
+    sent = []
+    monkeypatch.setattr(notifications, "SessionLocal", session_factory)
+    monkeypatch.setattr(notifications, "_send_email", lambda *args: sent.append(args))
+    await notifications._send_digest_async(prod, alert_pipeline)
+    # the window is drained, so a second run has nothing to send
+    await notifications._send_digest_async(prod, alert_pipeline)
+
+    assert len(sent) == 1
+    recipients, subject, body = sent[0]
+    assert recipients == ["ops@example.com"]
+    assert subject == "[Healther] Prod: 5 down"
+    assert body.count("is DOWN (was healthy)") == 5
+    assert "observed: 503" in body
+
+    # recovery opens a new window for the workspace
+    recovered = [HealthEvent(watcher_id=first_watcher, status=HealthStatus.healthy)]
+    for _ in range(2):
+        alert_pipeline.observe(recovered, workspace_ids)
+    assert len(alert_pipeline.queue.scheduled) == 3
+    assert alert_pipeline.drain(prod)[0]["kind"] == "transition"
+
+
+def test_a_lost_digest_job_only_holds_notices_until_its_marker_expires(alert_pipeline):
+    workspace_id, watcher_id = uuid.uuid4(), uuid.uuid4()
+    ids = {watcher_id: workspace_id}
+    flips = _events(watcher_id, [HealthStatus.down] * 2 + [HealthStatus.healthy] * 2)
+    alert_pipeline.observe(flips[:2], ids)
+    assert len(alert_pipeline.queue.scheduled) == 1
+
+    # the job never runs: later notices wait for it while the marker lives...
+    alert_pipeline.observe(flips[2:], ids)
+    assert len(alert_pipeline.queue.scheduled) == 1
+    marker = alert_pipeline.conn.strings[alerts.scheduled_key(workspace_id)]
+    assert marker[1] == pytest.approx(dt.datetime.now().timestamp() + 60 + 300, abs=5)
+
+    # ...and once Redis expires it, the next notice schedules a digest that mails them all
+    del alert_pipeline.conn.strings[alerts.scheduled_key(workspace_id)]
+    later = START + dt.timedelta(hours=1)
+    alert_pipeline.observe(_events(watcher_id, [HealthStatus.down] * 2, start=later), ids)
+    assert len(alert_pipeline.queue.scheduled) == 2
+    assert [notice["status"] for notice in alert_pipeline.drain(workspace_id)] == [
+        "down",
+        "healthy",
+        "down",
+    ]
+    assert alert_pipeline.conn.strings == {}
+
+
+@pytest.mark.anyio
+async def test_legacy_alert_jobs_feed_the_digest_pipeline(
+    monkeypatch, sync_engine, session_factory, alert_pipeline
+):
+    with Session(sync_engine) as session:
+        workspace = Workspace(name="Legacy")
+        session.add(workspace)
+        session.flush()
+        watcher = ServiceWatcher(workspace_id=workspace.id, name="api", url="http://api")
+        session.add(watcher)
+        session.flush()
+        events = _events(watcher.id, [HealthStatus.down] * 2)
+        session.add_all(events)
+        session.commit()
+        workspace_id, event_ids = workspace.id, [event.id for event in events]
+
+    monkeypatch.setattr(notifications, "alert_pipeline", alert_pipeline)
+    with pytest.deprecated_call():
+        notifications.enqueue_alert(event_ids[0])
+    assert [job.func for job in alert_pipeline.queue.jobs.values()] == [
+        "healther.notifications.send_alerts"
+    ]
+
+    # jobs queued before the upgrade count as check results, not as one email each
+    monkeypatch.setattr(notifications, "SessionLocal", session_factory)
+    for event_id in event_ids:
+        await notifications._send_alerts_async(event_id)
+    assert [args for _, _, *args in alert_pipeline.queue.scheduled] == [[workspace_id]]
+    assert [notice["status"] for notice in alert_pipeline.drain(workspace_id)] == ["down"]
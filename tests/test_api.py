@@ -1,93 +1,22 @@
+import asyncio
+import csv
+import datetime as dt
+import io
+import json
+import re
+import uuid
+
 import httpx
 import pytest
-import pytest_asyncio
-from sqlmodel import Session, SQLModel, create_engine
+import sqlalchemy
 
-from healther.app import create_app
-from healther.db import get_session as app_get_session
+from healther import snapshots, workers
+from healther.config import settings
+from healther.models import HealthEvent, HealthStatus, ServiceWatcher
+from healther.services import events as event_service
+from healther.services import overview as overview_service
 from healther.services import watchers as watcher_service
-
-
-class _DummyQueue:
-    def enqueue(self, *_, **__):
-        return None
-
-    def enqueue_in(self, *_, **__):
-        return None
-
-
-class AsyncSessionProxy:
-    """Async-ish proxy that mimics AsyncSession using a sync Session underneath."""
-
-    def __init__(self, sync_session: Session):
-        self._sync = sync_session
-
-    # matches AsyncSession exec signature (awaitable)
-    async def exec(self, stmt):
-        return self._sync.exec(stmt)
-
-    # AsyncSession.add is synchronous, so mirror that
-    def add(self, obj):
-        self._sync.add(obj)
-
-    async def delete(self, obj):
-        self._sync.delete(obj)
-
-    async def commit(self):
-        self._sync.commit()
-
-    async def refresh(self, obj):
-        self._sync.refresh(obj)
-
-    async def get(self, *args, **kwargs):
-        return self._sync.get(*args, **kwargs)
-
-    async def close(self):
-        self._sync.close()
-
-    async def __aenter__(self):
-        return self
-
-    async def __aexit__(self, exc_type, exc, tb):
-        await self.close()
-
-
-@pytest_asyncio.fixture
-async def app(monkeypatch, tmp_path):
-    db_path = tmp_path / "test.db"
-    sync_engine = create_engine(f"sqlite:///{db_path}")
-    SQLModel.metadata.create_all(sync_engine)
-
-    def sync_session():
-        return Session(sync_engine)
-
-    async def override_get_session():
-        sync = sync_session()
-        proxy = AsyncSessionProxy(sync)
-        try:
-            yield proxy
-        finally:
-            await proxy.close()
-
-    # bypass Redis queue
-    monkeypatch.setattr(watcher_service, "queue", _DummyQueue())
-
-    # disable default lifespan create_all
-    from contextlib import asynccontextmanager
-
-    import healther.app as app_module
-    import healther.db as db_module
-
-    @asynccontextmanager
-    async def noop_lifespan(app):
-        yield
-
-    monkeypatch.setattr(db_module, "lifespan", noop_lifespan)
-    monkeypatch.setattr(app_module, "lifespan", noop_lifespan)
-
-    application = create_app()
-    application.dependency_overrides[app_get_session] = override_get_session
-    return application
+from healther.services.events import write_events
 
 
 @pytest.mark.anyio
@@ -128,7 +57,7 @@ async def test_register_login_and_workspace_flow(app):
 
         events_resp = await client.get(f"/api/v1/watchers/{watcher_id}/events", headers=headers)
         assert events_resp.status_code == 200
-        assert events_resp.json() == []
+        assert events_resp.json() == {"items": [], "next_cursor": None}
 
 
 @pytest.mark.anyio
@@ -249,10 +178,604 @@ async def test_member_invite_role_management_and_watcher_update(app):
         assert payload["pronouns"] == "they/them"
 
         delete_watch_resp = await client.delete(f"/api/v1/watchers/{watcher_id}", headers=headers)
-        assert delete_watch_resp.status_code == 204
+        assert delete_watch_resp.status_code == 202
 
         list_watchers_resp = await client.get(
             f"/api/v1/workspaces/{workspace_id}/watchers", headers=headers
         )
         assert list_watchers_resp.status_code == 200
         assert list_watchers_resp.json() == []
+
+
+async def _register_and_login(client, email):
+    resp = await client.post("/api/v1/auth/register", json={"email": email, "password": "secret123"})
+    assert resp.status_code == 201, resp.text
+    token_resp = await client.post(
+        "/api/v1/auth/token", json={"username": email, "password": "secret123"}
+    )
+    return {"Authorization": f"Bearer {token_resp.json()['access_token']}"}
+
+
+@pytest.mark.anyio
+async def test_uptime_endpoints_read_rollups(app, session_factory):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = await _register_and_login(client, "uptime@example.com")
+        ws_resp = await client.post(
+            "/api/v1/workspaces", json={"name": "Status", "is_public": True}, headers=headers
+        )
+        workspace_id = ws_resp.json()["id"]
+        watcher_resp = await client.post(
+            f"/api/v1/workspaces/{workspace_id}/watchers",
+            json={"name": "Site", "url": "https://example.com"},
+            headers=headers,
+        )
+        watcher_id = uuid.UUID(watcher_resp.json()["id"])
+
+        now = dt.datetime.now(dt.timezone.utc)
+        events = [
+            HealthEvent(watcher_id=watcher_id, status=HealthStatus.healthy, response_time_ms=10.0),
+            HealthEvent(watcher_id=watcher_id, status=HealthStatus.healthy, response_time_ms=30.0),
+            HealthEvent(watcher_id=watcher_id, status=HealthStatus.down),
+            HealthEvent(
+                watcher_id=watcher_id,
+                status=HealthStatus.down,
+                created_at=now - dt.timedelta(days=2),
+            ),
+        ]
+        async with session_factory() as session:
+            # two writes hit the same buckets and must be merged, not duplicated
+            await write_events(events[:2], session)
+            await write_events(events[2:], session)
+            await session.commit()
+
+        resp = await client.get(f"/api/v1/workspaces/{workspace_id}/uptime", headers=headers)
+        assert resp.status_code == 200, resp.text
+        body = resp.json()
+        assert body["days"] == 90
+        assert body["uptime_percentage"] == 50.0
+        [watcher] = body["watchers"]
+        assert len(watcher["bars"]) == 90
+        today, two_days_ago = watcher["bars"][-1], watcher["bars"][-3]
+        assert (today["healthy"], today["down"]) == (2, 1)
+        assert today["latency_avg_ms"] == 20.0
+        assert two_days_ago["ratio"] == 0.0
+        assert watcher["bars"][0]["ratio"] is None
+
+        public_resp = await client.get(f"/api/v1/public/workspaces/{workspace_id}/uptime?days=7")
+        assert public_resp.status_code == 200
+        assert len(public_resp.json()["watchers"][0]["bars"]) == 7
+
+
+@pytest.mark.anyio
+async def test_event_listings_are_keyset_paginated(app, session_factory):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = await _register_and_login(client, "pager@example.com")
+        ws_resp = await client.post(
+            "/api/v1/workspaces", json={"name": "Pager", "is_public": True}, headers=headers
+        )
+        workspace_id = ws_resp.json()["id"]
+        watcher_resp = await client.post(
+            f"/api/v1/workspaces/{workspace_id}/watchers",
+            json={"name": "Site", "url": "https://example.com"},
+            headers=headers,
+        )
+        watcher_id = uuid.UUID(watcher_resp.json()["id"])
+
+        start = dt.datetime(2026, 1, 1, tzinfo=dt.timezone.utc)
+        events = [
+            HealthEvent(
+                watcher_id=watcher_id,
+                status=HealthStatus.down if minute % 3 == 0 else HealthStatus.healthy,
+                created_at=start + dt.timedelta(minutes=minute),
+            )
+            for minute in range(7)
+        ]
+        async with session_factory() as session:
+            await write_events(events, session)
+            await session.commit()
+
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+            resp = await client.get(
+                f"/api/v1/watchers/{watcher_id}/events", params=params, headers=headers
+            )
+            assert resp.status_code == 200, resp.text
+            page = resp.json()
+            assert len(page["items"]) <= 3
+            seen.extend(item["id"] for item in page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert seen == [str(event.id) for event in reversed(events)]
+
+        resp = await client.get(
+            f"/api/v1/workspaces/{workspace_id}/events",
+            params={
+                "status": "down",
+                "since": (start + dt.timedelta(minutes=1)).isoformat(),
+                "until": (start + dt.timedelta(minutes=6)).isoformat(),
+            },
+            headers=headers,
+        )
+        assert [item["id"] for item in resp.json()["items"]] == [str(events[3].id)]
+
+        # the public history is the snapshot's incidents, paged the same way
+        public_url = f"/api/v1/public/workspaces/{workspace_id}/events"
+        public_resp = await client.get(public_url, params={"limit": 2})
+        assert [item["id"] for item in public_resp.json()["items"]] == [
+            str(events[6].id),
+            str(events[3].id),
+        ]
+        cursor = public_resp.json()["next_cursor"]
+        public_resp = await client.get(public_url, params={"limit": 2, "cursor": cursor})
+        assert [item["id"] for item in public_resp.json()["items"]] == [str(events[0].id)]
+        assert public_resp.json()["next_cursor"] is None
+
+        bad_resp = await client.get(
+            f"/api/v1/public/workspaces/{workspace_id}/events", params={"cursor": "nope"}
+        )
+        assert bad_resp.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_public_status_is_served_from_snapshots(app, session_factory):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = await _register_and_login(client, "snapshot@example.com")
+        ws_resp = await client.post(
+            "/api/v1/workspaces", json={"name": "Snap", "is_public": True}, headers=headers
+        )
+        workspace_id = uuid.UUID(ws_resp.json()["id"])
+        watcher_resp = await client.post(
+            f"/api/v1/workspaces/{workspace_id}/watchers",
+            json={"name": "Site", "url": "https://example.com"},
+            headers=headers,
+        )
+        watcher_id = uuid.UUID(watcher_resp.json()["id"])
+
+        # first read builds and stores the snapshot
+        resp = await client.get(f"/api/v1/public/workspaces/{workspace_id}/status")
+        assert resp.status_code == 200, resp.text
+        [watcher] = resp.json()["watchers"]
+        assert watcher["status"] is None
+
+        async with session_factory() as session:
+            await write_events(
+                [
+                    HealthEvent(
+                        watcher_id=watcher_id, status=HealthStatus.healthy, response_time_ms=12.0
+                    ),
+                    HealthEvent(watcher_id=watcher_id, status=HealthStatus.down),
+                ],
+                session,
+            )
+            await session.commit()
+
+        # new events are not visible until a worker refreshes the snapshot
+        resp = await client.get(f"/api/v1/public/workspaces/{workspace_id}/status")
+        assert resp.json()["watchers"][0]["status"] is None
+
+        refresher = snapshots.SnapshotRefresher(session_factory)
+        refresher.mark_dirty([workspace_id, workspace_id])
+        assert await refresher.refresh_dirty() == 1
+
+        resp = await client.get(f"/api/v1/public/workspaces/{workspace_id}/status")
+        body = resp.json()
+        [watcher] = body["watchers"]
+        assert watcher["status"] in ("healthy", "down")
+        assert watcher["recent_latency_ms"] == [12.0]
+        assert [incident["status"] for incident in body["incidents"]] == ["down"]
+        assert body["uptime"]["uptime_percentage"] == 50.0
+
+        watchers_resp = await client.get(f"/api/v1/public/workspaces/{workspace_id}/watchers")
+        assert [item["id"] for item in watchers_resp.json()] == [str(watcher_id)]
+        assert "status" not in watchers_resp.json()[0]
+
+        # deleting a watcher drops the snapshot so the page never lists it again
+        await client.delete(f"/api/v1/watchers/{watcher_id}", headers=headers)
+        resp = await client.get(f"/api/v1/public/workspaces/{workspace_id}/status")
+        assert resp.json()["watchers"] == []
+
+        private_resp = await client.post(
+            "/api/v1/workspaces", json={"name": "Private", "is_public": False}, headers=headers
+        )
+        resp = await client.get(f"/api/v1/public/workspaces/{private_resp.json()['id']}/status")
+        assert resp.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_public_snapshot_misses_rebuild_once_and_remember_private_ids(
+    app, monkeypatch, count_queries
+):
+    builds = []
+    build_snapshot = snapshots.build_snapshot
+
+    async def slow_build(workspace_id, session):
+        builds.append(workspace_id)
+        await asyncio.sleep(0.01)
+        return await build_snapshot(workspace_id, session)
+
+    monkeypatch.setattr(snapshots, "build_snapshot", slow_build)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = await _register_and_login(client, "flight@example.com")
+        public_id = (
+            await client.post(
+                "/api/v1/workspaces", json={"name": "Up", "is_public": True}, headers=headers
+            )
+        ).json()["id"]
+
+        # concurrent misses wait for one rebuild instead of each running it
+        responses = await asyncio.gather(
+            *(client.get(f"/api/v1/public/workspaces/{public_id}/status") for _ in range(5))
+        )
+        assert [resp.status_code for resp in responses] == [200] * 5
+        assert builds == [uuid.UUID(public_id)]
+
+        # an unknown id is looked up once, then answered from the negative cache
+        unknown = uuid.uuid4()
+        resp = await client.get(f"/api/v1/public/workspaces/{unknown}/events")
+        assert resp.status_code == 404
+        with count_queries() as queries:
+            for path in ("status", "events", "watchers"):
+                resp = await client.get(f"/api/v1/public/workspaces/{unknown}/{path}")
+                assert resp.status_code == 404
+        assert len(queries) == 0
+        assert builds.count(unknown) == 1
+
+
+@pytest.mark.anyio
+async def test_checks_in_private_workspaces_skip_snapshot_refreshes(
+    app, monkeypatch, scheduler, session_factory
+):
+    builds = []
+    build_snapshot = snapshots.build_snapshot
+
+    async def counting_build(workspace_id, session):
+        builds.append(workspace_id)
+        return await build_snapshot(workspace_id, session)
+
+    async def healthy(watcher):
+        return HealthEvent(watcher_id=watcher.id, status=HealthStatus.healthy)
+
+    monkeypatch.setattr(snapshots, "build_snapshot", counting_build)
+    monkeypatch.setattr(watcher_service, "_http_check", healthy)
+    monkeypatch.setattr(workers, "SessionLocal", session_factory)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = await _register_and_login(client, "private@example.com")
+        workspace_id = (
+            await client.post("/api/v1/workspaces", json={"name": "Hidden"}, headers=headers)
+        ).json()["id"]
+        watcher_resp = await client.post(
+            f"/api/v1/workspaces/{workspace_id}/watchers",
+            json={"name": "Site", "url": "https://example.com"},
+            headers=headers,
+        )
+
+    # RQ check jobs read the workspace flag along with the watcher and never build
+    for _ in range(3):
+        await workers._run_check_async(uuid.UUID(watcher_resp.json()["id"]))
+    assert builds == []
+
+    # the check engine's refresher builds once, then remembers the workspace is private
+    for _ in range(3):
+        async with session_factory() as session:
+            assert await snapshots.refresh_snapshot(uuid.UUID(workspace_id), session) is None
+    assert builds == [uuid.UUID(workspace_id)]
+
+
+@pytest.mark.anyio
+async def test_event_export_streams_ndjson_and_csv(app, session_factory, monkeypatch):
+    monkeypatch.setattr(event_service, "EXPORT_CHUNK_ROWS", 2)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = await _register_and_login(client, "export@example.com")
+        ws_resp = await client.post("/api/v1/workspaces", json={"name": "Export"}, headers=headers)
+        workspace_id = ws_resp.json()["id"]
+        watcher_ids = []
+        for name in ("api", "web"):
+            watcher_resp = await client.post(
+                f"/api/v1/workspaces/{workspace_id}/watchers",
+                json={"name": name, "url": f"https://{name}.example.com"},
+                headers=headers,
+            )
+            watcher_ids.append(uuid.UUID(watcher_resp.json()["id"]))
+
+        start = dt.datetime(2026, 1, 1, tzinfo=dt.timezone.utc)
+        events = [
+            HealthEvent(
+                watcher_id=watcher_ids[minute % 2],
+                status=HealthStatus.healthy,
+                response_time_ms=float(minute),
+                created_at=start + dt.timedelta(minutes=minute),
+            )
+            for minute in range(5)
+        ]
+        async with session_factory() as session:
+            await write_events(events, session)
+            await session.commit()
+
+        url = f"/api/v1/workspaces/{workspace_id}/events/export"
+        resp = await client.get(url, headers=headers)
+        assert resp.status_code == 200, resp.text
+        assert resp.headers["content-type"].startswith("application/x-ndjson")
+        assert "attachment" in resp.headers["content-disposition"]
+        rows = [json.loads(line) for line in resp.text.splitlines()]
+        assert [row["id"] for row in rows] == [str(event.id) for event in events]
+        assert rows[0]["status"] == "healthy"
+        assert rows[0]["created_at"] == start.isoformat()
+
+        resp = await client.get(
+            url,
+            params={
+                "format": "csv",
+                "watcher_id": str(watcher_ids[0]),
+                "since": (start + dt.timedelta(minutes=1)).isoformat(),
+            },
+            headers=headers,
+        )
+        assert resp.headers["content-type"].startswith("text/csv")
+        header, *lines = list(csv.reader(io.StringIO(resp.text)))
+        assert header[:3] == ["id", "watcher_id", "status"]
+        assert [line[0] for line in lines] == [str(events[2].id), str(events[4].id)]
+
+        outsider = await _register_and_login(client, "outsider@example.com")
+        assert (await client.get(url, headers=outsider)).status_code == 403
+
+
+@pytest.mark.anyio
+async def test_watcher_edits_reschedule_in_place(app, scheduler, monkeypatch, session_factory):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = await _register_and_login(client, "sched@example.com")
+        ws_resp = await client.post("/api/v1/workspaces", json={"name": "Sched"}, headers=headers)
+        watcher_resp = await client.post(
+            f"/api/v1/workspaces/{ws_resp.json()['id']}/watchers",
+            json={"name": "Site", "url": "https://example.com"},
+            headers=headers,
+        )
+        watcher_id = uuid.UUID(watcher_resp.json()["id"])
+        assert list(scheduler.scores) == [watcher_id]
+
+        for value in range(1, 6):
+            await client.patch(
+                f"/api/v1/watchers/{watcher_id}", json={"every_value": value}, headers=headers
+            )
+        # five edits still leave exactly one pending check, due now
+        assert list(scheduler.scores) == [watcher_id]
+        assert scheduler.claim_due() == [watcher_id]
+
+        await client.delete(f"/api/v1/watchers/{watcher_id}", headers=headers)
+        assert scheduler.scores == {}
+
+    # a check claimed before the delete finds no watcher and stays cancelled
+    monkeypatch.setattr(workers, "SessionLocal", session_factory)
+    scheduler.reschedule(watcher_id)
+    await workers._run_check_async(watcher_id)
+    assert scheduler.scores == {}
+
+    # sharded engines schedule in memory: the API leaves the Redis schedule alone
+    monkeypatch.setattr(settings, "check_backend", "sharded")
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        watcher_resp = await client.post(
+            f"/api/v1/workspaces/{ws_resp.json()['id']}/watchers",
+            json={"name": "Sharded", "url": "https://example.com"},
+            headers=headers,
+        )
+        assert watcher_resp.status_code == 201
+        watcher_url = f"/api/v1/watchers/{watcher_resp.json()['id']}"
+        await client.patch(watcher_url, json={"every_value": 2}, headers=headers)
+        await client.delete(watcher_url, headers=headers)
+    assert scheduler.scores == {}
+
+
+async def _auth_cache_hits(client):
+    text = (await client.get("/metrics")).text
+    return {
+        cache: float(
+            re.search(rf'^healther_auth_cache_hits{{cache="{cache}"}} (\S+)$', text, re.M)[1]
+        )
+        for cache in ("users", "roles")
+    }
+
+
+@pytest.mark.anyio
+async def test_auth_cache_is_invalidated_by_membership_and_profile_changes(app):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        owner = await _register_and_login(client, "cache-owner@example.com")
+        member = await _register_and_login(client, "cache-member@example.com")
+        member_id = (await client.get("/api/v1/me", headers=member)).json()["id"]
+        ws_resp = await client.post("/api/v1/workspaces", json={"name": "Cache"}, headers=owner)
+        workspace_id = ws_resp.json()["id"]
+        recipients = f"/api/v1/workspaces/{workspace_id}/recipients"
+
+        # the counters are published with the other metrics; /health stays anonymous and bare
+        assert (await client.get("/api/v1/health")).json() == {"status": "ok"}
+        before = await _auth_cache_hits(client)
+        for _ in range(3):
+            assert (await client.get(recipients, headers=owner)).status_code == 200
+        after = await _auth_cache_hits(client)
+        assert after["users"] - before["users"] >= 2
+        assert after["roles"] - before["roles"] == 2
+
+        # a not-yet member is refused, then admitted as soon as the invite lands
+        assert (await client.get(recipients, headers=member)).status_code == 403
+        await client.post(
+            f"/api/v1/workspaces/{workspace_id}/members/invite",
+            json={"email": "cache-member@example.com", "role": "admin"},
+            headers=owner,
+        )
+        assert (await client.get(recipients, headers=member)).status_code == 200
+
+        # a demotion or removal applies immediately despite the cached role
+        await client.patch(
+            f"/api/v1/workspaces/{workspace_id}/members/{member_id}",
+            json={"role": "observer"},
+            headers=owner,
+        )
+        assert (await client.get(recipients, headers=member)).status_code == 403
+        await client.delete(f"/api/v1/workspaces/{workspace_id}/members/{member_id}", headers=owner)
+        watchers = f"/api/v1/workspaces/{workspace_id}/watchers"
+        assert (await client.get(watchers, headers=member)).status_code == 403
+
+        resp = await client.patch("/api/v1/me", json={"first_name": "Ada"}, headers=member)
+        assert resp.status_code == 200, resp.text
+        assert (await client.get("/api/v1/me", headers=member)).json()["first_name"] == "Ada"
+
+
+@pytest.mark.anyio
+async def test_overview_reports_current_status_in_one_query(app, session_factory, sync_engine):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = await _register_and_login(client, "overview@example.com")
+        ws_resp = await client.post("/api/v1/workspaces", json={"name": "Ops"}, headers=headers)
+        workspace_id = ws_resp.json()["id"]
+        watcher_ids = []
+        for name in ("api", "web", "idle"):
+            resp = await client.post(
+                f"/api/v1/workspaces/{workspace_id}/watchers",
+                json={"name": name, "url": f"https://{name}.example.com"},
+                headers=headers,
+            )
+            watcher_ids.append(uuid.UUID(resp.json()["id"]))
+        await client.post(
+            f"/api/v1/workspaces/{workspace_id}/recipients",
+            json={"email": "ops@example.com"},
+            headers=headers,
+        )
+
+        api_id, web_id, _ = watcher_ids
+        start = dt.datetime.now(dt.timezone.utc) - dt.timedelta(minutes=30)
+        statuses = [HealthStatus.healthy, HealthStatus.down, HealthStatus.down, HealthStatus.down]
+        events = [
+            HealthEvent(
+                watcher_id=api_id,
+                status=status,
+                response_time_ms=float(index),
+                created_at=start + dt.timedelta(minutes=index),
+            )
+            for index, status in enumerate(statuses)
+        ] + [HealthEvent(watcher_id=web_id, status=HealthStatus.healthy, created_at=start)]
+        async with session_factory() as session:
+            # the down run starts in the first batch and continues in the second
+            await write_events(events[:2] + events[4:], session)
+            await write_events(events[2:4], session)
+            # a late, older result must not overwrite the newer status
+            await write_events(
+                [HealthEvent(watcher_id=api_id, status=HealthStatus.healthy, created_at=start)],
+                session,
+            )
+            await session.commit()
+
+        await client.get(f"/api/v1/workspaces/{workspace_id}/overview", headers=headers)
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        sqlalchemy.event.listen(sync_engine, "before_cursor_execute", record)
+        try:
+            resp = await client.get(f"/api/v1/workspaces/{workspace_id}/overview", headers=headers)
+        finally:
+            sqlalchemy.event.remove(sync_engine, "before_cursor_execute", record)
+        assert resp.status_code == 200, resp.text
+        # auth is cached by now, so the whole page is a single statement
+        assert len(statements) == 1
+
+        body = resp.json()
+        assert (body["name"], body["member_count"], body["recipient_count"]) == ("Ops", 1, 1)
+        api, web, idle = body["watchers"]
+        assert api["last_status"] == "down"
+        assert api["last_latency_ms"] == 3.0
+        assert dt.datetime.fromisoformat(api["status_since"]).replace(
+            tzinfo=dt.timezone.utc
+        ) == start + dt.timedelta(minutes=1)
+        assert api["uptime_24h"] == api["uptime_90d"] == 40.0
+        assert (web["last_status"], web["uptime_24h"]) == ("healthy", 100.0)
+        assert (idle["last_status"], idle["uptime_24h"], idle["status_since"]) == (None, None, None)
+
+        # the plain watcher listing carries the same current status
+        listed = await client.get(f"/api/v1/workspaces/{workspace_id}/watchers", headers=headers)
+        assert [watcher["last_status"] for watcher in listed.json()] == ["down", "healthy", None]
+
+        # an existing database gets the same values from the backfill
+        async with session_factory() as session:
+            await session.exec(
+                sqlalchemy.update(ServiceWatcher).values(last_status=None, status_since=None)
+            )
+            assert await overview_service.backfill_current_status(session) == 2
+        resp = await client.get(f"/api/v1/workspaces/{workspace_id}/overview", headers=headers)
+        assert resp.json()["watchers"][0]["status_since"] == api["status_since"]
+
+
+@pytest.mark.anyio
+async def test_watchers_are_imported_in_bulk_and_round_trip_through_export(app, scheduler):
+    yaml_list = """
+- name: api
+  url: https://api.example.com
+  every_value: 1
+- name: web
+  url: https://web.example.com
+  expected_body: ok
+- name: api
+  url: https://api.example.com
+"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = await _register_and_login(client, "bulk@example.com")
+        source = (
+            await client.post("/api/v1/workspaces", json={"name": "A"}, headers=headers)
+        ).json()
+        target = (
+            await client.post("/api/v1/workspaces", json={"name": "B"}, headers=headers)
+        ).json()
+        await client.post(
+            f"/api/v1/workspaces/{source['id']}/watchers",
+            json={"name": "web", "url": "https://web.example.com"},
+            headers=headers,
+        )
+
+        resp = await client.post(
+            f"/api/v1/workspaces/{source['id']}/watchers/import",
+            content=yaml_list,
+            headers={**headers, "Content-Type": "application/yaml"},
+        )
+        assert resp.status_code == 201, resp.text
+        body = resp.json()
+        assert [watcher["name"] for watcher in body["created"]] == ["api"]
+        # the existing watcher and the repeated item are skipped
+        assert [item["name"] for item in body["skipped"]] == ["web", "api"]
+        assert len(scheduler.scores) == 2
+
+        export = await client.get(
+            f"/api/v1/workspaces/{source['id']}/watchers/export", headers=headers
+        )
+        assert export.headers["content-disposition"].endswith('.json"')
+        assert [item["name"] for item in export.json()["watchers"]] == ["web", "api"]
+
+        url = f"/api/v1/workspaces/{target['id']}/watchers/import"
+        resp = await client.post(url, content=export.content, headers=headers)
+        assert len(resp.json()["created"]) == 2 and len(scheduler.scores) == 4
+        resp = await client.post(url, content=export.content, headers=headers)
+        assert (len(resp.json()["created"]), len(resp.json()["skipped"])) == (0, 2)
+        round_trip = await client.get(
+            f"/api/v1/workspaces/{target['id']}/watchers/export?format=yaml", headers=headers
+        )
+        assert round_trip.headers["content-type"].startswith("application/yaml")
+        assert "name: api" in round_trip.text
+        again = await client.get(
+            f"/api/v1/workspaces/{target['id']}/watchers/export", headers=headers
+        )
+        assert again.json() == export.json()
+
+        assert (await client.post(url, content="[{]", headers=headers)).status_code == 400
+        resp = await client.post(url, json=[{"name": "no url"}], headers=headers)
+        assert resp.status_code == 422
+        resp = await client.post(url, content="x", headers={**headers, "Content-Type": "text/plain"})
+        assert resp.status_code == 415
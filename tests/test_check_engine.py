@@ -0,0 +1,303 @@
+import asyncio
+import json
+import time
+import uuid
+
+import httpx
+import pytest
+from sqlalchemy import event
+from sqlmodel import Session, select
+
+from healther import alerts, check_engine, live
+from healther.event_sink import EventSink
+from healther.http_client import HttpClientManager
+from healther.models import HealthEvent, HealthStatus, ServiceWatcher, Workspace
+from healther.scheduler import LocalScheduler
+from healther.sharding import HashRing, ShardMembership
+
+
+def _seed_watchers(sync_engine, count):
+    with Session(sync_engine) as session:
+        workspace = Workspace(name="Load")
+        session.add(workspace)
+        session.commit()
+        for index in range(count):
+            session.add(
+                ServiceWatcher(
+                    workspace_id=workspace.id, name=f"svc-{index}", url=f"http://svc-{index}"
+                )
+            )
+        session.commit()
+
+
+@pytest.mark.anyio
+async def test_engine_runs_due_checks_with_bounded_concurrency(
+    monkeypatch, sync_engine, session_factory, scheduler, alert_pipeline
+):
+    _seed_watchers(sync_engine, 12)
+    active = 0
+    peak = 0
+    published = []
+
+    async def fake_run_http_check(watcher):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        status = HealthStatus.down if watcher.name == "svc-0" else HealthStatus.healthy
+        return HealthEvent(watcher_id=watcher.id, status=status, response_time_ms=5.0)
+
+    monkeypatch.setattr(check_engine, "run_http_check", fake_run_http_check)
+    monkeypatch.setattr(check_engine, "alert_pipeline", alert_pipeline)
+    monkeypatch.setattr(
+        check_engine.live_publisher, "publish", lambda events, ids: published.append(ids)
+    )
+    sink = EventSink(session_factory, max_batch=5, max_delay=60)
+    engine = check_engine.CheckEngine(
+        concurrency=3, session_factory=session_factory, sink=sink, scheduler=scheduler
+    )
+    await engine.refresh()
+    assert len(scheduler.scores) == 12
+
+    # only as many watchers are claimed as there are free slots
+    assert await engine.dispatch() == 3
+    assert await engine.dispatch() == 0
+    while engine.stats.completed < 12:
+        await asyncio.sleep(0.005)
+        await engine.dispatch()
+    await asyncio.gather(*engine._tasks)
+
+    assert peak == 3
+    assert engine.stats.rate() > 0
+    # next runs follow the 15 minute default cadence
+    engine.flush_schedule()
+    assert scheduler.claim_due() == []
+    assert min(scheduler.scores.values()) > time.time() + 14 * 60
+
+    # two size-triggered batches of 5 so far, the remainder waits for the timer
+    assert sink.stats.flushes == 2
+    assert sink.pending == 2
+    await sink.flush()
+    assert sink.stats.events == 12
+    assert sink.stats.max_batch_size == 5
+
+    with Session(sync_engine) as session:
+        events = session.exec(select(HealthEvent)).all()
+    assert len({event.watcher_id for event in events}) == 12
+    # every committed result reached alerting; one failed check is not yet an alert
+    states = alert_pipeline.conn.hashes[alerts.STATE_KEY]
+    assert len(states) == 12
+    down = next(event.watcher_id for event in events if event.status == HealthStatus.down)
+    assert json.loads(states[str(down)])["candidate"] == "down"
+    assert alert_pipeline.queue.scheduled == []
+    # every committed batch went to the live feed with its workspace
+    assert sum(len(ids) for ids in published) == 12
+    assert len({ws for ids in published for ws in ids.values()}) == 1
+
+
+@pytest.mark.anyio
+async def test_engine_reloads_watchers_whose_check_an_edit_moved_forward(
+    monkeypatch, sync_engine, session_factory, scheduler
+):
+    _seed_watchers(sync_engine, 2)
+    checked = []
+
+    async def fake_run_http_check(watcher):
+        checked.append((watcher.id, watcher.url))
+        return HealthEvent(watcher_id=watcher.id, status=HealthStatus.healthy)
+
+    monkeypatch.setattr(check_engine, "run_http_check", fake_run_http_check)
+    engine = check_engine.CheckEngine(
+        session_factory=session_factory,
+        sink=EventSink(session_factory, max_delay=60),
+        scheduler=scheduler,
+    )
+    await engine.refresh()
+    assert await engine.dispatch() == 2
+    await asyncio.gather(*engine._tasks)
+    engine.flush_schedule()
+
+    # what update_watcher does: write the row, then move the check to now
+    edited = checked[0][0]
+    with Session(sync_engine) as session:
+        watcher = session.get(ServiceWatcher, edited)
+        watcher.url = "http://moved.example.com"
+        session.add(watcher)
+        session.commit()
+    scheduler.reschedule(edited)
+    checked.clear()
+    assert await engine.dispatch() == 1
+    await asyncio.gather(*engine._tasks)
+    assert checked == [(edited, "http://moved.example.com")]
+
+
+@pytest.mark.anyio
+async def test_restarted_engine_reports_the_first_flip_against_the_stored_status(
+    monkeypatch, sync_engine, session_factory, scheduler, memory_redis, alert_pipeline
+):
+    _seed_watchers(sync_engine, 1)
+    with Session(sync_engine) as session:
+        watcher = session.exec(select(ServiceWatcher)).one()
+        watcher.last_status = HealthStatus.healthy
+        session.add(watcher)
+        session.commit()
+
+    async def down(watcher):
+        return HealthEvent(watcher_id=watcher.id, status=HealthStatus.down)
+
+    monkeypatch.setattr(check_engine, "run_http_check", down)
+    monkeypatch.setattr(check_engine, "alert_pipeline", alert_pipeline)
+    monkeypatch.setattr(check_engine, "live_publisher", live.LivePublisher(memory_redis))
+    sink = EventSink(session_factory, max_delay=60)
+    engine = check_engine.CheckEngine(
+        session_factory=session_factory, sink=sink, scheduler=scheduler
+    )
+    await engine.refresh()
+    await engine.dispatch()
+    await asyncio.gather(*engine._tasks)
+    await sink.flush()
+
+    kinds = [json.loads(message)["event"] for _, message in memory_redis.published]
+    assert kinds == ["health_event", "status_change"]
+    change = json.loads(memory_redis.published[-1][1])["data"]
+    assert (change["previous"], change["status"]) == ("healthy", "down")
+
+
+@pytest.mark.anyio
+async def test_sink_drops_events_of_purged_watchers_instead_of_retrying_them(
+    sync_engine, session_factory
+):
+    # SQLite only enforces foreign keys when asked, as Postgres always does
+    event.listen(sync_engine, "connect", lambda conn, record: conn.execute("PRAGMA foreign_keys=ON"))
+    sync_engine.dispose()
+    _seed_watchers(sync_engine, 2)
+    with Session(sync_engine) as session:
+        watcher_ids = session.exec(select(ServiceWatcher.id)).all()
+    sink = EventSink(session_factory, max_batch=100, max_delay=60)
+    # a check that finished after its watcher was purged
+    for watcher_id in [*watcher_ids, uuid.uuid4()]:
+        await sink.add(HealthEvent(watcher_id=watcher_id, status=HealthStatus.healthy))
+
+    assert await sink.flush() == 0
+    assert sink.stats.errors == 1 and sink.pending == 2
+    assert await sink.flush() == 2
+    with Session(sync_engine) as session:
+        assert set(session.exec(select(HealthEvent.watcher_id)).all()) == set(watcher_ids)
+
+
+@pytest.mark.anyio
+async def test_http_client_manager_caps_requests_per_host():
+    active = {"a.test": 0, "b.test": 0}
+    peak = {"a.test": 0, "b.test": 0}
+
+    async def handler(request):
+        host = request.url.host
+        active[host] += 1
+        peak[host] = max(peak[host], active[host])
+        await asyncio.sleep(0.01)
+        active[host] -= 1
+        return httpx.Response(200)
+
+    manager = HttpClientManager(per_host_limit=2, transport=httpx.MockTransport(handler))
+    urls = [f"http://a.test/{i}" for i in range(6)] + [f"http://b.test/{i}" for i in range(3)]
+    responses = await asyncio.gather(*(manager.request("HEAD", url) for url in urls))
+    cold = await manager.request("HEAD", "http://b.test/cold", cold=True)
+    await manager.aclose()
+
+    assert all(response.status_code == 200 for response in responses)
+    assert cold.status_code == 200
+    assert peak == {"a.test": 2, "b.test": 2}
+
+
+def test_hash_ring_spreads_watchers_and_moves_few_on_rebalance():
+    keys = [uuid.uuid4() for _ in range(3000)]
+    three = HashRing(["a", "b", "c"])
+    owners = {key: three.owner(key) for key in keys}
+    for member in "abc":
+        assert 0.25 < list(owners.values()).count(member) / len(keys) < 0.42
+
+    four = HashRing(["a", "b", "c", "d"])
+    moved = [key for key in keys if four.owner(key) != owners[key]]
+    # only the newcomer gains watchers, roughly its fair share of them
+    assert {four.owner(key) for key in moved} == {"d"}
+    assert 0.15 < len(moved) / len(keys) < 0.35
+    assert {key: HashRing(["c", "b", "a"]).owner(key) for key in keys} == owners
+    assert HashRing([]).owner(keys[0]) is None
+
+
+def test_local_scheduler_leases_claims_and_ignores_cancelled_watchers():
+    schedule = LocalScheduler(lease_seconds=300, jitter_ratio=0, initial_jitter_seconds=0)
+    first, second, third = (uuid.uuid4() for _ in range(3))
+    schedule.add_many({first: 60, second: 60, third: 60}, now=100)
+    schedule.reschedule(second, at=50)
+    schedule.cancel(third)
+    assert schedule.claim_due(now=100, limit=1) == [second]
+    assert schedule.claim_due(now=100) == [first]
+    assert schedule.claim_due(now=399) == []
+    schedule.complete_many({first: 60, third: 60}, now=110)
+    assert len(schedule) == 2
+    assert schedule.next_due() == 170
+    assert schedule.claim_due(now=400) == [first, second]
+
+
+def test_bulk_adds_spread_first_checks_over_the_interval(monkeypatch):
+    monkeypatch.setattr("random.uniform", lambda low, high: high)
+    schedule = LocalScheduler(initial_jitter_seconds=60)
+    hourly, minutely, imported = (uuid.uuid4() for _ in range(3))
+    schedule.add_many({hourly: 3600, minutely: 30}, now=0)
+    schedule.add_many({imported: 3600}, now=0, spread=float("inf"))
+    # one created watcher starts within the initial jitter, imported ones anywhere in their interval
+    assert schedule._due == {hourly: 60, minutely: 30, imported: 3600}
+
+
+@pytest.mark.anyio
+async def test_sharded_engines_own_disjoint_slices_and_rebalance(
+    sync_engine, session_factory, memory_redis
+):
+    _seed_watchers(sync_engine, 60)
+
+    def shard(name):
+        membership = ShardMembership(memory_redis, name, ttl_seconds=15)
+        return check_engine.ShardedCheckEngine(
+            membership=membership, session_factory=session_factory
+        )
+
+    async def rebalance(engines):
+        # a second round of beats lets every shard see the ones that beat after it
+        for engine in engines + engines:
+            engine.heartbeat()
+        for engine in engines:
+            await engine.refresh()
+        slices = [set(engine._watchers) for engine in engines]
+        assert sum(len(owned) for owned in slices) == 60
+        assert len(set().union(*slices)) == 60
+        return slices
+
+    first, second = shard("shard-a"), shard("shard-b")
+    before = await rebalance([first, second])
+    assert all(owned for owned in before)
+    # each shard's schedule holds exactly its own slice
+    far = time.time() + 3600
+    assert set(first.scheduler.claim_due(now=far)) == before[0]
+
+    third = shard("shard-c")
+    after = await rebalance([first, second, third])
+    assert after[0] <= before[0] and after[1] <= before[1]
+    assert after[2] and len(first.scheduler) == len(after[0])
+    assert sum(engine.owns("retention") for engine in (first, second, third)) == 1
+
+    # an edit is picked up on the owner's next refresh and checked right away
+    edited = next(iter(after[1]))
+    with Session(sync_engine) as session:
+        watcher = session.get(ServiceWatcher, edited)
+        watcher.url = "http://moved.example.com"
+        session.add(watcher)
+        session.commit()
+    await second.refresh()
+    assert second.scheduler.next_due() <= time.time()
+    assert second._watchers[edited].url == "http://moved.example.com"
+
+    # a shard that shuts down hands its watchers back straight away
+    third.membership.leave()
+    assert await rebalance([first, second]) == before
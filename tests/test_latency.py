@@ -0,0 +1,96 @@
+import datetime as dt
+import random
+import uuid
+
+import httpx
+import pytest
+
+from healther.models import HealthEvent, HealthStatus
+from healther.services.events import write_events
+from healther.sketch import RELATIVE_ACCURACY, LatencySketch
+
+
+def _exact(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def test_sketch_quantiles_stay_within_relative_accuracy_after_merging():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(4, 1.2) for _ in range(20_000)] + [0.0] * 50
+    parts = [LatencySketch() for _ in range(24)]
+    for index, value in enumerate(values):
+        parts[index % 24].add(value)
+    merged = LatencySketch()
+    for part in parts:
+        merged.merge(LatencySketch.from_json(part.to_json()))
+
+    assert merged.count == len(values)
+    assert (merged.min, merged.max) == (min(values), max(values))
+    for q in (0.5, 0.9, 0.95, 0.99):
+        expected = _exact(values, q)
+        assert abs(merged.quantile(q) - expected) <= expected * RELATIVE_ACCURACY
+    assert merged.quantile(0.0) == 0.0
+    assert LatencySketch().quantile(0.5) is None
+
+
+@pytest.mark.anyio
+async def test_latency_endpoint_merges_rollup_sketches(app, session_factory):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        email = "latency@example.com"
+        await client.post("/api/v1/auth/register", json={"email": email, "password": "secret123"})
+        token = await client.post(
+            "/api/v1/auth/token", json={"username": email, "password": "secret123"}
+        )
+        headers = {"Authorization": f"Bearer {token.json()['access_token']}"}
+        workspace = await client.post("/api/v1/workspaces", json={"name": "L"}, headers=headers)
+        watcher = await client.post(
+            f"/api/v1/workspaces/{workspace.json()['id']}/watchers",
+            json={"name": "api", "url": "https://api.example.com"},
+            headers=headers,
+        )
+        watcher_id = uuid.UUID(watcher.json()["id"])
+
+        now = dt.datetime.now(dt.timezone.utc)
+        recent = [float(value) for value in range(1, 101)]
+        old = [1000.0] * 50
+        events = [
+            HealthEvent(
+                watcher_id=watcher_id,
+                status=HealthStatus.healthy,
+                response_time_ms=value,
+                created_at=now - dt.timedelta(minutes=index % 30),
+            )
+            for index, value in enumerate(recent)
+        ] + [
+            HealthEvent(
+                watcher_id=watcher_id,
+                status=HealthStatus.healthy,
+                response_time_ms=value,
+                created_at=now - dt.timedelta(days=3),
+            )
+            for value in old
+        ]
+        events.append(HealthEvent(watcher_id=watcher_id, status=HealthStatus.down))
+        async with session_factory() as session:
+            # several writes land in the same buckets and must merge
+            for start in range(0, len(events), 40):
+                await write_events(events[start : start + 40], session)
+            await session.commit()
+
+        resp = await client.get(f"/api/v1/watchers/{watcher_id}/latency", headers=headers)
+        assert resp.status_code == 200, resp.text
+        day = resp.json()
+        assert (day["window"], day["count"]) == ("24h", 100)
+        assert (day["min_ms"], day["max_ms"]) == (1.0, 100.0)
+        for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            expected = _exact(recent, q)
+            assert abs(day[name] - expected) <= expected * RELATIVE_ACCURACY
+
+        week = await client.get(f"/api/v1/watchers/{watcher_id}/latency?window=7d", headers=headers)
+        assert week.json()["count"] == 150
+        assert week.json()["p99"] == pytest.approx(1000.0, rel=RELATIVE_ACCURACY)
+
+        bad = await client.get(f"/api/v1/watchers/{watcher_id}/latency?window=2h", headers=headers)
+        assert bad.status_code == 422
@@ -0,0 +1,119 @@
+import json
+import uuid
+
+import httpx
+import pytest
+
+from healther import live
+from healther.models import HealthEvent, HealthStatus
+
+
+class _Pipeline:
+    def __init__(self, published):
+        self.published = published
+        self.pending = []
+
+    def publish(self, channel, message):
+        self.pending.append((channel, json.loads(message)))
+
+    def execute(self):
+        self.published.extend(self.pending)
+
+
+class _Conn:
+    def __init__(self):
+        self.published = []
+
+    def pipeline(self, transaction=True):
+        return _Pipeline(self.published)
+
+
+class _PubSub:
+    def __init__(self):
+        self.subscribed = []
+        self.unsubscribed = []
+
+    async def subscribe(self, *channels):
+        self.subscribed.extend(channels)
+
+    async def unsubscribe(self, *channels):
+        self.unsubscribed.extend(channels)
+
+
+def test_publisher_sends_events_and_status_changes():
+    conn = _Conn()
+    publisher = live.LivePublisher(conn)
+    workspace_id, watcher_id = uuid.uuid4(), uuid.uuid4()
+    publisher.remember(watcher_id, HealthStatus.healthy)
+    events = [
+        HealthEvent(watcher_id=watcher_id, status=HealthStatus.healthy),
+        HealthEvent(watcher_id=watcher_id, status=HealthStatus.down),
+        HealthEvent(watcher_id=uuid.uuid4(), status=HealthStatus.down),
+    ]
+
+    # the last event's watcher is unknown, so it has no channel
+    assert publisher.publish(events, {watcher_id: workspace_id}) == 2
+    assert {channel for channel, _ in conn.published} == {f"healther:events:{workspace_id}"}
+    kinds = [message["event"] for _, message in conn.published]
+    assert kinds == ["health_event", "health_event", "status_change"]
+    change = conn.published[-1][1]["data"]
+    assert (change["previous"], change["status"]) == ("healthy", "down")
+    assert conn.published[0][1]["data"]["id"] == str(events[0].id)
+
+
+@pytest.mark.anyio
+async def test_broadcaster_shares_one_subscription_per_workspace(monkeypatch):
+    broadcaster = live.Broadcaster(url="redis://unused", queue_size=2)
+    pubsub = _PubSub()
+
+    async def fake_start():
+        broadcaster._pubsub = pubsub
+
+    monkeypatch.setattr(broadcaster, "_ensure_started", fake_start)
+    workspace_id = uuid.uuid4()
+    name = live.channel(workspace_id)
+    message = json.dumps({"event": "health_event", "data": {"status": "down"}})
+
+    async with broadcaster.subscribe(workspace_id) as first:
+        async with broadcaster.subscribe(workspace_id) as second:
+            assert pubsub.subscribed == [name]
+            broadcaster.dispatch(name, message)
+            frame = 'event: health_event\ndata: {"status": "down"}\n\n'
+            assert first.get_nowait() == second.get_nowait() == frame
+
+            # a slow client keeps only the newest frames
+            for index in range(3):
+                broadcaster.dispatch(name, json.dumps({"event": "tick", "data": index}))
+            assert [second.get_nowait() for _ in range(2)] == [
+                "event: tick\ndata: 1\n\n",
+                "event: tick\ndata: 2\n\n",
+            ]
+        assert pubsub.unsubscribed == []
+    assert pubsub.unsubscribed == [name]
+    assert broadcaster.channels == 0
+
+
+@pytest.mark.anyio
+async def test_live_routes_check_access_before_streaming(app):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.post(
+            "/api/v1/auth/register", json={"email": "live@example.com", "password": "secret123"}
+        )
+        token_resp = await client.post(
+            "/api/v1/auth/token", json={"username": "live@example.com", "password": "secret123"}
+        )
+        token = token_resp.json()["access_token"]
+        ws_resp = await client.post(
+            "/api/v1/workspaces",
+            json={"name": "Private"},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        workspace_id = ws_resp.json()["id"]
+
+        resp = await client.get(f"/api/v1/workspaces/{workspace_id}/live", params={"token": "x"})
+        assert resp.status_code == 401
+        resp = await client.get(f"/api/v1/workspaces/{uuid.uuid4()}/live", params={"token": token})
+        assert resp.status_code == 403
+        resp = await client.get(f"/api/v1/public/workspaces/{workspace_id}/live")
+        assert resp.status_code == 404
@@ -0,0 +1,126 @@
+import re
+import smtplib
+
+import httpx
+import pytest
+
+from healther import metrics, notifications
+
+
+def _sample(text, name, **labels):
+    selector = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    pattern = re.escape(f"{name}{{{selector}}}" if labels else name) + r" (\S+)$"
+    match = re.search(pattern, text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+def test_histogram_renders_cumulative_buckets_and_merges_spools(tmp_path):
+    registry = metrics.Registry()
+    histogram = registry.histogram("demo_seconds", "Demo.", ("kind",), buckets=(0.1, 1.0))
+    counter = registry.counter("demo_total", "Demo.", ("kind",))
+    histogram.observe(0.05, "a")
+    histogram.observe(0.5, "a")
+    counter.inc('quote"d')
+
+    # a forked work horse spools its numbers; the parent adds them in on the next render
+    registry.spool_dir = str(tmp_path)
+    registry.spool()
+    text = registry.render()
+    assert not list(tmp_path.glob("*.json"))
+
+    assert "# TYPE demo_seconds histogram" in text
+    assert _sample(text, "demo_seconds_bucket", kind="a", le="0.1") == 2
+    assert _sample(text, "demo_seconds_bucket", kind="a", le="1") == 4
+    assert _sample(text, "demo_seconds_bucket", kind="a", le="+Inf") == 4
+    assert _sample(text, "demo_seconds_count", kind="a") == 4
+    assert _sample(text, "demo_seconds_sum", kind="a") == pytest.approx(1.1)
+    assert 'demo_total{kind="quote\\"d"} 2' in text
+
+    registry.reset()
+    assert _sample(registry.render(), "demo_seconds_count", kind="a") is None
+
+
+def test_smtp_failures_are_counted(monkeypatch):
+    class BrokenSMTP:
+        def __init__(self, *args, **kwargs):
+            raise OSError("connection refused")
+
+    monkeypatch.setattr(smtplib, "SMTP", BrokenSMTP)
+    before = _sample(
+        metrics.registry.render(), "healther_smtp_send_duration_seconds_count", outcome="failed"
+    )
+    notifications._send_email(["ops@example.com"], "subject", "body")
+    after = _sample(
+        metrics.registry.render(), "healther_smtp_send_duration_seconds_count", outcome="failed"
+    )
+    assert after == (before or 0) + 1
+
+
+@pytest.mark.anyio
+async def test_api_exposes_request_metrics_by_route_template(app):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.post(
+            "/api/v1/auth/register", json={"email": "metrics@example.com", "password": "secret123"}
+        )
+        token = (
+            await client.post(
+                "/api/v1/auth/token",
+                json={"username": "metrics@example.com", "password": "secret123"},
+            )
+        ).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        workspace_id = (
+            await client.post("/api/v1/workspaces", json={"name": "Metrics"}, headers=headers)
+        ).json()["id"]
+        for _ in range(3):
+            resp = await client.get(f"/api/v1/workspaces/{workspace_id}/watchers", headers=headers)
+            assert resp.status_code == 200
+        assert (await client.get("/no/such/path")).status_code == 404
+
+        resp = await client.get("/metrics")
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    text = resp.text
+    # labelled by the route template, never by the concrete workspace id
+    route = "/api/v1/workspaces/{workspace_id}/watchers"
+    count = _sample(
+        text, "healther_http_request_duration_seconds_count", method="GET", route=route, status=200
+    )
+    assert count is not None and count >= 3
+    assert workspace_id not in text
+    assert (
+        _sample(
+            text,
+            "healther_http_request_duration_seconds_count",
+            method="GET",
+            route="unmatched",
+            status=404,
+        )
+        is not None
+    )
+    assert _sample(text, "healther_db_commit_duration_seconds_count") >= 1
+
+
+def test_worker_absorbs_each_horse_spool_when_the_job_ends(monkeypatch, tmp_path):
+    from rq import Worker
+
+    from healther import workers
+
+    def horse(self, job, queue):
+        # what a forked work horse leaves behind: its own numbers, spooled as it exits
+        own = metrics.Registry()
+        own.spool_dir = str(tmp_path)
+        own.counter(metrics.alert_notices.name, "", ("kind",)).inc("horse")
+        own.spool()
+
+    monkeypatch.setattr(Worker, "execute_job", horse)
+    monkeypatch.setattr(metrics.registry, "spool_dir", str(tmp_path))
+    before = _sample(metrics.registry.render(), "healther_alert_notices_total", kind="horse")
+    worker = workers.MetricsWorker.__new__(workers.MetricsWorker)
+    for _ in range(3):
+        worker.execute_job(None, None)
+        assert not list(tmp_path.glob("*.json"))
+    after = _sample(metrics.registry.render(), "healther_alert_notices_total", kind="horse")
+    assert after == (before or 0) + 3
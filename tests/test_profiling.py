@@ -0,0 +1,75 @@
+import logging
+import re
+import sys
+
+import httpx
+import pytest
+
+from healther import profiling
+from healther.api.middleware import ProfilingMiddleware
+
+
+@pytest.mark.anyio
+async def test_server_timing_counts_queries_and_redacts_slow_query_log(app, sync_engine, caplog):
+    profiling.instrument_engine(sync_engine, slow_query_ms=0)
+    app.add_middleware(ProfilingMiddleware, slow_request_ms=0)
+    transport = httpx.ASGITransport(app=app)
+    caplog.set_level(logging.WARNING)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.post(
+            "/api/v1/auth/register", json={"email": "prof@example.com", "password": "secret123"}
+        )
+        token = (
+            await client.post(
+                "/api/v1/auth/token", json={"username": "prof@example.com", "password": "secret123"}
+            )
+        ).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        workspace_id = (
+            await client.post("/api/v1/workspaces", json={"name": "Prof"}, headers=headers)
+        ).json()["id"]
+        resp = await client.get(f"/api/v1/workspaces/{workspace_id}/watchers", headers=headers)
+
+    assert resp.status_code == 200
+    timing = resp.headers["server-timing"]
+    phases = dict(re.findall(r"(\w+);dur=([\d.]+)", timing))
+    assert {"auth", "db", "app", "serialize", "total"} <= phases.keys()
+    queries = int(re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', timing).group(1))
+    assert queries >= 1
+
+    slow_queries = [r.getMessage() for r in caplog.records if "Slow query" in r.getMessage()]
+    assert slow_queries
+    assert not any("prof@example.com" in message for message in slow_queries)
+    assert any(
+        "Slow request GET /api/v1/workspaces/{workspace_id}/watchers" in r.getMessage()
+        for r in caplog.records
+    )
+
+
+def test_stack_sampler_files_samples_under_the_registered_request():
+    sampler = profiling.StackSampler(interval=1.0)
+    profile = profiling.RequestProfile()
+
+    def handler():
+        return inner()
+
+    def inner():
+        sampler.sample()
+
+    def request():
+        frame = sys._getframe()
+        sampler.register(frame, profile)
+        try:
+            handler()
+        finally:
+            sampler.unregister(frame)
+
+    request()
+    (stack,) = profile.stacks
+    names = [entry.split(" ")[0] for entry in stack.split(";")]
+    # outermost first, and nothing from below the registered frame
+    assert names[:2] == [
+        "test_stack_sampler_files_samples_under_the_registered_request.<locals>.handler",
+        "test_stack_sampler_files_samples_under_the_registered_request.<locals>.inner",
+    ]
+    assert names[-1] == "StackSampler.sample"
@@ -0,0 +1,330 @@
+"""Pin the number of SQL statements each API route and worker job issues.
+
+Every route in ``api/routes.py`` and every RQ job is run once against a small seeded
+database with cold auth caches, and its statements are counted. A change that adds a
+query per row (an N+1) or a stray lookup shows up as a changed count, listed with the
+statements that ran. When a new count is intended, update ``EXPECTED``.
+"""
+
+import datetime as dt
+import uuid
+
+import httpx
+import pytest
+from conftest import MemoryRedis
+from sqlmodel import Session
+
+from healther import live, notifications, workers
+from healther.api import deps
+from healther.api.routes import router
+from healther.config import settings
+from healther.models import (
+    HealthEvent,
+    HealthStatus,
+    Membership,
+    NotificationRecipient,
+    Role,
+    ServiceWatcher,
+    User,
+    Workspace,
+)
+from healther.security import create_access_token, hash_password
+from healther.services import watchers as watcher_service
+from healther.services.events import write_events
+from healther.services.sentinels import create_sentinel
+
+EXPECTED = {
+    "POST /api/v1/auth/register": 4,
+    "POST /api/v1/auth/token": 1,
+    "GET /api/v1/health": 0,
+    "GET /api/v1/me": 1,
+    "PATCH /api/v1/me": 3,
+    "POST /api/v1/workspaces": 3,
+    "GET /api/v1/workspaces": 2,
+    "GET /api/v1/workspaces/{workspace_id}/members": 3,
+    "POST /api/v1/workspaces/{workspace_id}/members/invite": 7,
+    "PATCH /api/v1/workspaces/{workspace_id}/members/{user_id}": 4,
+    "DELETE /api/v1/workspaces/{workspace_id}/members/{user_id}": 4,
+    "GET /api/v1/workspaces/{workspace_id}/recipients": 3,
+    "POST /api/v1/workspaces/{workspace_id}/recipients": 5,
+    "PATCH /api/v1/workspaces/{workspace_id}/recipients/{recipient_id}": 5,
+    "DELETE /api/v1/workspaces/{workspace_id}/recipients/{recipient_id}": 4,
+    "POST /api/v1/workspaces/{workspace_id}/watchers": 4,
+    "POST /api/v1/workspaces/{workspace_id}/watchers/import": 4,
+    "GET /api/v1/workspaces/{workspace_id}/watchers/export": 3,
+    "GET /api/v1/workspaces/{workspace_id}/watchers": 3,
+    "PATCH /api/v1/watchers/{watcher_id}": 5,
+    "DELETE /api/v1/watchers/{watcher_id}": 4,
+    "GET /api/v1/watchers/{watcher_id}/purge": 2,
+    "GET /api/v1/workspaces/{workspace_id}/overview": 3,
+    "GET /api/v1/workspaces/{workspace_id}/uptime": 4,
+    "GET /api/v1/workspaces/{workspace_id}/events": 3,
+    "GET /api/v1/workspaces/{workspace_id}/events/export": 4,
+    "GET /api/v1/watchers/{watcher_id}/events": 4,
+    "GET /api/v1/watchers/{watcher_id}/latency": 4,
+    # builds the snapshot: workspace, watchers, one windowed latency query, incidents, uptime
+    "GET /api/v1/public/workspaces/{workspace_id}/status": 6,
+    "GET /api/v1/public/workspaces/{workspace_id}/watchers": 0,
+    "GET /api/v1/public/workspaces/{workspace_id}/uptime": 0,
+    "GET /api/v1/public/workspaces/{workspace_id}/events": 0,
+    "GET /api/v1/workspaces/{workspace_id}/live": 2,
+    "GET /api/v1/public/workspaces/{workspace_id}/live": 1,
+    "GET /api/v1/sentinel/watchers": 2,
+    # sentinel results are stored only: no rollups, status or snapshot
+    "POST /api/v1/sentinel/results": 5,
+    # includes the snapshot refresh
+    "job run_check": 15,
+    "job send_digest": 3,
+    "job purge_watcher": 5,
+    # per live watcher: one page of old events, and a delete if there were any
+    "job run_retention": 9,
+}
+
+
+def _seed(sync_engine):
+    with Session(sync_engine) as session:
+        owner = User(email="owner@example.com", hashed_password=hash_password("secret123"))
+        outsider = User(email="outsider@example.com", hashed_password="x")
+        workspace = Workspace(name="public", is_public=True)
+        private = Workspace(name="private")
+        session.add_all([owner, outsider, workspace, private])
+        session.flush()
+        session.add(Membership(workspace_id=workspace.id, user_id=owner.id, role=Role.owner))
+        session.add(Membership(workspace_id=private.id, user_id=outsider.id, role=Role.owner))
+        session.add(NotificationRecipient(workspace_id=workspace.id, email="ops@example.com"))
+        watchers = [
+            ServiceWatcher(workspace_id=workspace.id, name=f"svc-{index}", url=f"http://svc-{index}")
+            for index in range(3)
+        ]
+        session.add_all(watchers)
+        session.commit()
+        return {
+            "user": owner.id,
+            "workspace": workspace.id,
+            "private": private.id,
+            "watchers": [watcher.id for watcher in watchers],
+        }
+
+
+async def _seed_events(session_factory, watcher_ids):
+    start = dt.datetime.now(dt.timezone.utc) - dt.timedelta(days=2)
+    events = [
+        HealthEvent(
+            watcher_id=watcher_id,
+            status=HealthStatus.down if step % 4 == 0 else HealthStatus.healthy,
+            response_time_ms=float(10 + step),
+            created_at=start + dt.timedelta(hours=step),
+        )
+        for watcher_id in watcher_ids
+        for step in range(12)
+    ]
+    async with session_factory() as session:
+        await write_events(events, session)
+        await session.commit()
+
+
+def _report(counts, statements):
+    lines = []
+    for key in sorted(counts.keys() | EXPECTED.keys()):
+        expected, got = EXPECTED.get(key), counts.get(key)
+        if expected == got:
+            continue
+        lines.append(f"{key}: expected {expected}, got {got}")
+        lines.extend(f"    {' '.join(statement.split())}" for statement in statements.get(key, []))
+    return "\n".join(lines)
+
+
+@pytest.mark.anyio
+async def test_query_counts_per_route_and_job(
+    app, monkeypatch, tmp_path, sync_engine, session_factory, alert_pipeline, count_queries
+):
+    publisher = live.LivePublisher(MemoryRedis())
+    monkeypatch.setattr(live, "live_publisher", publisher)
+    monkeypatch.setattr(workers, "live_publisher", publisher)
+    ids = _seed(sync_engine)
+    await _seed_events(session_factory, ids["watchers"])
+    workspace_id, watcher_id = ids["workspace"], ids["watchers"][0]
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(ids['user'])})}"}
+    values = {"workspace_id": workspace_id, "watcher_id": watcher_id}
+    counts, statements = {}, {}
+
+    def measure(key):
+        # cold auth caches: count the worst case, and the same way on every run
+        deps.user_cache.clear()
+        deps.role_cache.clear()
+        queries = count_queries()
+
+        def done():
+            queries.close()
+            counts[key] = len(queries)
+            statements[key] = [statement for statement, _ in queries.statements]
+
+        return done
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+
+        async def call(method, template, expect=200, auth=True, **options):
+            key = f"{method} /api/v1{template}"
+            done = measure(key)
+            resp = await client.request(
+                method,
+                "/api/v1" + template.format(**values),
+                headers=options.pop("headers", headers if auth else None),
+                **options,
+            )
+            done()
+            assert resp.status_code == expect, (key, resp.text)
+            return resp
+
+        await call(
+            "POST",
+            "/auth/register",
+            201,
+            auth=False,
+            json={"email": "new@example.com", "password": "secret123"},
+        )
+        await call(
+            "POST",
+            "/auth/token",
+            auth=False,
+            json={"username": "owner@example.com", "password": "secret123"},
+        )
+        await call("GET", "/health", auth=False)
+        await call("GET", "/me")
+        await call("PATCH", "/me", json={"first_name": "Olive"})
+        await call("POST", "/workspaces", 201, json={"name": "another"})
+        await call("GET", "/workspaces")
+
+        await call("GET", "/workspaces/{workspace_id}/members")
+        invited = await call(
+            "POST",
+            "/workspaces/{workspace_id}/members/invite",
+            201,
+            json={"email": "invitee@example.com"},
+        )
+        values["user_id"] = invited.json()["user_id"]
+        await call("PATCH", "/workspaces/{workspace_id}/members/{user_id}", json={"role": "admin"})
+        await call("DELETE", "/workspaces/{workspace_id}/members/{user_id}", 204)
+
+        await call("GET", "/workspaces/{workspace_id}/recipients")
+        recipient = await call(
+            "POST", "/workspaces/{workspace_id}/recipients", 201, json={"email": "new@example.com"}
+        )
+        values["recipient_id"] = recipient.json()["id"]
+        await call(
+            "PATCH",
+            "/workspaces/{workspace_id}/recipients/{recipient_id}",
+            json={"display_name": "New"},
+        )
+        await call("DELETE", "/workspaces/{workspace_id}/recipients/{recipient_id}", 204)
+
+        created = await call(
+            "POST",
+            "/workspaces/{workspace_id}/watchers",
+            201,
+            json={"name": "extra", "url": "http://extra"},
+        )
+        await call(
+            "POST",
+            "/workspaces/{workspace_id}/watchers/import",
+            201,
+            json=[{"name": "svc-0", "url": "http://svc-0"}, {"name": "new", "url": "http://new"}],
+        )
+        await call("GET", "/workspaces/{workspace_id}/watchers/export")
+        await call("GET", "/workspaces/{workspace_id}/watchers")
+        await call("PATCH", "/watchers/{watcher_id}", json={"name": "renamed"})
+        values["watcher_id"] = deleted_id = created.json()["id"]
+        await call("DELETE", "/watchers/{watcher_id}", 202)
+        await call("GET", "/watchers/{watcher_id}/purge")
+        values["watcher_id"] = watcher_id
+
+        await call("GET", "/workspaces/{workspace_id}/overview")
+        await call("GET", "/workspaces/{workspace_id}/uptime")
+        await call("GET", "/workspaces/{workspace_id}/events")
+        await call("GET", "/workspaces/{workspace_id}/events/export")
+        await call("GET", "/watchers/{watcher_id}/events")
+        await call("GET", "/watchers/{watcher_id}/latency")
+
+        await call("GET", "/public/workspaces/{workspace_id}/status")
+        await call("GET", "/public/workspaces/{workspace_id}/watchers")
+        await call("GET", "/public/workspaces/{workspace_id}/uptime")
+        await call("GET", "/public/workspaces/{workspace_id}/events")
+
+        # live feeds stream until the client leaves; count the checks made before a refusal
+        token = create_access_token({"sub": str(ids["user"])})
+        values["workspace_id"] = ids["private"]
+        await call("GET", "/workspaces/{workspace_id}/live", 403, params={"token": token})
+        await call("GET", "/public/workspaces/{workspace_id}/live", 404, auth=False)
+        values["workspace_id"] = workspace_id
+
+        # from here on snapshots are always stale, so the check job's rebuild is counted
+        monkeypatch.setattr(settings, "snapshot_min_interval_seconds", 0)
+        async with session_factory() as session:
+            sentinel, sentinel_token = await create_sentinel("eu-1", "eu-west", session)
+        sentinel_headers = {"Authorization": f"Bearer {sentinel_token}"}
+        await call("GET", "/sentinel/watchers", headers=sentinel_headers)
+        await call(
+            "POST",
+            "/sentinel/results",
+            headers=sentinel_headers,
+            json={
+                "sentinel_id": str(sentinel.id),
+                "region": "eu-west",
+                "results": [
+                    {
+                        "idempotency_key": f"k{index}",
+                        "watcher_id": str(watcher),
+                        "status": "healthy",
+                        "checked_at": dt.datetime.now(dt.timezone.utc).isoformat(),
+                    }
+                    for index, watcher in enumerate(ids["watchers"])
+                ],
+            },
+        )
+
+    async def healthy(watcher):
+        return HealthEvent(
+            watcher_id=watcher.id,
+            status=HealthStatus.healthy,
+            response_status=200,
+            response_time_ms=12.0,
+        )
+
+    monkeypatch.setattr(watcher_service, "_http_check", healthy)
+    monkeypatch.setattr(workers, "SessionLocal", session_factory)
+    monkeypatch.setattr(notifications, "SessionLocal", session_factory)
+    monkeypatch.setattr(notifications, "_send_email", lambda *args: None)
+    monkeypatch.setattr(settings, "archive_dir", str(tmp_path / "archive"))
+    monkeypatch.setattr(settings, "retention_days", 1)
+
+    done = measure("job run_check")
+    await workers._run_check_async(watcher_id)
+    done()
+
+    for watcher in ids["watchers"]:
+        down = HealthEvent(watcher_id=watcher, status=HealthStatus.down)
+        for _ in range(alert_pipeline.confirm_checks):
+            alert_pipeline.observe([down], {watcher: workspace_id})
+    done = measure("job send_digest")
+    await notifications._send_digest_async(workspace_id, alert_pipeline)
+    done()
+
+    # as if the purge ran after its delay, when checks claimed before the delete are done
+    monkeypatch.setattr(settings, "scheduler_lease_seconds", 0)
+    monkeypatch.setattr(settings, "event_flush_seconds", 0)
+    done = measure("job purge_watcher")
+    await workers._purge_watcher_async(uuid.UUID(deleted_id))
+    done()
+
+    done = measure("job run_retention")
+    await workers._run_retention_async()
+    done()
+
+    routes = {
+        f"{method} {route.path}"
+        for route in router.routes
+        for method in getattr(route, "methods", ())
+    }
+    assert not routes - counts.keys(), "Routes without a pinned query count"
+    assert counts == EXPECTED, "Query counts changed:\n" + _report(counts, statements)
@@ -0,0 +1,187 @@
+"""EXPLAIN the statements that hot API routes and worker jobs really issue.
+
+Statements are captured while the code paths run against a seeded database, then each
+one is re-run under ``EXPLAIN QUERY PLAN``; any full table scan fails the test.
+"""
+
+import datetime as dt
+import re
+
+import httpx
+import pytest
+from sqlmodel import Session
+
+from healther import notifications, workers
+from healther.models import (
+    HealthEvent,
+    HealthStatus,
+    Membership,
+    NotificationRecipient,
+    Role,
+    ServiceWatcher,
+    User,
+    Workspace,
+)
+from healther.security import create_access_token, hash_password
+from healther.services.events import write_events
+from healther.services.purge import purge_deleted
+from healther.services.retention import apply_retention
+from healther.services.sentinels import create_sentinel
+
+# anon_N are SQLAlchemy subqueries: reading back their (already filtered) rows is no table scan
+FULL_SCAN = re.compile(r"^SCAN (?!anon_\d+\b)(\w+)\b(?! USING (COVERING )?INDEX)")
+
+
+def _seed(sync_engine):
+    """A few workspaces, watchers and events, then ANALYZE so plans reflect the data."""
+    with Session(sync_engine) as session:
+        owner = User(email="owner@example.com", hashed_password=hash_password("secret123"))
+        session.add(owner)
+        workspaces = [Workspace(name=f"ws-{index}", is_public=True) for index in range(4)]
+        session.add_all(workspaces)
+        session.flush()
+        watchers = []
+        for workspace in workspaces:
+            session.add(Membership(workspace_id=workspace.id, user_id=owner.id, role=Role.owner))
+            session.add(NotificationRecipient(workspace_id=workspace.id, email="ops@example.com"))
+            for index in range(5):
+                watcher = ServiceWatcher(
+                    workspace_id=workspace.id, name=f"svc-{index}", url=f"http://svc-{index}"
+                )
+                session.add(watcher)
+                watchers.append(watcher)
+        # enough users that joining through membership beats scanning the user table
+        for index in range(40):
+            user = User(email=f"member-{index}@example.com", hashed_password="x")
+            session.add(user)
+            session.flush()
+            workspace = workspaces[index % len(workspaces)]
+            session.add(Membership(workspace_id=workspace.id, user_id=user.id))
+        session.commit()
+        ids = {
+            "user": owner.id,
+            "workspace": workspaces[0].id,
+            "watcher": watchers[0].id,
+            "doomed": watchers[1].id,
+        }
+        watcher_ids = [watcher.id for watcher in watchers]
+
+    start = dt.datetime.now(dt.timezone.utc) - dt.timedelta(days=3)
+    events = [
+        HealthEvent(
+            watcher_id=watcher_id,
+            status=HealthStatus.down if minute % 50 == 0 else HealthStatus.healthy,
+            response_time_ms=float(minute % 90),
+            created_at=start + dt.timedelta(minutes=minute * 5),
+        )
+        for watcher_id in watcher_ids
+        for minute in range(100)
+    ]
+    with Session(sync_engine) as session:
+        session.exec(HealthEvent.__table__.insert().values([e.model_dump() for e in events]))
+        session.commit()
+        session.connection().exec_driver_sql("ANALYZE")
+        session.commit()
+    return ids
+
+
+def _full_scans(sync_engine, statements):
+    failures = []
+    with sync_engine.connect() as conn:
+        for statement, parameters in statements:
+            if not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+                continue
+            plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+            scans = [row[-1] for row in plan if FULL_SCAN.match(row[-1])]
+            if scans:
+                failures.append(f"{' / '.join(scans)}\n    {statement}")
+    return failures
+
+
+@pytest.mark.anyio
+async def test_hot_queries_use_indexes(
+    app, monkeypatch, tmp_path, sync_engine, session_factory, alert_pipeline, count_queries
+):
+    ids = _seed(sync_engine)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(ids['user'])})}"}
+    workspace_id, watcher_id = ids["workspace"], ids["watcher"]
+
+    recorder = count_queries()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        page = await client.get(f"/api/v1/workspaces/{workspace_id}/events", headers=headers)
+        paths = [
+            "/api/v1/me",
+            "/api/v1/workspaces",
+            f"/api/v1/workspaces/{workspace_id}/members",
+            f"/api/v1/workspaces/{workspace_id}/recipients",
+            f"/api/v1/workspaces/{workspace_id}/watchers",
+            f"/api/v1/workspaces/{workspace_id}/watchers/export",
+            f"/api/v1/workspaces/{workspace_id}/uptime",
+            f"/api/v1/workspaces/{workspace_id}/overview",
+            f"/api/v1/workspaces/{workspace_id}/events?cursor={page.json()['next_cursor']}",
+            f"/api/v1/workspaces/{workspace_id}/events?status=down",
+            f"/api/v1/watchers/{watcher_id}/events?limit=10",
+            f"/api/v1/watchers/{watcher_id}/latency",
+            f"/api/v1/watchers/{watcher_id}/latency?window=90d",
+            f"/api/v1/public/workspaces/{workspace_id}/events",
+            f"/api/v1/public/workspaces/{workspace_id}/watchers",
+            f"/api/v1/public/workspaces/{workspace_id}/uptime",
+            f"/api/v1/public/workspaces/{workspace_id}/status",
+        ]
+        for path in paths:
+            resp = await client.get(path, headers=headers)
+            assert resp.status_code == 200, (path, resp.text)
+        resp = await client.post(
+            f"/api/v1/workspaces/{workspace_id}/watchers/import",
+            json=[{"name": "svc-0", "url": "http://svc-0"}, {"name": "new", "url": "http://new"}],
+            headers=headers,
+        )
+        assert resp.status_code == 201, resp.text
+        resp = await client.delete(f"/api/v1/watchers/{ids['doomed']}", headers=headers)
+        assert resp.status_code == 202, resp.text
+
+        async with session_factory() as session:
+            sentinel, token = await create_sentinel("eu-1", "eu-west", session)
+            batch = {
+                "sentinel_id": str(sentinel.id),
+                "region": "eu-west",
+                "results": [
+                    {
+                        "idempotency_key": "k1",
+                        "watcher_id": str(watcher_id),
+                        "status": "healthy",
+                        "checked_at": dt.datetime.now(dt.timezone.utc).isoformat(),
+                    }
+                ],
+            }
+        sentinel_headers = {"Authorization": f"Bearer {token}"}
+        resp = await client.get("/api/v1/sentinel/watchers", headers=sentinel_headers)
+        assert resp.status_code == 200, resp.text
+        resp = await client.post("/api/v1/sentinel/results", json=batch, headers=sentinel_headers)
+        assert resp.json()["accepted"] == 1, resp.text
+
+    async def no_check(watcher, session):
+        return None
+
+    monkeypatch.setattr(notifications, "SessionLocal", session_factory)
+    monkeypatch.setattr(notifications, "_send_email", lambda *args: None)
+    monkeypatch.setattr(workers, "SessionLocal", session_factory)
+    monkeypatch.setattr(workers, "perform_check", no_check)
+    down_event = HealthEvent(watcher_id=watcher_id, status=HealthStatus.down)
+    for _ in range(alert_pipeline.confirm_checks):
+        alert_pipeline.observe([down_event], {watcher_id: workspace_id})
+    await notifications._send_digest_async(workspace_id, alert_pipeline)
+    await workers._run_check_async(watcher_id)
+    async with session_factory() as session:
+        await write_events(
+            [HealthEvent(watcher_id=watcher_id, status=HealthStatus.healthy)], session
+        )
+        await session.commit()
+        await apply_retention(session, days=1, root=tmp_path / "archive", chunk_size=50)
+        await purge_deleted(session, root=tmp_path / "archive", chunk_size=40)
+    recorder.close()
+
+    assert len(recorder.statements) > len(paths)
+    failures = _full_scans(sync_engine, recorder.statements)
+    assert not failures, "Full table scans:\n" + "\n".join(failures)
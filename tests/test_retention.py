@@ -0,0 +1,237 @@
+import datetime as dt
+import json
+import uuid
+
+import httpx
+import pytest
+from sqlmodel import Session, select
+
+from healther import workers
+from healther.config import settings
+from healther.models import (
+    DailyUptime,
+    HealthEvent,
+    HealthStatus,
+    HourlyUptime,
+    ServiceWatcher,
+)
+from healther.services import archive
+from healther.services import purge as purge_service
+from healther.services.events import write_events
+from healther.services.purge import purge_deleted, purge_job_id
+from healther.services.retention import apply_retention
+from healther.services.rollups import rebuild_rollups
+
+
+@pytest.mark.anyio
+async def test_retention_archives_old_events_and_export_reads_them(
+    app, monkeypatch, tmp_path, sync_engine, session_factory
+):
+    monkeypatch.setattr(settings, "archive_dir", str(tmp_path / "archive"))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.post(
+            "/api/v1/auth/register", json={"email": "ret@example.com", "password": "secret123"}
+        )
+        token_resp = await client.post(
+            "/api/v1/auth/token", json={"username": "ret@example.com", "password": "secret123"}
+        )
+        headers = {"Authorization": f"Bearer {token_resp.json()['access_token']}"}
+        ws_resp = await client.post("/api/v1/workspaces", json={"name": "Ret"}, headers=headers)
+        workspace_id = ws_resp.json()["id"]
+        watcher_ids = []
+        for name in ("api", "web"):
+            resp = await client.post(
+                f"/api/v1/workspaces/{workspace_id}/watchers",
+                json={"name": name, "url": f"https://{name}.example.com"},
+                headers=headers,
+            )
+            watcher_ids.append(uuid.UUID(resp.json()["id"]))
+
+        now = dt.datetime(2026, 6, 1, tzinfo=dt.timezone.utc)
+        # one event every ten days per watcher, alternating, spanning two archive months
+        events = [
+            HealthEvent(
+                watcher_id=watcher_ids[index % 2],
+                status=HealthStatus.down if index == 3 else HealthStatus.healthy,
+                created_at=now - dt.timedelta(days=150 - index * 10),
+            )
+            for index in range(15)
+        ]
+        async with session_factory() as session:
+            await write_events(events, session)
+            await session.commit()
+            archived = await apply_retention(session, days=90, now=now, chunk_size=2)
+        old = [event for event in events if event.created_at < now - dt.timedelta(days=90)]
+        assert archived == len(old) == 6
+
+        with Session(sync_engine) as session:
+            remaining = session.exec(select(HealthEvent.id)).all()
+            assert set(remaining) == {event.id for event in events[6:]}
+            # rollups are untouched by retention
+            assert sum(row.healthy_count for row in session.exec(select(DailyUptime))) == 14
+            daily = {
+                (row.watcher_id, row.bucket_start): row.healthy_count + row.down_count
+                for row in session.exec(select(DailyUptime))
+            }
+
+        # a rebuild keeps the buckets whose events are archived and redoes the rest
+        async with session_factory() as session:
+            assert await rebuild_rollups(session) == len(events) - 6
+        with Session(sync_engine) as session:
+            rebuilt = {
+                (row.watcher_id, row.bucket_start): row.healthy_count + row.down_count
+                for row in session.exec(select(DailyUptime))
+            }
+            assert rebuilt == daily
+
+        months = sorted(path.name for path in (tmp_path / "archive").rglob("*.ndjson.gz"))
+        assert months == ["2026-01.ndjson.gz"] * 2 + ["2026-02.ndjson.gz"] * 2
+
+        # a chunk archived twice (crash before delete) is read back once
+        first = old[0]
+        row = {
+            column: archive.encode_value(getattr(first, column)) for column in archive.EVENT_COLUMNS
+        }
+        archive.append_segment(
+            settings.archive_dir, first.watcher_id, archive.month_of(first.created_at), [row]
+        )
+
+        url = f"/api/v1/workspaces/{workspace_id}/events/export"
+        resp = await client.get(url, headers=headers)
+        ids = [json.loads(line)["id"] for line in resp.text.splitlines()]
+        assert ids == [str(event.id) for event in events]
+
+        resp = await client.get(
+            url,
+            params={"status": "down", "until": (now - dt.timedelta(days=100)).isoformat()},
+            headers=headers,
+        )
+        assert [json.loads(line)["id"] for line in resp.text.splitlines()] == [str(events[3].id)]
+
+        resp = await client.delete(f"/api/v1/watchers/{watcher_ids[0]}", headers=headers)
+        assert resp.status_code == 202
+        # a lost purge job is picked up by a retention run, once running checks are done
+        async with session_factory() as session:
+            assert await purge_deleted(session) == 0
+        monkeypatch.setattr(settings, "scheduler_lease_seconds", 0)
+        monkeypatch.setattr(settings, "event_flush_seconds", 0)
+        async with session_factory() as session:
+            assert await purge_deleted(session) == 1
+        assert not (tmp_path / "archive" / str(watcher_ids[0])).exists()
+        with Session(sync_engine) as session:
+            assert len(session.exec(select(ServiceWatcher)).all()) == 1
+
+
+@pytest.mark.anyio
+async def test_deleted_watchers_vanish_at_once_and_are_purged_in_chunks(
+    app, monkeypatch, tmp_path, sync_engine, session_factory, scheduler, purge_queue
+):
+    monkeypatch.setattr(settings, "archive_dir", str(tmp_path / "archive"))
+    monkeypatch.setattr(settings, "purge_chunk_size", 10)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.post(
+            "/api/v1/auth/register", json={"email": "purge@example.com", "password": "secret123"}
+        )
+        token_resp = await client.post(
+            "/api/v1/auth/token", json={"username": "purge@example.com", "password": "secret123"}
+        )
+        headers = {"Authorization": f"Bearer {token_resp.json()['access_token']}"}
+        ws_resp = await client.post("/api/v1/workspaces", json={"name": "P"}, headers=headers)
+        workspace_id = ws_resp.json()["id"]
+        keep, doomed = [
+            uuid.UUID(
+                (
+                    await client.post(
+                        f"/api/v1/workspaces/{workspace_id}/watchers",
+                        json={"name": name, "url": f"https://{name}.example.com"},
+                        headers=headers,
+                    )
+                ).json()["id"]
+            )
+            for name in ("keep", "doomed")
+        ]
+        start = dt.datetime.now(dt.timezone.utc) - dt.timedelta(days=2)
+        events = [
+            HealthEvent(
+                watcher_id=watcher_id,
+                status=HealthStatus.healthy,
+                response_time_ms=10.0,
+                created_at=start + dt.timedelta(hours=index),
+            )
+            for watcher_id, count in ((keep, 5), (doomed, 25))
+            for index in range(count)
+        ]
+        async with session_factory() as session:
+            await write_events(events, session)
+            await session.commit()
+
+        resp = await client.delete(f"/api/v1/watchers/{doomed}", headers=headers)
+        assert resp.status_code == 202, resp.text
+        # the purge waits for checks claimed before the delete to finish and be written
+        assert (resp.json()["status"], resp.json()["done"]) == ("scheduled", False)
+        assert purge_queue.scheduled == [
+            (purge_service.purge_delay(), "healther.workers.purge_watcher", doomed)
+        ]
+        # gone from every read and from the schedule before any history is removed
+        assert list(scheduler.scores) == [keep]
+        watchers = await client.get(f"/api/v1/workspaces/{workspace_id}/watchers", headers=headers)
+        assert [item["id"] for item in watchers.json()] == [str(keep)]
+        page = await client.get(f"/api/v1/workspaces/{workspace_id}/events", headers=headers)
+        assert {item["watcher_id"] for item in page.json()["items"]} == {str(keep)}
+        resp = await client.get(f"/api/v1/watchers/{doomed}/events", headers=headers)
+        assert resp.status_code == 404
+        resp = await client.delete(f"/api/v1/watchers/{doomed}", headers=headers)
+        assert resp.status_code == 404
+        with Session(sync_engine) as session:
+            assert len(session.exec(select(HealthEvent.id)).all()) == 30
+            rollups = sum(
+                len(session.exec(select(model).where(model.watcher_id == doomed)).all())
+                for model in (HourlyUptime, DailyUptime)
+            )
+
+        job = purge_queue.jobs[purge_job_id(doomed)]
+        assert (job.func, job.args) == ("healther.workers.purge_watcher", (doomed,))
+        saved = []
+        monkeypatch.setattr(job, "save_meta", lambda: saved.append(dict(job.meta)))
+        monkeypatch.setattr(workers, "SessionLocal", session_factory)
+        assert (await workers._purge_watcher_async(doomed, job))["done"] is False
+        assert saved == []
+        monkeypatch.setattr(settings, "scheduler_lease_seconds", 0)
+        monkeypatch.setattr(settings, "event_flush_seconds", 0)
+        await workers._purge_watcher_async(doomed, job)
+        # a progress report per chunk: events first, then rollups, then the row itself
+        assert [progress["events_purged"] for progress in saved[:3]] == [10, 20, 25]
+        assert [progress["done"] for progress in saved] == [False] * (len(saved) - 1) + [True]
+        assert saved[-1] == {
+            "workspace_id": workspace_id,
+            "events_purged": 25,
+            "rollups_purged": rollups,
+            "done": True,
+        }
+
+        job.status = "finished"
+        resp = await client.get(f"/api/v1/watchers/{doomed}/purge", headers=headers)
+        assert resp.status_code == 200, resp.text
+        assert (resp.json()["status"], resp.json()["events_purged"]) == ("finished", 25)
+        assert resp.json()["done"]
+
+    with Session(sync_engine) as session:
+        assert session.exec(select(ServiceWatcher.id)).all() == [keep]
+        assert len(session.exec(select(HealthEvent.id)).all()) == 5
+        for model in (HourlyUptime, DailyUptime):
+            assert {row.watcher_id for row in session.exec(select(model))} == {keep}
+
+
+def test_retention_is_rescheduled_when_a_run_fails(monkeypatch, memory_redis):
+    async def broken():
+        raise RuntimeError("database went away")
+
+    scheduled = []
+    monkeypatch.setattr(workers, "_run_retention_async", broken)
+    monkeypatch.setattr(workers.Redis, "from_url", lambda url: memory_redis)
+    monkeypatch.setattr(workers, "schedule_retention", lambda queue, delay: scheduled.append(delay))
+    with pytest.raises(RuntimeError):
+        workers.run_retention()
+    assert scheduled == [settings.retention_interval_seconds]
@@ -0,0 +1,231 @@
+import asyncio
+import datetime as dt
+import gzip
+import json
+import uuid
+
+import httpx
+import pytest
+from sqlmodel import Session, select
+
+from healther import live, sentinel
+from healther.config import settings
+from healther.models import HealthEvent, HealthStatus, HourlyUptime
+from healther.services import sentinels as sentinel_service
+
+
+async def _setup(client, session_factory):
+    email = "sentinel-owner@example.com"
+    await client.post("/api/v1/auth/register", json={"email": email, "password": "secret123"})
+    token = await client.post(
+        "/api/v1/auth/token", json={"username": email, "password": "secret123"}
+    )
+    headers = {"Authorization": f"Bearer {token.json()['access_token']}"}
+    workspace = await client.post("/api/v1/workspaces", json={"name": "S"}, headers=headers)
+    watcher_ids = []
+    for name in ("api", "web"):
+        resp = await client.post(
+            f"/api/v1/workspaces/{workspace.json()['id']}/watchers",
+            json={"name": name, "url": f"https://{name}.example.com", "every_value": 1},
+            headers=headers,
+        )
+        watcher_ids.append(uuid.UUID(resp.json()["id"]))
+    async with session_factory() as session:
+        record, sentinel_token = await sentinel_service.create_sentinel("eu-1", "eu-west", session)
+        sentinel_id = record.id
+    sentinel_auth = {"Authorization": f"Bearer {sentinel_token}"}
+    return headers, workspace.json()["id"], watcher_ids, sentinel_id, sentinel_auth
+
+
+@pytest.mark.anyio
+async def test_sentinel_runner_ships_batches_that_are_stored_once(
+    app, monkeypatch, sync_engine, session_factory
+):
+    published = []
+    monkeypatch.setattr(live.live_publisher, "publish", lambda events, ids: published.extend(events))
+
+    async def fake_check(watcher):
+        status = HealthStatus.down if watcher.url.startswith("https://web") else HealthStatus.healthy
+        return HealthEvent(watcher_id=watcher.id, status=status, response_time_ms=42.0)
+
+    monkeypatch.setattr(sentinel, "run_http_check", fake_check)
+    sent = []
+
+    async def record(request):
+        sent.append(request)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        headers, workspace_id, watcher_ids, sentinel_id, sentinel_auth = await _setup(
+            client, session_factory
+        )
+        api = httpx.AsyncClient(
+            transport=transport,
+            base_url="http://test/api/v1",
+            headers=sentinel_auth,
+            event_hooks={"request": [record]},
+        )
+        runner = sentinel.SentinelRunner(api, concurrency=10)
+        await runner.refresh()
+        assert (runner.sentinel_id, runner.region) == (sentinel_id, "eu-west")
+        for watcher_id in watcher_ids:
+            runner.scheduler.reschedule(watcher_id)
+        assert runner.dispatch() == 2
+        await asyncio.gather(*runner._tasks)
+        assert runner.pending == 2
+        assert await runner.ship() == 2
+        assert runner.pending == 0
+
+        [post] = [request for request in sent if request.method == "POST"]
+        assert post.headers["content-encoding"] == "gzip"
+        batch = json.loads(gzip.decompress(post.content))
+        assert batch["sentinel_id"] == str(sentinel_id) and batch["region"] == "eu-west"
+
+        # a retry after a lost response is acknowledged but not stored again
+        resp = await api.post(
+            "/sentinel/results", content=post.content, headers={"Content-Encoding": "gzip"}
+        )
+        assert resp.json() == {"accepted": 0, "duplicates": 2, "rejected": []}
+        await api.aclose()
+
+        # stored with their region, but the shared status is the main checker's alone
+        watchers = await client.get(f"/api/v1/workspaces/{workspace_id}/watchers", headers=headers)
+        statuses = {item["name"]: item["last_status"] for item in watchers.json()}
+        assert statuses == {"api": None, "web": None}
+        page = await client.get(f"/api/v1/workspaces/{workspace_id}/events", headers=headers)
+        assert {item["region"] for item in page.json()["items"]} == {"eu-west"}
+
+    keys = {result["idempotency_key"] for result in batch["results"]}
+    with Session(sync_engine) as session:
+        events = session.exec(select(HealthEvent)).all()
+        assert {event.id for event in events} == {
+            sentinel_service.event_id(sentinel_id, key) for key in keys
+        }
+        assert {event.region for event in events} == {"eu-west"}
+        assert session.exec(select(HourlyUptime)).all() == []
+    assert published == []
+
+
+@pytest.mark.anyio
+async def test_sentinel_batches_are_authenticated_validated_and_bounded(
+    app, monkeypatch, session_factory
+):
+    monkeypatch.setattr(live.live_publisher, "publish", lambda events, ids: None)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        headers, workspace_id, watcher_ids, sentinel_id, sentinel_auth = await _setup(
+            client, session_factory
+        )
+        now = dt.datetime.now(dt.timezone.utc)
+
+        def result(key, watcher_id=watcher_ids[0], checked_at=now):
+            return {
+                "idempotency_key": key,
+                "watcher_id": str(watcher_id),
+                "status": "healthy",
+                "checked_at": checked_at.isoformat(),
+            }
+
+        def body(results, region="eu-west"):
+            payload = {"sentinel_id": str(sentinel_id), "region": region, "results": results}
+            return gzip.compress(json.dumps(payload).encode())
+
+        url = "/api/v1/sentinel/results"
+        gz = {**sentinel_auth, "Content-Encoding": "gzip"}
+        assert (await client.post(url, content=body([]), headers=headers)).status_code == 401
+        assert (await client.get("/api/v1/sentinel/watchers", headers=headers)).status_code == 401
+        resp = await client.post(url, content=body([], region="us-east"), headers=gz)
+        assert resp.status_code == 403
+
+        resp = await client.post(
+            url,
+            content=body(
+                [
+                    result("a"),
+                    result("a"),
+                    result("late", checked_at=now - dt.timedelta(days=3)),
+                    result("ahead", checked_at=now + dt.timedelta(hours=1)),
+                    result("ghost", watcher_id=uuid.uuid4()),
+                ]
+            ),
+            headers=gz,
+        )
+        assert resp.status_code == 200, resp.text
+        summary = resp.json()
+        assert (summary["accepted"], summary["duplicates"]) == (1, 1)
+        assert {(item["idempotency_key"], item["reason"]) for item in summary["rejected"]} == {
+            ("late", "checked_at out of range"),
+            ("ahead", "checked_at out of range"),
+            ("ghost", "unknown watcher"),
+        }
+
+        # uncompressed batches are fine too; broken or oversized ones are refused
+        plain = json.dumps({"sentinel_id": str(sentinel_id), "region": "eu-west", "results": []})
+        resp = await client.post(url, content=plain, headers=sentinel_auth)
+        assert resp.json() == {"accepted": 0, "duplicates": 0, "rejected": []}
+        resp = await client.post(url, content=body([result("b")])[:-8], headers=gz)
+        assert resp.status_code == 400
+        resp = await client.post(
+            url, content=b"{}", headers={**sentinel_auth, "Content-Encoding": "br"}
+        )
+        assert resp.status_code == 415
+        resp = await client.post(
+            url, content=body([result("c")]), headers={**gz, "Content-Type": "application/json"}
+        )
+        assert resp.status_code == 200
+        # the limit holds for the raw stream, the declared length and the inflated body
+        monkeypatch.setattr(settings, "sentinel_max_body_bytes", 1000)
+        compressed = body([result("d")] * 50)
+        assert len(compressed) < 1000
+        resp = await client.post(url, content=compressed, headers=gz)
+        assert resp.status_code == 413
+        resp = await client.post(url, content=gzip.decompress(compressed), headers=sentinel_auth)
+        assert resp.status_code == 413
+
+        async def chunks():
+            yield b"{" * 2000
+
+        resp = await client.post(url, content=chunks(), headers=sentinel_auth)
+        assert resp.status_code == 413
+        resp = await client.post(
+            url, content=b"{}", headers={**sentinel_auth, "Content-Length": "5000"}
+        )
+        assert resp.status_code == 413
+        monkeypatch.setattr(settings, "sentinel_max_body_bytes", 10_000_000)
+        monkeypatch.setattr(settings, "sentinel_max_batch", 2)
+        resp = await client.post(url, content=body([result(str(i)) for i in range(3)]), headers=gz)
+        assert resp.status_code == 413
+        resp = await client.post(url, content=gzip.compress(b'{"results": 1}'), headers=gz)
+        assert resp.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_sentinel_runner_retries_server_errors_and_drops_refused_batches():
+    replies = []
+
+    def handler(request):
+        status = replies.pop(0)
+        if status == "trim":
+            # a check finishing meanwhile pushes the oldest results out of the buffer
+            runner._buffer.extend({"idempotency_key": key} for key in ("d", "e"))
+            del runner._buffer[:1]
+            status = 200
+        return httpx.Response(status, json={"accepted": 0, "duplicates": 0, "rejected": []})
+
+    api = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://test")
+    runner = sentinel.SentinelRunner(api, max_batch=2)
+    runner.sentinel_id, runner.region = uuid.uuid4(), "eu-west"
+    runner._buffer = [{"idempotency_key": key} for key in ("a", "b", "c")]
+
+    replies[:] = [503]
+    assert await runner.ship() == 0
+    replies[:] = [409]
+    assert await runner.ship() == 0
+    assert runner.pending == 3
+
+    # a refused batch is dropped and the next one still goes out
+    replies[:] = [422, "trim", 503]
+    assert await runner.ship() == 1
+    assert [result["idempotency_key"] for result in runner._buffer] == ["d", "e"]
+    assert runner.dropped == 2
+    await api.aclose()